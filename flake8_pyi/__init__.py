@@ -1,3 +1,20 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
 from .checker import PyiTreeChecker
 
-__all__ = ["PyiTreeChecker"]
+if TYPE_CHECKING:
+    from .runner import Finding, lint_many, lint_source
+
+__all__ = ["Finding", "PyiTreeChecker", "lint_many", "lint_source"]
+
+
+def __getattr__(name: str) -> Any:
+    # flake8 imports this package to load the plugin, so the runner
+    # (and everything it imports) is only imported when it's used
+    if name in {"Finding", "lint_many", "lint_source"}:
+        from . import runner
+
+        return getattr(runner, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,115 @@
+"""Lint stubs from asyncio code without blocking the event loop.
+
+>>> async def main() -> None:
+...     async with AsyncLinter(max_concurrency=2) as linter:
+...         findings = await linter.lint_source('x: "int"', "foo.pyi")
+...     print(findings[0])
+>>> asyncio.run(main())
+foo.pyi:1:4: Y020 Quoted annotations should never be used in stubs
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import os
+from collections.abc import Collection, Iterable
+from functools import partial
+from types import TracebackType
+
+from .runner import Finding, _check_unique_filenames, _lint_source
+from .visitor import Budget
+
+
+class AsyncLinter:
+    """Run flake8-pyi's checks in a pool of worker processes.
+
+    At most `max_concurrency` stubs are linted at a time
+    (by default, one per CPU). Callers that submit more stubs than that
+    wait for a slot to become free, so a busy service can't queue up
+    an unbounded amount of work in the pool.
+    Cancelling a call that is still waiting for a slot,
+    or that hasn't been picked up by a worker yet, withdraws its work item.
+
+    By default a process pool is created and owned by the linter,
+    and shut down when the linter is closed.
+    Alternatively, pass an existing `executor`; it won't be shut down.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int | None = None,
+        executor: concurrent.futures.Executor | None = None,
+        extend_select: Collection[str] = (),
+    ) -> None:
+        if max_concurrency is None:
+            max_concurrency = os.cpu_count() or 1
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self._owns_executor = executor is None
+        if executor is None:
+            executor = concurrent.futures.ProcessPoolExecutor(max_concurrency)
+        self._executor = executor
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._extend_select = extend_select
+
+    async def lint_source(
+        self, source: str, filename: str, *, budget: Budget | None = None
+    ) -> list[Finding]:
+        """Lint the stub source code `source` in a worker.
+
+        Return a sorted list of findings, as `flake8_pyi.lint_source()` does.
+        """
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            worker = partial(
+                _lint_source,
+                source=source,
+                filename=filename,
+                extend_select=self._extend_select,
+                budget=budget,
+            )
+            return await loop.run_in_executor(self._executor, worker)
+
+    async def lint_many(
+        self, sources: Iterable[tuple[str, str]], *, budget: Budget | None = None
+    ) -> dict[str, list[Finding]]:
+        """Lint many stubs, given as `(filename, source)` pairs.
+
+        Return a dictionary mapping each filename to a sorted list of findings;
+        `ValueError` is raised if a filename is given more than once.
+        If one of the stubs can't be linted, or the call is cancelled,
+        the remaining stubs are cancelled as well.
+        """
+        sources = list(sources)
+        _check_unique_filenames([filename for filename, _ in sources])
+        tasks = [
+            asyncio.ensure_future(self.lint_source(source, filename, budget=budget))
+            for filename, source in sources
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return {filename: findings for (filename, _), findings in zip(sources, results)}
+
+    async def aclose(self) -> None:
+        """Shut down the worker pool, if it is owned by this linter."""
+        if self._owns_executor:
+            await asyncio.get_running_loop().run_in_executor(
+                None, partial(self._executor.shutdown, cancel_futures=True)
+            )
+
+    async def __aenter__(self) -> AsyncLinter:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await self.aclose()
@@ -0,0 +1,52 @@
+"""Read stubs directly from wheels, sdists and other zip or tar archives.
+
+Stubs in an archive are reported as `archive!member`,
+e.g. `types_requests-2.31.0.whl!requests-stubs/api.pyi`.
+"""
+
+from __future__ import annotations
+
+import tarfile
+import zipfile
+from collections.abc import Iterator
+
+_ZIP_SUFFIXES = (".whl", ".zip")
+_TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+def is_archive(path: str) -> bool:
+    """Determine whether `path` should be read as an archive, based on its suffix.
+
+    >>> is_archive("types_six-1.16.0.whl")
+    True
+    >>> is_archive("types-six-1.16.0.tar.gz")
+    True
+    >>> is_archive("six.pyi")
+    False
+    """
+    return path.lower().endswith(_ZIP_SUFFIXES + _TAR_SUFFIXES)
+
+
+def iter_archive_stubs(path: str) -> Iterator[tuple[str, bytes]]:
+    """Yield `(member_name, source)` for each stub in the archive at `path`.
+
+    The sources are yielded undecoded, so that they are decoded as the parser
+    decodes them, according to PEP 263, and a member that can't be decoded
+    is reported like any other syntax error.
+
+    Only one stub is held in memory at a time.
+    Tar archives (including compressed ones) are read as a stream,
+    so the archive is read from start to end exactly once.
+    """
+    if path.lower().endswith(_ZIP_SUFFIXES):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.endswith(".pyi"):
+                    yield info.filename, archive.read(info)
+        return
+    with tarfile.open(path, mode="r|*") as archive:
+        for member in archive:
+            if member.isfile() and member.name.endswith(".pyi"):
+                file = archive.extractfile(member)
+                assert file is not None
+                yield member.name, file.read()
@@ -0,0 +1,645 @@
+"""Track the performance of flake8-pyi over time.
+
+Each benchmark run lints a corpus of stubs several times in a single process,
+and appends the results to a SQLite database: the version of flake8-pyi and
+Python, a hash of the corpus, the throughput of each repetition (in files per
+second), the time spent in each of the visitor's checks, and the peak resident
+set size of the process. Any two runs can then be compared; a regression is
+only reported if throughput dropped by more than a threshold, and if the drop
+is unlikely to be explained by the noise between repetitions.
+
+`allocations` measures how much memory the visitor allocates while checking
+a corpus, relative to its size; it isn't stored.
+
+Usage:
+
+    python -m flake8_pyi.benchmark run path/to/stubs --label my-change
+    python -m flake8_pyi.benchmark compare  # the previous run with the latest one
+    python -m flake8_pyi.benchmark list
+    python -m flake8_pyi.benchmark allocations path/to/stubs
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import gc
+import hashlib
+import importlib.metadata
+import math
+import os
+import sqlite3
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, field
+from typing import Any, NamedTuple
+
+from . import visitor
+from .runner import (
+    _count_nodes,
+    _decode_lines,
+    _lint_source,
+    _parse,
+    _read_source,
+    iter_stub_files,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    label TEXT NOT NULL,
+    flake8_pyi_version TEXT NOT NULL,
+    python_version TEXT NOT NULL,
+    compiled INTEGER NOT NULL,
+    corpus_hash TEXT NOT NULL,
+    files INTEGER NOT NULL,
+    peak_rss INTEGER
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    files_per_second REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS check_times (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    name TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    seconds REAL NOT NULL
+);
+"""
+
+
+# The fewest repetitions that a run can be compared with: with fewer,
+# a drop in throughput is never significant at the default alpha of 0.05
+_MIN_REPEAT = 3
+
+
+@dataclass
+class CheckTime:
+    calls: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class BenchmarkRun:
+    label: str
+    flake8_pyi_version: str
+    python_version: str
+    compiled: bool
+    corpus_hash: str
+    files: int
+    # Peak resident set size of the process, in bytes.
+    # None if it can't be measured on this platform.
+    peak_rss: int | None
+    # Throughput of each repetition, in files per second
+    samples: list[float]
+    # Total time spent in each check (each rule and visit_* method), excluding
+    # the checks it calls, measured in a separate instrumented repetition.
+    # Empty if the visitor is compiled, as compiled methods can't be instrumented.
+    check_times: dict[str, CheckTime] = field(default_factory=dict)
+    id: int | None = None
+    timestamp: float = 0.0
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.samples)
+
+
+def _flake8_pyi_version() -> str:
+    try:
+        return importlib.metadata.version("flake8-pyi")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _peak_rss() -> int | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, and in kibibytes elsewhere
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def read_corpus(paths: Sequence[str]) -> tuple[list[tuple[str, bytes]], str]:
+    """Read all stubs in `paths`, returning (filename, source) pairs and a hash.
+
+    The sources are kept as bytes, which is how the runner reads and lints
+    stubs, so they're decoded according to their encoding declarations.
+    The hash covers the contents of the stubs and their paths relative to
+    the paths they were found in, so it doesn't change if the corpus is moved.
+    """
+    digest = hashlib.sha256()
+    corpus = []
+    for path in paths:
+        root = path if os.path.isdir(path) else os.path.dirname(path)
+        for filename in iter_stub_files([path]):
+            contents = _read_source(filename)
+            relative_path = os.path.relpath(filename, root).replace(os.sep, "/")
+            digest.update(relative_path.encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(hashlib.sha256(contents).digest())
+            corpus.append((filename, contents))
+    return corpus, digest.hexdigest()
+
+
+def _lint_corpus(corpus: Sequence[tuple[str, bytes]]) -> float:
+    """Lint all stubs in `corpus`, returning the time taken in seconds."""
+    start = time.perf_counter()
+    for filename, source in corpus:
+        _lint_source(source, filename, extend_select=())
+    return time.perf_counter() - start
+
+
+def _check_names() -> list[str]:
+    # The rules, and the visit_* methods, which run the checks that need
+    # the context of the node's parents while visiting its children
+    names = dict.fromkeys(rule.method_name for rule in visitor.RULES)
+    names.update(
+        dict.fromkeys(
+            name for name in vars(visitor.PyiVisitor) if name.startswith("visit_")
+        )
+    )
+    return list(names)
+
+
+@contextmanager
+def _timed_checks(check_times: dict[str, CheckTime]) -> Iterator[None]:
+    # Checks are looked up on the class by each visitor that is created,
+    # so patching them here affects all visitors created in the block
+    originals = {name: getattr(visitor.PyiVisitor, name) for name in _check_names()}
+    # For each check that is running, the time spent in the checks it called
+    nested_seconds: list[float] = []
+    for name, original in originals.items():
+        check_time = check_times.setdefault(name, CheckTime())
+        setattr(visitor.PyiVisitor, name, _timed(original, check_time, nested_seconds))
+    try:
+        yield
+    finally:
+        for name, original in originals.items():
+            setattr(visitor.PyiVisitor, name, original)
+
+
+def _timed(
+    function: Callable[..., None], check_time: CheckTime, nested_seconds: list[float]
+) -> Callable[..., None]:
+    @functools.wraps(function)
+    def wrapper(*args: Any) -> None:
+        nested_seconds.append(0.0)
+        start = time.perf_counter()
+        try:
+            function(*args)
+        finally:
+            seconds = time.perf_counter() - start
+            check_time.calls += 1
+            # visit_* methods visit the node's children, which runs other checks;
+            # their time is only counted for them
+            check_time.seconds += seconds - nested_seconds.pop()
+            if nested_seconds:
+                nested_seconds[-1] += seconds
+
+    return wrapper
+
+
+def run_benchmark(paths: Sequence[str], *, repeat: int, label: str) -> BenchmarkRun:
+    """Lint the stubs in `paths` `repeat` times, and measure the throughput.
+
+    The stubs are read into memory before linting them, so that the
+    measurements don't include I/O. An extra repetition is run first
+    as a warm-up, and isn't measured.
+    """
+    corpus, corpus_hash = read_corpus(paths)
+    _lint_corpus(corpus)
+    samples = [len(corpus) / _lint_corpus(corpus) for _ in range(repeat)]
+    # Measured before the instrumented repetition, which allocates more
+    peak_rss = _peak_rss()
+    check_times: dict[str, CheckTime] = {}
+    if not visitor.COMPILED:
+        with _timed_checks(check_times):
+            _lint_corpus(corpus)
+    return BenchmarkRun(
+        label=label,
+        flake8_pyi_version=_flake8_pyi_version(),
+        python_version=".".join(map(str, sys.version_info[:3])),
+        compiled=visitor.COMPILED,
+        corpus_hash=corpus_hash,
+        files=len(corpus),
+        peak_rss=peak_rss,
+        samples=samples,
+        check_times=check_times,
+        timestamp=time.time(),
+    )
+
+
+class Allocations(NamedTuple):
+    files: int
+    ast_nodes: int
+    # The sum, over all stubs, of the peak memory traced while visiting each
+    # stub (relative to the memory in use before), in bytes
+    peak_bytes: int
+
+    @property
+    def peak_bytes_per_1000_nodes(self) -> float:
+        return self.peak_bytes / self.ast_nodes * 1000 if self.ast_nodes else 0.0
+
+
+def measure_allocations(paths: Sequence[str]) -> Allocations:
+    """Measure the memory allocated while visiting the stubs in `paths`.
+
+    CPython doesn't count allocations, and `tracemalloc` only traces memory
+    that is still in use, so the peak traced memory while each stub is visited
+    is measured instead. Parsing isn't included. Temporary objects created for
+    every node raise the peak, so it reflects how much the visitor allocates
+    per node. The stubs are split into lines beforehand, so that the lines
+    aren't included. Stubs that can't be parsed are skipped.
+    """
+    corpus, _ = read_corpus(paths)
+    trees = []
+    for filename, source in corpus:
+        try:
+            trees.append((filename, _parse(source, filename), _decode_lines(source)))
+        except SyntaxError:
+            continue
+    ast_nodes = sum(_count_nodes(tree) for _, tree, _ in trees)
+    peak_bytes = 0
+    # Garbage collections would make the peaks depend on when they happen
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        for filename, tree, lines in trees:
+            pyi_visitor = visitor.PyiVisitor(filename, lines=lines)
+            start, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            for _ in pyi_visitor.run(tree):
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+            peak_bytes += peak - start
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+    return Allocations(len(trees), ast_nodes, peak_bytes)
+
+
+class BenchmarkStore:
+    """The results of all benchmark runs, stored in a SQLite database."""
+
+    def __init__(self, path: str) -> None:
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def add(self, run: BenchmarkRun) -> int:
+        """Store `run`, returning its ID."""
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (timestamp, label, flake8_pyi_version, "
+                "python_version, compiled, corpus_hash, files, peak_rss) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run.timestamp,
+                    run.label,
+                    run.flake8_pyi_version,
+                    run.python_version,
+                    run.compiled,
+                    run.corpus_hash,
+                    run.files,
+                    run.peak_rss,
+                ),
+            )
+            run_id = cursor.lastrowid
+            assert run_id is not None
+            self.connection.executemany(
+                "INSERT INTO samples (run_id, files_per_second) VALUES (?, ?)",
+                [(run_id, sample) for sample in run.samples],
+            )
+            self.connection.executemany(
+                "INSERT INTO check_times (run_id, name, calls, seconds) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (run_id, name, check_time.calls, check_time.seconds)
+                    for name, check_time in run.check_times.items()
+                ],
+            )
+        run.id = run_id
+        return run_id
+
+    def get(self, run_id: int) -> BenchmarkRun:
+        row = self.connection.execute(
+            "SELECT id, timestamp, label, flake8_pyi_version, python_version, "
+            "compiled, corpus_hash, files, peak_rss FROM runs WHERE id = ?",
+            (run_id,),
+        ).fetchone()
+        if row is None:
+            raise KeyError(run_id)
+        run_id, timestamp, label, version, python_version, compiled, *rest = row
+        corpus_hash, files, peak_rss = rest
+        samples = [
+            sample
+            for (sample,) in self.connection.execute(
+                "SELECT files_per_second FROM samples WHERE run_id = ? ORDER BY rowid",
+                (run_id,),
+            )
+        ]
+        check_times = {
+            name: CheckTime(calls, seconds)
+            for name, calls, seconds in self.connection.execute(
+                "SELECT name, calls, seconds FROM check_times WHERE run_id = ?",
+                (run_id,),
+            )
+        }
+        return BenchmarkRun(
+            label=label,
+            flake8_pyi_version=version,
+            python_version=python_version,
+            compiled=bool(compiled),
+            corpus_hash=corpus_hash,
+            files=files,
+            peak_rss=peak_rss,
+            samples=samples,
+            check_times=check_times,
+            id=run_id,
+            timestamp=timestamp,
+        )
+
+    def run_ids(self) -> list[int]:
+        """Return the IDs of all runs, from the oldest to the latest."""
+        return [
+            run_id
+            for (run_id,) in self.connection.execute("SELECT id FROM runs ORDER BY id")
+        ]
+
+
+def _mann_whitney_p_value(old: Sequence[float], new: Sequence[float]) -> float:
+    """Return the one-sided p-value for `new` being smaller than `old`.
+
+    This is the Mann-Whitney U test, using the normal approximation
+    (with a continuity correction, and a correction for ties).
+    It doesn't assume that the samples are normally distributed,
+    which benchmark timings usually aren't.
+
+    >>> round(_mann_whitney_p_value([10, 11, 12, 13, 14], [5, 6, 7, 8, 9]), 4)
+    0.0061
+    >>> round(_mann_whitney_p_value([10, 11, 12, 13, 14], [10, 11, 12, 13, 14]), 4)
+    0.5422
+    """
+    n_old, n_new = len(old), len(new)
+    ranked = sorted([(value, 0) for value in old] + [(value, 1) for value in new])
+    rank_sum_new = 0.0
+    tie_correction = 0.0
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j < len(ranked) and ranked[j][0] == ranked[i][0]:
+            j += 1
+        # Tied values all get the average of the ranks they span (1-based)
+        average_rank = (i + j + 1) / 2
+        rank_sum_new += average_rank * sum(group for _, group in ranked[i:j])
+        tie_correction += (j - i) ** 3 - (j - i)
+        i = j
+    u_new = rank_sum_new - n_new * (n_new + 1) / 2
+    n = n_old + n_new
+    mean = n_old * n_new / 2
+    variance = n_old * n_new / 12 * (n + 1 - tie_correction / (n * (n - 1)))
+    if variance == 0:
+        return 0.5
+    z = (u_new - mean + 0.5) / math.sqrt(variance)
+    return statistics.NormalDist().cdf(z)
+
+
+def _smallest_p_value(n_old: int, n_new: int) -> float:
+    """Return the smallest p-value that samples of these sizes can give.
+
+    With too few samples, no drop in throughput is ever significant:
+
+    >>> round(_smallest_p_value(2, 2), 4), round(_smallest_p_value(3, 3), 4)
+    (0.1226, 0.0404)
+    """
+    # The most extreme outcome: all new samples are smaller than the old ones
+    return _mann_whitney_p_value(range(n_new, n_new + n_old), range(n_new))
+
+
+class Comparison(NamedTuple):
+    # Relative change in median throughput, e.g. -0.1 if it dropped by 10%
+    change: float
+    p_value: float
+    regressed: bool
+
+
+def compare_runs(
+    old: BenchmarkRun, new: BenchmarkRun, *, threshold: float, alpha: float
+) -> Comparison:
+    """Compare the throughput of two runs.
+
+    The throughput regressed if its median dropped by more than `threshold`
+    (relative to the old median), and if a drop at least that large is
+    statistically significant at the level `alpha`.
+    """
+    change = new.median / old.median - 1
+    # Test whether the new samples are smaller than the old ones scaled down
+    # by the threshold, so that a drop that is significant, but smaller than
+    # the threshold, isn't reported
+    scaled_old = [sample * (1 - threshold) for sample in old.samples]
+    p_value = _mann_whitney_p_value(scaled_old, new.samples)
+    return Comparison(
+        change, p_value, regressed=change < -threshold and p_value < alpha
+    )
+
+
+def _format_run(run: BenchmarkRun) -> str:
+    build = "compiled" if run.compiled else "pure Python"
+    peak_rss = "?" if run.peak_rss is None else f"{run.peak_rss / 2**20:.1f} MiB"
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run.timestamp))
+    return (
+        f"#{run.id} {timestamp} {run.label or '-'}: flake8-pyi "
+        f"{run.flake8_pyi_version} ({build}), Python {run.python_version}, "
+        f"{run.files} files (corpus {run.corpus_hash[:12]}), "
+        f"{run.median:.1f} files/s, peak RSS {peak_rss}"
+    )
+
+
+def _print_check_changes(
+    old: BenchmarkRun, new: BenchmarkRun, *, top: int = 10
+) -> None:
+    changes = []
+    for name in old.check_times.keys() & new.check_times.keys():
+        old_seconds = old.check_times[name].seconds
+        new_seconds = new.check_times[name].seconds
+        if not (old.check_times[name].calls or new.check_times[name].calls):
+            continue
+        changes.append((new_seconds - old_seconds, name, old_seconds, new_seconds))
+    if not changes:
+        return
+    changes.sort(key=lambda change: abs(change[0]), reverse=True)
+    print(f"Checks with the largest changes in total time (top {top}):")
+    for difference, name, old_seconds, new_seconds in changes[:top]:
+        print(
+            f"  {difference * 1000:+9.1f} ms  "
+            f"{old_seconds * 1000:9.1f} -> {new_seconds * 1000:9.1f} ms  {name}"
+        )
+
+
+def _run(args: argparse.Namespace, store: BenchmarkStore) -> int:
+    run = run_benchmark(args.paths, repeat=args.repeat, label=args.label)
+    store.add(run)
+    print(_format_run(run))
+    return 0
+
+
+def _compare(args: argparse.Namespace, store: BenchmarkStore) -> int:
+    run_ids = store.run_ids()
+    if args.old is None and len(run_ids) < 2:
+        print("At least two runs are needed for a comparison", file=sys.stderr)
+        return 2
+    try:
+        old = store.get(run_ids[-2] if args.old is None else args.old)
+        new = store.get(run_ids[-1] if args.new is None else args.new)
+    except KeyError as e:
+        print(f"No run with ID {e}", file=sys.stderr)
+        return 2
+    if not (old.samples and new.samples):
+        print("Runs without samples can't be compared", file=sys.stderr)
+        return 2
+    print(f"old: {_format_run(old)}")
+    print(f"new: {_format_run(new)}")
+    if old.corpus_hash != new.corpus_hash:
+        if not args.allow_different_corpus:
+            print(
+                "The runs used different corpora, so their throughput can't be "
+                "compared (use --allow-different-corpus to compare them anyway)",
+                file=sys.stderr,
+            )
+            return 2
+        print("note: the runs used different corpora")
+    smallest_p_value = _smallest_p_value(len(old.samples), len(new.samples))
+    if smallest_p_value >= args.alpha:
+        print(
+            f"The runs have too few samples ({len(old.samples)} and "
+            f"{len(new.samples)}) for a drop in throughput to be significant "
+            f"at alpha = {args.alpha} (the smallest possible p-value is "
+            f"{smallest_p_value:.3f}); use a larger --repeat",
+            file=sys.stderr,
+        )
+        return 2
+    comparison = compare_runs(old, new, threshold=args.threshold, alpha=args.alpha)
+    verdict = "REGRESSION" if comparison.regressed else "ok"
+    print(
+        f"Throughput changed by {comparison.change:+.1%} "
+        f"(threshold -{args.threshold:.0%}, p = {comparison.p_value:.3f}): {verdict}"
+    )
+    _print_check_changes(old, new)
+    return int(comparison.regressed)
+
+
+def _list(args: argparse.Namespace, store: BenchmarkStore) -> int:
+    for run_id in store.run_ids():
+        print(_format_run(store.get(run_id)))
+    return 0
+
+
+def _allocations(args: argparse.Namespace) -> int:
+    allocations = measure_allocations(args.paths)
+    print(
+        f"{allocations.files} files, {allocations.ast_nodes} AST nodes: "
+        f"{allocations.peak_bytes_per_1000_nodes:,.0f} bytes of peak traced "
+        "memory per 1,000 AST nodes while visiting"
+    )
+    return 0
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m flake8_pyi.benchmark",
+        description="Benchmark flake8-pyi and track the results over time.",
+    )
+    parser.add_argument(
+        "--database",
+        default=".flake8_pyi_benchmarks.sqlite",
+        help="SQLite database that results are stored in "
+        "(default: .flake8_pyi_benchmarks.sqlite)",
+    )
+    subparsers = parser.add_subparsers(required=True)
+
+    run_parser = subparsers.add_parser("run", help="benchmark a corpus of stubs")
+    run_parser.add_argument("paths", nargs="+", help="stubs (or directories) to lint")
+    run_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help=f"number of times the corpus is linted, at least {_MIN_REPEAT} "
+        "(default: 5)",
+    )
+    run_parser.add_argument(
+        "--label", default="", help="description of the run, e.g. a commit hash"
+    )
+    run_parser.set_defaults(command=_run)
+
+    compare_parser = subparsers.add_parser(
+        "compare",
+        help="compare two runs, exiting with 1 if throughput regressed",
+        description="Compare two runs (by default, the previous run "
+        "with the latest one), exiting with 1 if throughput regressed.",
+    )
+    compare_parser.add_argument("old", type=int, nargs="?", help="ID of the old run")
+    compare_parser.add_argument("new", type=int, nargs="?", help="ID of the new run")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.05,
+        help="relative drop in throughput that is considered a regression "
+        "(default: 0.05)",
+    )
+    compare_parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.05,
+        help="significance level for the drop in throughput (default: 0.05)",
+    )
+    compare_parser.add_argument(
+        "--allow-different-corpus",
+        action="store_true",
+        help="compare runs even if they linted different corpora",
+    )
+    compare_parser.set_defaults(command=_compare)
+
+    list_parser = subparsers.add_parser("list", help="list all runs")
+    list_parser.set_defaults(command=_list)
+
+    allocations_parser = subparsers.add_parser(
+        "allocations",
+        help="measure the memory allocated while visiting a corpus of stubs",
+        description="Measure the peak memory traced by tracemalloc while "
+        "visiting each stub, per 1,000 AST nodes. Run it before and after "
+        "a change to the visitor to compare them.",
+    )
+    allocations_parser.add_argument(
+        "paths", nargs="+", help="stubs (or directories) to visit"
+    )
+    allocations_parser.set_defaults(command=_allocations)
+
+    args = parser.parse_args(argv)
+    if args.command is _compare and (args.old is None) != (args.new is None):
+        parser.error("compare takes either no run IDs or two of them")
+    if args.command is _run and args.repeat < _MIN_REPEAT:
+        parser.error(
+            f"--repeat must be at least {_MIN_REPEAT}, "
+            "so that runs can be compared reliably"
+        )
+    if args.command is _allocations:
+        # Allocations aren't stored, so the database isn't needed
+        result: int = args.command(args)
+    else:
+        with closing(BenchmarkStore(args.database)) as store:
+            result = args.command(args, store)
+    return result
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,20 @@
 from __future__ import annotations
 
+import argparse
 import ast
 import logging
 import re
-from collections.abc import Iterator
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
-from typing import ClassVar
+from typing import TYPE_CHECKING, ClassVar
 
 from flake8.options.manager import OptionManager
+from flake8.style_guide import Decision, DecisionEngine
 
-from . import errors, visitor
+from . import errors
+
+if TYPE_CHECKING:
+    from .visitor import Budget
 
 LOG = logging.getLogger("flake8.pyi")
 
@@ -17,8 +22,10 @@ LOG = logging.getLogger("flake8.pyi")
 _TYPE_COMMENT_REGEX = re.compile(r"#\s*type:\s*(?!\s?ignore)([^#]+)(\s*#.*?)?$")
 
 
-def _check_for_type_comments(lines: list[str]) -> Iterator[errors.Error]:
-    for lineno, line in enumerate(lines, start=1):
+def _check_for_type_comments(
+    lines: Iterable[str], *, first_lineno: int = 1
+) -> Iterator[errors.Error]:
+    for lineno, line in enumerate(lines, start=first_lineno):
         cleaned_line = line.strip()
 
         if cleaned_line.startswith("#"):
@@ -38,6 +45,15 @@ def _check_for_type_comments(lines: list[str]) -> Iterator[errors.Error]:
 @dataclass
 class PyiTreeChecker:
     name: ClassVar[str] = "flake8-pyi"
+    # flake8's options, as passed to parse_options(). They are only applied
+    # when the first stub is checked, so that the visitor module isn't even
+    # imported by flake8 runs that don't lint any stubs.
+    options: ClassVar[argparse.Namespace | None] = None
+    # Error codes that flake8 is configured to ignore everywhere.
+    # Rules that can only emit these codes are skipped.
+    disabled_codes: ClassVar[frozenset[str]] = frozenset()
+    # Per-file resource limits, set with the --pyi-max-* options
+    budget: ClassVar[Budget | None] = None
     tree: ast.Module
     lines: list[str]
     filename: str = "(none)"
@@ -45,9 +61,61 @@ class PyiTreeChecker:
     def run(self) -> Iterator[errors.Error]:
         if self.filename.endswith(".pyi"):
             yield from _check_for_type_comments(self.lines)
-            yield from visitor.PyiVisitor(filename=self.filename).run(self.tree)
+            if self.options is not None:
+                self._apply_options(self.options)
+            from .visitor import PyiVisitor
+
+            pyi_visitor = PyiVisitor(
+                filename=self.filename,
+                disabled_codes=self.disabled_codes,
+                budget=self.budget,
+                lines=self.lines,
+            )
+            yield from pyi_visitor.run(self.tree)
 
     @staticmethod
     def add_options(parser: OptionManager) -> None:
         parser.parser.set_defaults(filename="*.py,*.pyi")
         parser.extend_default_ignore(errors.DISABLED_BY_DEFAULT)
+        parser.add_option(
+            "--pyi-max-seconds",
+            type=float,
+            parse_from_config=True,
+            help="Stop checking a stub with Y070 "
+            "if checking it takes longer than this many seconds",
+        )
+        parser.add_option(
+            "--pyi-max-findings",
+            type=int,
+            parse_from_config=True,
+            help="Stop checking a stub with Y070 if it has more errors than this",
+        )
+        parser.add_option(
+            "--pyi-max-nodes",
+            type=int,
+            parse_from_config=True,
+            help="Stop checking a stub with Y070 if it has more AST nodes than this",
+        )
+
+    @classmethod
+    def parse_options(cls, options: argparse.Namespace) -> None:
+        cls.options = options
+
+    @classmethod
+    def _apply_options(cls, options: argparse.Namespace) -> None:
+        from .visitor import RULES, Budget
+
+        cls.options = None
+        decision_engine = DecisionEngine(options)
+        cls.disabled_codes = frozenset(
+            code
+            for rule in RULES
+            for code in rule.codes
+            if decision_engine.decision_for(code) is Decision.Ignored
+        )
+        budget = Budget(
+            max_seconds=options.pyi_max_seconds,
+            max_findings=options.pyi_max_findings,
+            max_nodes=options.pyi_max_nodes,
+        )
+        cls.budget = None if budget == Budget() else budget
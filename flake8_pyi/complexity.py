@@ -0,0 +1,346 @@
+"""Find the stubs in a corpus that will be expensive to lint, before linting them.
+
+Each stub is parsed, but not checked, and the structure of its AST is measured:
+the number of nodes, how deeply they are nested, the widest union,
+the largest `Literal[]`, and the number of functions, overloads and
+`sys.version_info` branches. Linting time is roughly proportional to
+the number of nodes, although functions and `Literal[]` members are more
+expensive to check than other nodes, so each stub also gets an estimate
+of how long linting it will take.
+
+The report lists the most expensive stubs, and suggests limits for the
+standalone runner's `--max-*-per-file` options that the corpus stays well
+within. With `--json`, the statistics for every stub are written
+as JSON instead, e.g. for deciding how to shard a corpus in CI.
+
+Usage:
+
+    python -m flake8_pyi.complexity path/to/stubs
+    python -m flake8_pyi.complexity path/to/stubs --json > complexity.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import dataclasses
+import json
+import math
+import os
+import sys
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from functools import partial
+from typing import Any
+
+from . import archives
+from .runner import (
+    _SPLIT_THRESHOLD,
+    _map_in_parallel,
+    _parse,
+    _parse_jobs,
+    _read_source,
+    iter_stub_files,
+)
+from .visitor import _TYPING_MODULES, _is_Literal, _is_object, _is_overload, _is_union
+
+_is_Union = partial(_is_object, name="Union", from_=_TYPING_MODULES)
+
+# The estimated cost of linting (and parsing) a stub with the pure Python visitor,
+# in seconds. They were fitted to the time taken to lint each stub in typeshed,
+# and to lint stubs with huge `Literal[]`s, which typeshed doesn't have.
+# The estimates are rough: they are within 20% of the actual time
+# for about half of the stubs with more than 5000 nodes.
+_SECONDS_PER_STUB = 5e-5
+_SECONDS_PER_NODE = 3e-6
+# Signatures are checked in more ways than other nodes are
+_EXTRA_SECONDS_PER_FUNCTION = 5e-5
+# Members of `Literal[]` are checked for duplicates, redundant unions etc.
+_EXTRA_SECONDS_PER_LITERAL_MEMBER = 5e-6
+
+# How far the suggested limits for the runner are above the largest stub
+_BUDGET_HEADROOM = 2
+# The lowest limits that are suggested, so that a corpus of small stubs
+# doesn't get limits that any slightly larger stub would exceed
+_MIN_BUDGET_NODES = 10_000
+_MIN_BUDGET_SECONDS = 1.0
+
+
+@dataclass
+class StubComplexity:
+    """Statistics about the structure of a stub's AST."""
+
+    path: str
+    size: int
+    nodes: int = 0
+    # The nesting depth of the most deeply nested node (the module has depth 1)
+    max_depth: int = 0
+    # The number of members of the widest union, `X | Y` or `Union[X, Y]`
+    max_union_width: int = 0
+    # The number of members of the largest `Literal[]`, and of all of them
+    max_literal_members: int = 0
+    literal_members: int = 0
+    # The number of functions and methods, including overloads
+    functions: int = 0
+    overloads: int = 0
+    # The number of `if` statements that check `sys.version_info`
+    version_branches: int = 0
+    # The error message, if the stub couldn't be parsed
+    syntax_error: str | None = None
+
+    @property
+    def estimated_seconds(self) -> float:
+        return (
+            _SECONDS_PER_STUB
+            + self.nodes * _SECONDS_PER_NODE
+            + self.functions * _EXTRA_SECONDS_PER_FUNCTION
+            + self.literal_members * _EXTRA_SECONDS_PER_LITERAL_MEMBER
+        )
+
+    @property
+    def split_into_parts(self) -> bool:
+        """Whether the runner checks the stub in parts, if it uses several processes."""
+        return self.size >= _SPLIT_THRESHOLD
+
+
+def _union_width(node: ast.BinOp) -> int:
+    # `X | Y | Z` parses as `(X | Y) | Z`, but the members can also be
+    # parenthesized the other way round
+    width = 0
+    to_count: list[ast.expr] = [node]
+    while to_count:
+        member = to_count.pop()
+        if _is_union(member):
+            to_count += (member.left, member.right)
+        else:
+            width += 1
+    return width
+
+
+def _slice_length(node: ast.Subscript) -> int:
+    if isinstance(node.slice, ast.Tuple):
+        return len(node.slice.elts)
+    return 1
+
+
+def _is_version_check(node: ast.expr) -> bool:
+    match node:
+        case ast.Compare(
+            left=ast.Attribute(value=ast.Name("sys"), attr="version_info")
+            | ast.Subscript(
+                value=ast.Attribute(value=ast.Name("sys"), attr="version_info")
+            )
+        ):
+            return True
+        case _:
+            return False
+
+
+def measure_tree(tree: ast.Module, stats: StubComplexity) -> None:
+    """Add the statistics about `tree` to `stats`.
+
+    >>> stats = StubComplexity("foo.pyi", size=0)
+    >>> measure_tree(ast.parse("x: Literal['a', 'b'] | int | None"), stats)
+    >>> stats.nodes, stats.max_depth, stats.max_union_width, stats.max_literal_members
+    (19, 7, 3, 2)
+    """
+    # The tree is walked with an explicit stack, like the visitor walks it,
+    # as expressions in generated stubs can be nested very deeply
+    to_visit: list[tuple[ast.AST, int, bool]] = [(tree, 1, False)]
+    while to_visit:
+        node, depth, in_union = to_visit.pop()
+        stats.nodes += 1
+        stats.max_depth = max(stats.max_depth, depth)
+        is_union = isinstance(node, ast.expr) and _is_union(node)
+        match node:
+            case ast.BinOp() if is_union and not in_union:
+                stats.max_union_width = max(stats.max_union_width, _union_width(node))
+            case ast.Subscript(value=value) if _is_Union(value):
+                stats.max_union_width = max(stats.max_union_width, _slice_length(node))
+            case ast.Subscript(value=value) if _is_Literal(value):
+                members = _slice_length(node)
+                stats.max_literal_members = max(stats.max_literal_members, members)
+                stats.literal_members += members
+            case ast.FunctionDef() | ast.AsyncFunctionDef():
+                stats.functions += 1
+                if any(map(_is_overload, node.decorator_list)):
+                    stats.overloads += 1
+            case ast.If(test=test) if _is_version_check(test):
+                stats.version_branches += 1
+        to_visit.extend(
+            (child, depth + 1, is_union) for child in ast.iter_child_nodes(node)
+        )
+
+
+def measure_source(source: str | bytes, path: str) -> StubComplexity:
+    """Parse the stub `source` and measure its structure."""
+    stats = StubComplexity(path, size=len(source))
+    try:
+        tree = _parse(source, path)
+    except SyntaxError as e:
+        stats.syntax_error = f"{type(e).__name__}: {e.msg}"
+        return stats
+    measure_tree(tree, stats)
+    return stats
+
+
+def measure_file(path: str) -> list[StubComplexity]:
+    """Measure the stub at `path`, or each stub in the archive at `path`."""
+    if archives.is_archive(path):
+        return [
+            measure_source(source, f"{path}!{member}")
+            for member, source in archives.iter_archive_stubs(path)
+        ]
+    return [measure_source(_read_source(path), path)]
+
+
+def measure_corpus(
+    paths: Iterable[str], *, jobs: int | None = 1
+) -> list[StubComplexity]:
+    """Measure all the stubs in `paths`, recursing into directories."""
+    results = _map_in_parallel(measure_file, iter_stub_files(paths), jobs=jobs)
+    return [stats for file_stats in results for stats in file_stats]
+
+
+def _round_up(value: float) -> float:
+    """Round `value` up to two significant digits.
+
+    >>> _round_up(12345), _round_up(0.0123)
+    (13000, 0.013)
+    """
+    if value <= 0:
+        return 0
+    scale: float = 10 ** (math.floor(math.log10(value)) - 1)
+    return round(math.ceil(value / scale) * scale, 10)
+
+
+def suggest_budget(corpus: Sequence[StubComplexity]) -> dict[str, float]:
+    """Suggest limits for the runner's `--max-*-per-file` options.
+
+    They are well above what any stub in `corpus` needs, so that only
+    pathological stubs added to the corpus later will exceed them.
+    Stubs that couldn't be parsed are ignored; if none could be parsed,
+    no limits are suggested.
+    """
+    parsed = [stats for stats in corpus if stats.syntax_error is None]
+    if not parsed:
+        return {}
+    max_nodes = max(stats.nodes for stats in parsed)
+    max_seconds = max(stats.estimated_seconds for stats in parsed)
+    return {
+        "--max-nodes-per-file": max(
+            int(_round_up(max_nodes * _BUDGET_HEADROOM)), _MIN_BUDGET_NODES
+        ),
+        "--max-seconds-per-file": max(
+            _round_up(max_seconds * _BUDGET_HEADROOM), _MIN_BUDGET_SECONDS
+        ),
+    }
+
+
+# The columns of the report, and the attributes they're taken from
+_COLUMNS = (
+    ("nodes", "nodes"),
+    ("depth", "max_depth"),
+    ("union", "max_union_width"),
+    ("literal", "max_literal_members"),
+    ("functions", "functions"),
+    ("overloads", "overloads"),
+    ("versions", "version_branches"),
+)
+
+
+def _print_report(corpus: Sequence[StubComplexity], *, top: int) -> None:
+    total_seconds = sum(stats.estimated_seconds for stats in corpus)
+    print(
+        f"{len(corpus)} stubs, {sum(stats.nodes for stats in corpus)} AST nodes, "
+        f"estimated {total_seconds:.1f}s to lint"
+    )
+    if not corpus:
+        return
+
+    print("\nMost expensive stubs (estimated):")
+    header = "".join(f"{name:>10}" for name, _ in _COLUMNS)
+    print(f"{'ms':>9}{header}  path")
+    by_cost = sorted(corpus, key=lambda stats: stats.estimated_seconds, reverse=True)
+    for stats in by_cost[:top]:
+        values = "".join(f"{getattr(stats, attr):>10}" for _, attr in _COLUMNS)
+        print(f"{stats.estimated_seconds * 1000:9.1f}{values}  {stats.path}")
+
+    print("\nLargest values:")
+    for name, attr in _COLUMNS:
+        largest = max(corpus, key=lambda stats: getattr(stats, attr))
+        print(f"  {name:>10} {getattr(largest, attr):>10}  {largest.path}")
+
+    unparsable = [stats for stats in corpus if stats.syntax_error is not None]
+    if unparsable:
+        print(
+            f"\n{len(unparsable)} stubs couldn't be parsed, e.g. {unparsable[0].path}"
+        )
+    split = [stats for stats in corpus if stats.split_into_parts]
+    if split:
+        print(
+            f"\n{len(split)} stubs are large enough to be checked in parts "
+            f"in parallel when the runner uses several worker processes"
+        )
+
+    budget = suggest_budget(corpus)
+    if budget:
+        print("\nSuggested limits for python -m flake8_pyi:")
+        print("  " + " ".join(f"{option} {value}" for option, value in budget.items()))
+
+
+def _to_json(corpus: Sequence[StubComplexity]) -> dict[str, Any]:
+    return {
+        "stubs": [
+            {
+                **dataclasses.asdict(stats),
+                "estimated_seconds": stats.estimated_seconds,
+                "split_into_parts": stats.split_into_parts,
+            }
+            for stats in corpus
+        ],
+        "suggested_budget": suggest_budget(corpus),
+    }
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m flake8_pyi.complexity",
+        description="Measure the structure of the stubs in a corpus, "
+        "and estimate how expensive they are to lint.",
+    )
+    parser.add_argument("paths", nargs="+", help="stubs (or directories) to measure")
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="number of stubs to list, most expensive first (default: 10)",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="write the statistics for every stub as JSON",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=_parse_jobs,
+        default="auto",
+        help='number of worker processes to use, or "auto" (the default) '
+        "to use one per CPU",
+    )
+    args = parser.parse_args(argv)
+    for path in args.paths:
+        if not os.path.exists(path):
+            parser.error(f"{path} does not exist")
+    corpus = measure_corpus(args.paths, jobs=args.jobs)
+    if args.json:
+        json.dump(_to_json(corpus), sys.stdout, indent=2)
+        print()
+    else:
+        _print_report(corpus, top=args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
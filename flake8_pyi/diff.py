@@ -0,0 +1,235 @@
+"""Compare the findings of two runs, e.g. before and after a change to flake8-pyi.
+
+A plain `diff` of flake8's output reports a finding as removed and re-added
+whenever an unrelated change shifts it to another line. Instead, findings
+are matched by a fingerprint that doesn't depend on line numbers:
+the file, the error code, the message, and the path of the class or
+function that encloses the finding (e.g. `Foo.bar`). Only findings whose
+fingerprint appears more (or less) often in one run than in the other
+are reported.
+
+Usage: `python -m flake8_pyi.diff old_errors.txt new_errors.txt`.
+The output uses the same `<` and `>` prefixes as `diff`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from collections.abc import Iterable, Iterator, Sequence
+from typing import NamedTuple, TextIO
+
+from .runner import Finding
+
+_FINDING_REGEX = re.compile(
+    r"^(?P<filename>.+?):(?P<lineno>\d+):(?P<col>\d+): (?P<code>\w+) (?P<message>.*)$"
+)
+
+
+def parse_findings(lines: Iterable[str]) -> Iterator[Finding]:
+    """Parse flake8's default output format, skipping lines that don't match it.
+
+    >>> [finding] = parse_findings(["foo.pyi:1:4: Y020 Quoted annotations ...\\n"])
+    >>> finding
+    Finding(filename='foo.pyi', lineno=1, col=3, code='Y020', message='Quoted annotations ...')
+    >>> str(finding)
+    'foo.pyi:1:4: Y020 Quoted annotations ...'
+    """
+    for line in lines:
+        if match := _FINDING_REGEX.match(line.rstrip("\n")):
+            yield Finding(
+                match["filename"],
+                int(match["lineno"]),
+                int(match["col"]) - 1,
+                match["code"],
+                match["message"],
+            )
+
+
+class Fingerprint(NamedTuple):
+    filename: str
+    code: str
+    # The dotted path of the innermost enclosing class or function,
+    # "" at module level, or None if the source isn't available
+    definition: str | None
+    message: str
+
+
+_DEFINITION_REGEX = re.compile(r"(?:async\s+)?(?:def|class)\s+(\w+)")
+
+
+def _definitions_by_line(source: str) -> list[str]:
+    """Map each line of a module to the path of its enclosing definition.
+
+    >>> _definitions_by_line(
+    ...     "class A:\\n"
+    ...     "    @overload\\n"
+    ...     "    def f(\\n"
+    ...     "        self,\\n"
+    ...     "    ) -> None: ...\\n"
+    ...     "    x: int\\n"
+    ...     "y: int\\n"
+    ... )
+    ['', 'A', 'A.f', 'A.f', 'A.f', 'A.f', 'A', '']
+
+    Parsing every stub with `ast` would be much slower than scanning
+    its lines for definitions and tracking their indentation.
+    The scan can be fooled, e.g. by brackets in strings,
+    but that would only make a finding that moved show up
+    as disappeared and appeared.
+    """
+    # Index 0 is unused, as line numbers start at 1
+    definitions = [""]
+    # The indentation and path of each enclosing definition
+    scopes: list[tuple[int, str]] = []
+    # Unclosed brackets before the current line
+    depth = 0
+    # The first of the decorator lines preceding a definition
+    decorators_start: int | None = None
+    for line in source.splitlines():
+        stripped = line.lstrip()
+        if depth == 0 and stripped and not stripped.startswith("#"):
+            indentation = len(line) - len(stripped)
+            while scopes and scopes[-1][0] >= indentation:
+                scopes.pop()
+            if match := _DEFINITION_REGEX.match(stripped):
+                path = f"{scopes[-1][1]}.{match[1]}" if scopes else match[1]
+                scopes.append((indentation, path))
+                if decorators_start is not None:
+                    for lineno in range(decorators_start, len(definitions)):
+                        definitions[lineno] = path
+            if not stripped.startswith("@"):
+                decorators_start = None
+            elif decorators_start is None:
+                decorators_start = len(definitions)
+        definitions.append(scopes[-1][1] if scopes else "")
+        depth += sum(map(line.count, "([{")) - sum(map(line.count, ")]}"))
+        depth = max(depth, 0)
+    return definitions
+
+
+class DefinitionIndex:
+    """Find the enclosing definitions of findings in the stubs below `root`.
+
+    Each stub is parsed at most once, and only if it has findings.
+    """
+
+    def __init__(self, root: str | None) -> None:
+        self.root = root
+        self._definitions: dict[str, list[str] | None] = {}
+
+    def _load(self, filename: str) -> list[str] | None:
+        if self.root is None:
+            return None
+        try:
+            with open(os.path.join(self.root, filename), encoding="utf-8") as file:
+                return _definitions_by_line(file.read())
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def definition(self, filename: str, lineno: int) -> str | None:
+        if filename not in self._definitions:
+            self._definitions[filename] = self._load(filename)
+        definitions = self._definitions[filename]
+        if definitions is None:
+            return None
+        if lineno >= len(definitions):
+            return ""
+        return definitions[lineno]
+
+    def fingerprint(self, finding: Finding) -> Fingerprint:
+        return Fingerprint(
+            finding.filename,
+            finding.code,
+            self.definition(finding.filename, finding.lineno),
+            # Whitespace is normalized, as it's not significant in messages
+            " ".join(finding.message.split()),
+        )
+
+
+def diff_findings(
+    old: Iterable[Finding],
+    new: Iterable[Finding],
+    *,
+    old_index: DefinitionIndex | None = None,
+    new_index: DefinitionIndex | None = None,
+) -> tuple[list[Finding], list[Finding]]:
+    """Return the findings that disappeared and appeared between two runs.
+
+    Findings are matched by their fingerprint, in linear time.
+    If a fingerprint occurs more often in one of the runs,
+    the surplus findings (in the order they were given) are reported.
+    Without a `DefinitionIndex` for a run, findings are only matched
+    by their file, code and message.
+    """
+    old_index = old_index or DefinitionIndex(None)
+    new_index = new_index or DefinitionIndex(None)
+    old_by_fingerprint: defaultdict[Fingerprint, list[Finding]] = defaultdict(list)
+    for finding in old:
+        old_by_fingerprint[old_index.fingerprint(finding)].append(finding)
+    new_by_fingerprint: defaultdict[Fingerprint, list[Finding]] = defaultdict(list)
+    for finding in new:
+        new_by_fingerprint[new_index.fingerprint(finding)].append(finding)
+
+    counts = Counter({key: len(value) for key, value in new_by_fingerprint.items()})
+    counts.subtract({key: len(value) for key, value in old_by_fingerprint.items()})
+    disappeared: list[Finding] = []
+    appeared: list[Finding] = []
+    for fingerprint, difference in counts.items():
+        if difference < 0:
+            disappeared += old_by_fingerprint[fingerprint][difference:]
+        elif difference > 0:
+            appeared += new_by_fingerprint[fingerprint][-difference:]
+    disappeared.sort()
+    appeared.sort()
+    return disappeared, appeared
+
+
+def _print_diff(
+    disappeared: Sequence[Finding], appeared: Sequence[Finding], output: TextIO
+) -> None:
+    for finding in disappeared:
+        print(f"< {finding}", file=output)
+    for finding in appeared:
+        print(f"> {finding}", file=output)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m flake8_pyi.diff",
+        description="Compare the output of two flake8 runs, "
+        "ignoring findings that only moved to another line.",
+    )
+    parser.add_argument("old", help="output of the old run")
+    parser.add_argument("new", help="output of the new run")
+    parser.add_argument(
+        "--old-root",
+        default=os.curdir,
+        help="directory that the paths in the old output are relative to "
+        "(default: the current directory)",
+    )
+    parser.add_argument(
+        "--new-root",
+        help="directory that the paths in the new output are relative to "
+        "(default: the same as --old-root)",
+    )
+    args = parser.parse_args(argv)
+    with open(args.old, encoding="utf-8") as file:
+        old = list(parse_findings(file))
+    with open(args.new, encoding="utf-8") as file:
+        new = list(parse_findings(file))
+    disappeared, appeared = diff_findings(
+        old,
+        new,
+        old_index=DefinitionIndex(args.old_root),
+        new_index=DefinitionIndex(args.new_root or args.old_root),
+    )
+    _print_diff(disappeared, appeared, sys.stdout)
+    return int(bool(disappeared or appeared))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -128,6 +128,9 @@ Y066 = (
 )
 Y067 = 'Y067 Use "=None" instead of "Incomplete | None = None"'
 Y068 = 'Y068 Do not use "@override" in stub files.'
+# Only reported by the standalone runner's --project mode
+Y069 = 'Y069 "{name}" is defined in private module "{module}", but is never used'
+Y070 = "Y070 Stopped checking this file, because {reason}"
 
 Y090 = (
     'Y090 "{original}" means '
@@ -0,0 +1,160 @@
+"""Export statistics about a run of the standalone runner.
+
+The statistics are written in the OpenMetrics text format,
+so that they can be picked up by e.g. node-exporter's textfile collector.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # Import is only needed for type annotations,
+    # and causes a circular import if it's imported at runtime.
+    from .runner import FileStats, Finding
+
+# Upper bounds of the buckets for the per-file latency histogram, in seconds
+_LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class LintMetrics:
+    """Aggregate statistics about the files linted in a run.
+
+    The statistics for each file are collected in the worker process
+    that linted the file, and aggregated here in the parent process.
+
+    >>> from flake8_pyi.runner import FileStats, Finding
+    >>> metrics = LintMetrics()
+    >>> finding = Finding("foo.pyi", 1, 0, "Y020", "Quoted annotations ...")
+    >>> stats = FileStats("foo.pyi", ast_nodes=7, seconds=0.02)
+    >>> metrics.record_file(stats)
+    >>> metrics.record_findings([finding])
+    >>> print(metrics.render(timestamp=0), end="")  # doctest: +ELLIPSIS
+    # TYPE flake8_pyi_files_linted counter
+    # HELP flake8_pyi_files_linted Number of files linted.
+    flake8_pyi_files_linted_total 1
+    ...
+    flake8_pyi_findings_total{code="Y020"} 1
+    ...
+    flake8_pyi_file_lint_seconds_bucket{le="0.01"} 0
+    flake8_pyi_file_lint_seconds_bucket{le="0.025"} 1
+    ...
+    # EOF
+    """
+
+    def __init__(self) -> None:
+        self.files_linted = 0
+        self.ast_nodes = 0
+        self.findings_by_code: Counter[str] = Counter()
+        # One count per bucket, plus one for the implicit "+Inf" bucket
+        self.latency_counts = [0] * (len(_LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def record_file(self, stats: FileStats) -> None:
+        self.files_linted += 1
+        self.ast_nodes += stats.ast_nodes
+        self.latency_counts[bisect_left(_LATENCY_BUCKETS, stats.seconds)] += 1
+        self.latency_sum += stats.seconds
+
+    def record_findings(self, findings: Iterable[Finding]) -> None:
+        # Findings are recorded separately from the files they are in,
+        # as findings from --typeshed's cache are reported without linting a file
+        self.findings_by_code.update(finding.code for finding in findings)
+
+    def record_cache_lookup(self, *, hit: bool) -> None:
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+
+    def render(self, *, timestamp: float | None = None) -> str:
+        """Render the metrics in the OpenMetrics text format."""
+        if timestamp is None:
+            timestamp = time.time()
+        lines: list[str] = []
+
+        def add_family(name: str, metric_type: str, description: str) -> None:
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.append(f"# HELP {name} {description}")
+
+        add_family("flake8_pyi_files_linted", "counter", "Number of files linted.")
+        lines.append(f"flake8_pyi_files_linted_total {self.files_linted}")
+        add_family(
+            "flake8_pyi_ast_nodes", "counter", "Number of AST nodes in linted files."
+        )
+        lines.append(f"flake8_pyi_ast_nodes_total {self.ast_nodes}")
+        add_family("flake8_pyi_findings", "counter", "Number of findings by code.")
+        for code, count in sorted(self.findings_by_code.items()):
+            lines.append(f'flake8_pyi_findings_total{{code="{code}"}} {count}')
+
+        add_family(
+            "flake8_pyi_file_lint_seconds",
+            "histogram",
+            "Time taken to lint each file, in seconds.",
+        )
+        cumulative_count = 0
+        for upper_bound, count in zip(
+            (*map(str, _LATENCY_BUCKETS), "+Inf"), self.latency_counts, strict=True
+        ):
+            cumulative_count += count
+            lines.append(
+                f'flake8_pyi_file_lint_seconds_bucket{{le="{upper_bound}"}} '
+                f"{cumulative_count}"
+            )
+        lines.append(f"flake8_pyi_file_lint_seconds_sum {self.latency_sum}")
+        lines.append(f"flake8_pyi_file_lint_seconds_count {cumulative_count}")
+
+        if self.cache_hits or self.cache_misses:
+            add_family(
+                "flake8_pyi_cache_lookups",
+                "counter",
+                "Number of lookups in the --typeshed cache, by result.",
+            )
+            for result, count in (
+                ("hit", self.cache_hits),
+                ("miss", self.cache_misses),
+            ):
+                lines.append(
+                    f'flake8_pyi_cache_lookups_total{{result="{result}"}} {count}'
+                )
+
+        add_family(
+            "flake8_pyi_last_run_timestamp_seconds",
+            "gauge",
+            "When the run finished, as a Unix timestamp.",
+        )
+        lines.append(f"flake8_pyi_last_run_timestamp_seconds {timestamp}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Write the metrics to `path`.
+
+        The file is replaced atomically,
+        so that a collector never reads a partially written file.
+        """
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            file.write(self.render())
+        os.replace(temporary_path, path)
@@ -0,0 +1,185 @@
+"""Attribute memory allocations to stub files and to flake8-pyi's checks.
+
+Profiling is based on `tracemalloc`, and is much slower than a normal run.
+It is only meant for tracking down stubs (or checks) that make
+linting use far more memory than expected.
+"""
+
+from __future__ import annotations
+
+import ast
+import functools
+import os
+import tracemalloc
+import types
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+from . import visitor
+
+_T = TypeVar("_T")
+
+# Module-level helpers that are instrumented in addition to PyiVisitor's methods
+_INSTRUMENTED_FUNCTIONS = (
+    "_analyse_union",
+    "_analyse_typing_Literal",
+    "_analyze_classdef",
+    "_check_import_or_attribute",
+)
+
+# PyiVisitor methods that are never worth instrumenting
+_IGNORED_METHODS = frozenset(
+    {
+        "__init__",
+        "__repr__",
+        "visit",
+        "generic_visit",
+        "_visitor_method",
+        "_charge_for_node",
+        "error",
+        "run",
+    }
+)
+
+
+@dataclass
+class AllocationStats:
+    calls: int = 0
+    # Largest increase in traced memory during a single call, in bytes
+    max_peak: int = 0
+    # Where the call with the largest peak happened
+    max_peak_location: str = ""
+    # Sum of the memory still allocated after each call, in bytes
+    total_net: int = 0
+
+
+@dataclass
+class _Frame:
+    start: int
+    peak: int
+
+
+class MemoryProfiler:
+    """Record allocation peaks per linted file and per visitor handler.
+
+    Handlers are instrumented while `MemoryProfiler.instrumented()` is active.
+    Nested handlers are accounted for correctly:
+    the peak of a handler includes the peaks of all handlers it calls.
+    """
+
+    def __init__(self) -> None:
+        self.files: dict[str, AllocationStats] = {}
+        self.handlers: dict[str, AllocationStats] = {}
+        self._stack: list[_Frame] = []
+        self._current_file = ""
+
+    def _enter(self) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            self._stack[-1].peak = max(self._stack[-1].peak, peak)
+        tracemalloc.reset_peak()
+        self._stack.append(_Frame(start=current, peak=current))
+
+    def _exit(self, stats: AllocationStats, location: str) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        frame = self._stack.pop()
+        frame_peak = max(frame.peak, peak)
+        if self._stack:
+            self._stack[-1].peak = max(self._stack[-1].peak, frame_peak)
+        stats.calls += 1
+        stats.total_net += current - frame.start
+        if frame_peak - frame.start > stats.max_peak:
+            stats.max_peak = frame_peak - frame.start
+            stats.max_peak_location = location
+
+    def measure_file(self, function: Callable[[str], _T], path: str) -> _T:
+        """Call `function(path)`, attributing all allocations to `path`."""
+        self._current_file = path
+        stats = self.files.setdefault(path, AllocationStats())
+        self._enter()
+        try:
+            return function(path)
+        finally:
+            self._exit(stats, location=path)
+
+    def _location_of(self, args: tuple[Any, ...]) -> str:
+        for arg in args:
+            if isinstance(arg, ast.AST) and hasattr(arg, "lineno"):
+                return f"{self._current_file}:{arg.lineno}"
+        return self._current_file
+
+    def _instrument(self, name: str, function: Callable[..., _T]) -> Callable[..., _T]:
+        stats = self.handlers.setdefault(name, AllocationStats())
+
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> _T:
+            self._enter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._exit(stats, self._location_of(args))
+
+        return wrapper
+
+    @contextmanager
+    def instrumented(self) -> Iterator[None]:
+        """Trace allocations and instrument the visitor's handlers."""
+        originals: list[tuple[object, str, object]] = []
+        for name, attr in list(vars(visitor.PyiVisitor).items()):
+            if isinstance(attr, types.FunctionType) and name not in _IGNORED_METHODS:
+                originals.append((visitor.PyiVisitor, name, attr))
+                qualname = f"PyiVisitor.{name}"
+                setattr(visitor.PyiVisitor, name, self._instrument(qualname, attr))
+        for name in _INSTRUMENTED_FUNCTIONS:
+            function = getattr(visitor, name)
+            originals.append((visitor, name, function))
+            setattr(visitor, name, self._instrument(name, function))
+
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            tracemalloc.stop()
+            for owner, name, original in originals:
+                setattr(owner, name, original)
+
+    def report(self, *, top: int = 10) -> str:
+        """Return a human-readable report of the worst offenders."""
+        lines = [f"Files with the largest allocation peaks (top {top}):"]
+        worst_files = sorted(
+            self.files.items(), key=lambda item: item[1].max_peak, reverse=True
+        )
+        for path, stats in worst_files[:top]:
+            lines.append(
+                f"  {_kib(stats.max_peak):>10} peak {_kib(stats.total_net):>10} net"
+                f"  {path}"
+            )
+        lines.append(f"Handlers with the largest allocation peaks (top {top}):")
+        worst_handlers = sorted(
+            ((name, stats) for name, stats in self.handlers.items() if stats.calls),
+            key=lambda item: item[1].max_peak,
+            reverse=True,
+        )
+        for name, stats in worst_handlers[:top]:
+            lines.append(
+                f"  {_kib(stats.max_peak):>10} peak {_kib(stats.total_net):>10} net"
+                f"  {stats.calls:>8} calls  {name} ({_definition_site(name)})"
+                f", worst at {stats.max_peak_location}"
+            )
+        return "\n".join(lines)
+
+
+def _kib(size: int) -> str:
+    return f"{size / 1024:.1f} KiB"
+
+
+def _definition_site(handler_name: str) -> str:
+    owner: object = visitor
+    for part in handler_name.split("."):
+        owner = getattr(owner, part)
+    code = getattr(owner, "__code__", None)
+    if code is None:
+        return "?"
+    return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}"
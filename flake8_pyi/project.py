@@ -0,0 +1,166 @@
+"""Find unused definitions across all the stubs in a project.
+
+Each stub is indexed separately (in the worker process that lints it),
+recording which names it uses from other modules, and which of its own
+definitions it doesn't use itself. The indexes are then merged to find
+the definitions that aren't used anywhere in the project.
+"""
+
+from __future__ import annotations
+
+import ast
+import os
+from collections.abc import Iterable, Iterator
+from typing import NamedTuple
+
+from . import errors
+from .visitor import PyiVisitor, _dotted_name
+
+
+class UnusedDefinition(NamedTuple):
+    name: str
+    lineno: int
+    col: int
+    # The full error message, including the error code
+    message: str
+
+
+class ModuleIndex(NamedTuple):
+    module: str
+    path: str
+    # Names used from modules in the project, as `(module, name)` pairs.
+    # The name is "*" for star imports.
+    uses: frozenset[tuple[str, str]]
+    # Private definitions that are unused in this module (Y018, Y046, Y047, Y049)
+    unused_private: tuple[UnusedDefinition, ...]
+    # Public classes and functions in a private module,
+    # that are unused in this module
+    unused_public: tuple[UnusedDefinition, ...]
+
+
+def module_name(path: str, root: str) -> str:
+    """Return the name of the module defined by the stub at `path`.
+
+    `root` is the directory that would be on `sys.path`,
+    e.g. typeshed's `stdlib` directory.
+
+    >>> module_name(os.path.join("stdlib", "os", "__init__.pyi"), "stdlib")
+    'os'
+    >>> module_name(os.path.join("stdlib", "json", "decoder.pyi"), "stdlib")
+    'json.decoder'
+    >>> module_name("foo.pyi", "foo.pyi")
+    'foo'
+    """
+    if path == root:
+        relative_path = os.path.basename(path)
+    else:
+        relative_path = os.path.relpath(path, root)
+    parts = os.path.splitext(relative_path)[0].split(os.sep)
+    if parts[-1] == "__init__" and len(parts) > 1:
+        parts.pop()
+    return ".".join(parts)
+
+
+def _is_private_module(module: str) -> bool:
+    # Top-level private modules and packages such as _socket or _typeshed
+    # are excluded: their public names are usually used from outside the project.
+    top_level, *submodules = module.split(".")
+    return not top_level.startswith("_") and any(
+        part.startswith("_") and not part.startswith("__") for part in submodules
+    )
+
+
+def _resolve_import_from(node: ast.ImportFrom, module: str, is_package: bool) -> str:
+    if not node.level:
+        return node.module or ""
+    package_parts = module.split(".")
+    if not is_package:
+        package_parts.pop()
+    if node.level > 1:
+        del package_parts[len(package_parts) - node.level + 1 :]
+    if node.module:
+        package_parts.append(node.module)
+    return ".".join(package_parts)
+
+
+def _iter_uses(
+    tree: ast.Module, module: str, is_package: bool
+) -> Iterator[tuple[str, str]]:
+    # Local names bound to modules (or possibly to objects) from import statements
+    module_aliases: dict[str, str] = {}
+    for node in ast.walk(tree):
+        match node:
+            case ast.ImportFrom(names=names):
+                imported_from = _resolve_import_from(node, module, is_package)
+                for alias in names:
+                    yield imported_from, alias.name
+                    if alias.name != "*":
+                        module_aliases[alias.asname or alias.name] = (
+                            f"{imported_from}.{alias.name}"
+                        )
+            case ast.Import(names=names):
+                for alias in names:
+                    module_aliases[alias.asname or alias.name] = alias.name
+            case ast.Attribute(value=value, attr=attr):
+                # e.g. `_impl.Foo` after `from . import _impl`
+                value_name = _dotted_name(value)
+                if value_name in module_aliases:
+                    yield module_aliases[value_name], attr
+
+
+def index_module(
+    tree: ast.Module, path: str, module: str, pyi_visitor: PyiVisitor
+) -> ModuleIndex:
+    """Index a stub, after it has been checked by `pyi_visitor`."""
+    is_package = os.path.basename(path) == "__init__.pyi"
+    if pyi_visitor.stopped_early:
+        # Nothing is known about unused definitions in a partially checked stub
+        return ModuleIndex(
+            module, path, frozenset(_iter_uses(tree, module, is_package)), (), ()
+        )
+    unused_private = tuple(
+        UnusedDefinition(name, location.lineno, location.col_offset, message)
+        for name, location, message in pyi_visitor.iter_unused_things()
+    )
+    unused_public: list[UnusedDefinition] = []
+    if _is_private_module(module):
+        for statement in tree.body:
+            if (
+                isinstance(
+                    statement, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+                )
+                and not statement.name.startswith("_")
+                and not pyi_visitor.all_name_occurrences[statement.name]
+            ):
+                message = errors.Y069.format(name=statement.name, module=module)
+                unused_public.append(
+                    UnusedDefinition(
+                        statement.name, statement.lineno, statement.col_offset, message
+                    )
+                )
+    return ModuleIndex(
+        module=module,
+        path=path,
+        uses=frozenset(_iter_uses(tree, module, is_package)),
+        unused_private=unused_private,
+        unused_public=tuple(unused_public),
+    )
+
+
+def find_unused_definitions(
+    indexes: Iterable[ModuleIndex],
+) -> Iterator[tuple[ModuleIndex, UnusedDefinition]]:
+    """Yield the definitions that are unused across all modules in `indexes`."""
+    indexes = list(indexes)
+    uses: set[tuple[str, str]] = set()
+    for index in indexes:
+        uses.update(index.uses)
+    for index in indexes:
+        for definition in index.unused_private:
+            if (index.module, definition.name) not in uses:
+                yield index, definition
+        if (index.module, "*") in uses:
+            continue
+        for definition in index.unused_public:
+            if (index.module, definition.name) not in uses:
+                yield index, definition
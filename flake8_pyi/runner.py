@@ -0,0 +1,1580 @@
+"""Run flake8-pyi's checks without going through the flake8 application layer.
+
+The runner only knows about the Y0 checks provided by this plugin,
+so it is no replacement for a full flake8 run in CI.
+It is intended for quick feedback while writing stubs,
+e.g. `python -m flake8_pyi --watch stubs/`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import array
+import ast
+import codecs
+import concurrent.futures
+import io
+import multiprocessing
+import os
+import re
+import sys
+import time
+import tokenize
+from collections import Counter, defaultdict, deque
+from collections.abc import Callable, Collection, Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from functools import cached_property, partial
+from itertools import chain, groupby, islice
+from multiprocessing.connection import Connection
+from typing import Any, NamedTuple, TextIO, TypeAlias, TypeVar, overload
+
+from . import archives, errors, project, typeshed
+from .checker import _check_for_type_comments
+from .metrics import LintMetrics
+from .profiling import MemoryProfiler
+from .visitor import COMPILED, Budget, ClassIndex, ModuleState, PyiVisitor
+
+_T = TypeVar("_T")
+
+# Directories that flake8 excludes by default
+_EXCLUDED_DIRECTORIES = frozenset(
+    {".svn", "CVS", ".bzr", ".hg", ".git", "__pycache__", ".tox", ".nox", ".eggs"}
+)
+
+
+class Finding(NamedTuple):
+    filename: str
+    lineno: int
+    col: int
+    code: str
+    message: str
+
+    def __str__(self) -> str:
+        # Like flake8, report 1-based column numbers
+        return (
+            f"{self.filename}:{self.lineno}:{self.col + 1}: {self.code} {self.message}"
+        )
+
+
+def _is_selected(code: str, extend_select: Collection[str]) -> bool:
+    """Determine whether findings with the error code `code` should be reported.
+
+    >>> _is_selected("Y001", extend_select=())
+    True
+    >>> _is_selected("Y090", extend_select=())
+    False
+    >>> _is_selected("Y090", extend_select=("Y09",))
+    True
+    """
+    if code not in errors.DISABLED_BY_DEFAULT:
+        return True
+    return any(code.startswith(prefix) for prefix in extend_select)
+
+
+def _disabled_codes(extend_select: Collection[str]) -> frozenset[str]:
+    return frozenset(
+        code
+        for code in errors.DISABLED_BY_DEFAULT
+        if not _is_selected(code, extend_select)
+    )
+
+
+def _syntax_error_finding(filename: str, error: SyntaxError) -> Finding:
+    message = f"{type(error).__name__}: {error.msg}"
+    col = max((error.offset or 1) - 1, 0)
+    return Finding(filename, error.lineno or 1, col, "E999", message)
+
+
+def _read_source(path: str) -> bytes:
+    # Stubs are read as bytes, which ast.parse() accepts directly:
+    # it decodes them itself, according to PEP 263, as flake8 does.
+    # They're only decoded into lines by the runner if a check needs them.
+    with open(path, "rb") as file:
+        return file.read()
+
+
+# A line, as the tokenizer splits them: only line feeds and carriage returns
+# end a line
+_LINE = re.compile(r"[^\r\n]*(?:\r\n?|\n)|[^\r\n]+")
+
+
+def _split_lines(source: str) -> list[str]:
+    """Split `source` into lines the way the tokenizer does.
+
+    Unlike `str.splitlines()`, only line feeds and carriage returns end a line
+    (not e.g. form feeds), so line numbers match the line numbers in the AST.
+
+    >>> _split_lines("x: int\\r\\ny: str\\x0c  # comment\\rz: bytes")
+    ['x: int\\r\\n', 'y: str\\x0c  # comment\\r', 'z: bytes']
+    """
+    return _LINE.findall(source)
+
+
+def _decode_lines(source: bytes) -> list[str]:
+    """Split `source` into lines the way the tokenizer does, and decode them.
+
+    Unlike `str.splitlines()`, only line feeds and carriage returns end a line
+    (not e.g. form feeds), so line numbers match the line numbers in the AST.
+
+    >>> _decode_lines(b"x: int\\r\\ny: str\\x0c  # comment\\n")
+    ['x: int\\r\\n', 'y: str\\x0c  # comment\\n']
+    >>> _decode_lines("# coding: latin-1\\nx: 'é'\\n".encode("latin-1"))
+    ['# coding: latin-1\\n', "x: 'é'\\n"]
+    """
+    if source.isascii():
+        # Fast path: the encoding doesn't need to be detected
+        encoding = "ascii"
+    else:
+        encoding, _ = tokenize.detect_encoding(io.BytesIO(source).readline)
+    return [line.decode(encoding) for line in source.splitlines(keepends=True)]
+
+
+class _SourceLines(Sequence[str]):
+    """The lines of a stub's source code, which are only split when needed.
+
+    Most stubs don't contain type comments, for example,
+    and the lines aren't needed at all to check those stubs for them.
+
+    If `source` is only part of a stub, starting at line `first_lineno`,
+    the lines of the stub before it are treated as empty lines.
+    """
+
+    def __init__(self, source: str | bytes, first_lineno: int = 1) -> None:
+        self._source = source
+        self._first_lineno = first_lineno
+
+    @cached_property
+    def _lines(self) -> list[str]:
+        if isinstance(self._source, bytes):
+            lines = _decode_lines(self._source)
+        else:
+            lines = _split_lines(self._source)
+        if self._first_lineno > 1:
+            lines[:0] = [""] * (self._first_lineno - 1)
+        return lines
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+    @overload
+    def __getitem__(self, index: slice) -> list[str]: ...
+
+    def __getitem__(self, index: int | slice) -> str | list[str]:
+        return self._lines[index]
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def may_contain_type_comments(self) -> bool:
+        if isinstance(self._source, bytes):
+            return b"type:" in self._source
+        return "type:" in self._source
+
+
+def _parse(
+    source: str | bytes, filename: str, feature_version: PythonVersion | None = None
+) -> ast.Module:
+    try:
+        return ast.parse(source, filename=filename, feature_version=feature_version)
+    except RecursionError as e:
+        # CPython raises RecursionError rather than SyntaxError
+        # for expressions that are nested too deeply to be parsed
+        raise SyntaxError(str(e), (filename, 1, 1, None)) from None
+
+
+def _to_findings(
+    pyi_errors: Iterable[errors.Error], filename: str, extend_select: Collection[str]
+) -> Iterator[Finding]:
+    for error in pyi_errors:
+        code, _, message = error.message.partition(" ")
+        if _is_selected(code, extend_select):
+            yield Finding(filename, error.lineno, error.col, code, message)
+
+
+def _make_visitor(
+    filename: str,
+    extend_select: Collection[str],
+    budget: Budget | None,
+    lines: Sequence[str] | None = None,
+) -> PyiVisitor:
+    return PyiVisitor(
+        filename,
+        disabled_codes=_disabled_codes(extend_select),
+        budget=budget,
+        lines=lines,
+    )
+
+
+def _check_lines(lines: _SourceLines) -> Iterator[errors.Error]:
+    if lines.may_contain_type_comments():
+        yield from _check_for_type_comments(lines)
+
+
+def _check_tree(
+    tree: ast.Module,
+    lines: _SourceLines,
+    filename: str,
+    extend_select: Collection[str],
+    budget: Budget | None,
+) -> Iterator[Finding]:
+    # The same checks as PyiTreeChecker.run(),
+    # but the rules for codes that won't be reported are skipped
+    if not filename.endswith(".pyi"):
+        return iter(())
+    pyi_visitor = _make_visitor(filename, extend_select, budget, lines)
+    pyi_errors = chain(_check_lines(lines), pyi_visitor.run(tree))
+    return _to_findings(pyi_errors, filename, extend_select)
+
+
+@dataclass
+class FileStats:
+    """Statistics about linting a single file, used for exporting metrics."""
+
+    filename: str
+    ast_nodes: int = 0
+    seconds: float = 0.0
+
+
+def _count_nodes(tree: ast.AST) -> int:
+    return sum(1 for _ in ast.walk(tree))
+
+
+def _lint_source(
+    source: str | bytes,
+    filename: str,
+    extend_select: Collection[str],
+    stats: FileStats | None = None,
+    budget: Budget | None = None,
+) -> list[Finding]:
+    try:
+        tree = _parse(source, filename)
+    except SyntaxError as e:
+        return [_syntax_error_finding(filename, e)]
+    if stats is not None:
+        stats.ast_nodes += _count_nodes(tree)
+    lines = _SourceLines(source)
+    return sorted(_check_tree(tree, lines, filename, extend_select, budget))
+
+
+# Keywords that continue a compound statement
+# at the same level of indentation as the statement itself
+_CONTINUATION_KEYWORDS = frozenset({"elif", "else", "except", "finally"})
+
+
+def _iter_top_level_statements(
+    readline: Callable[[], str],
+) -> Iterator[tuple[int, list[str]]]:
+    """Split the source code returned by `readline` into top-level statements.
+
+    Yield `(lineno, lines)` tuples, where `lines` are the source lines
+    of a single top-level statement (followed by any blank lines or comments
+    before the next statement), and `lineno` is the number of the first line.
+    Only the lines of the current statement are held in memory.
+    """
+    buffered: list[str] = []
+    first_lineno = 1
+
+    def buffering_readline() -> str:
+        line = readline()
+        if line:
+            buffered.append(line)
+        return line
+
+    depth = 0
+    at_line_start = True
+    after_decorator = False
+    try:
+        for token in tokenize.generate_tokens(buffering_readline):
+            match token.type:
+                case tokenize.INDENT:
+                    depth += 1
+                case tokenize.DEDENT:
+                    depth -= 1
+                case tokenize.NEWLINE:
+                    at_line_start = True
+                case tokenize.NL | tokenize.COMMENT | tokenize.ENDMARKER:
+                    pass
+                case _ if at_line_start:
+                    at_line_start = False
+                    lineno = token.start[0]
+                    if (
+                        depth == 0
+                        and not after_decorator
+                        and token.string not in _CONTINUATION_KEYWORDS
+                        and lineno > first_lineno
+                    ):
+                        yield first_lineno, buffered[: lineno - first_lineno]
+                        del buffered[: lineno - first_lineno]
+                        first_lineno = lineno
+                    after_decorator = depth == 0 and token.string == "@"
+    except tokenize.TokenError:
+        # Leave it to the parser to report the syntax error
+        # in the remaining lines.
+        buffered.extend(iter(readline, ""))
+    if buffered:
+        yield first_lineno, buffered
+
+
+def _decoding_error(path: str, encoding: str, error: UnicodeDecodeError) -> SyntaxError:
+    """Find the line of `path` that `error` was raised for, while reading it.
+
+    Files are decoded in chunks, so `error` doesn't tell where in the file
+    it is; each line is decoded in turn to find out.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    lineno = 1
+    with open(path, "rb") as file:
+        try:
+            for lineno, line in enumerate(file, start=1):
+                decoder.decode(line)
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError as e:
+            error = e
+    return SyntaxError(f"(unicode error) {error}", (path, lineno, 1, None))
+
+
+def _lint_file_streaming(
+    path: str,
+    extend_select: Collection[str],
+    stats: FileStats | None,
+    budget: Budget | None,
+) -> list[Finding]:
+    findings: list[Finding] = []
+
+    def iter_trees(readline: Callable[[], str]) -> Iterator[ast.Module]:
+        for lineno, lines in _iter_top_level_statements(readline):
+            findings.extend(
+                _to_findings(
+                    _check_for_type_comments(lines, first_lineno=lineno),
+                    path,
+                    extend_select,
+                )
+            )
+            try:
+                tree = _parse("".join(lines), path)
+            except SyntaxError as e:
+                if e.lineno is not None:
+                    e.lineno += lineno - 1
+                raise
+            if stats is not None:
+                stats.ast_nodes += _count_nodes(tree)
+            yield ast.increment_lineno(tree, lineno - 1)
+
+    try:
+        # Decodes the file according to PEP 263, as ast.parse() does
+        file = tokenize.open(path)
+    except SyntaxError as e:
+        # An unknown encoding, or an encoding declaration that doesn't match
+        return [_syntax_error_finding(path, e)]
+    with file:
+        visitor = _make_visitor(path, extend_select, budget)
+        try:
+            pyi_errors = visitor.run_incrementally(iter_trees(file.readline))
+            findings.extend(_to_findings(pyi_errors, path, extend_select))
+        except SyntaxError as e:
+            findings.append(_syntax_error_finding(path, e))
+        except UnicodeDecodeError as e:
+            error = _decoding_error(path, file.encoding, e)
+            findings.append(_syntax_error_finding(path, error))
+    findings.sort()
+    return findings
+
+
+def lint_file(
+    path: str,
+    *,
+    extend_select: Collection[str] = (),
+    streaming: bool = False,
+    budget: Budget | None = None,
+) -> list[Finding]:
+    """Lint the stub file at `path`, returning a sorted list of findings.
+
+    If `streaming` is `True`, the file is read, parsed and checked
+    one top-level statement at a time, so that memory usage is proportional
+    to the largest top-level statement rather than to the whole file.
+    This is useful for huge generated stubs.
+    If the file contains a syntax error,
+    findings for the statements preceding it are reported as well.
+
+    If `path` is a wheel, an sdist or another zip or tar archive,
+    the stubs inside it are linted without extracting them,
+    and findings are reported for `"{path}!{member}"`.
+
+    `budget` limits the resources that may be spent on each stub;
+    checking a stub stops with a Y070 finding when a limit is exceeded.
+    """
+    return _lint_file(path, extend_select, streaming, budget=budget)
+
+
+def _lint_file(
+    path: str,
+    extend_select: Collection[str],
+    streaming: bool,
+    stats: FileStats | None = None,
+    budget: Budget | None = None,
+) -> list[Finding]:
+    if archives.is_archive(path):
+        return _lint_archive(path, extend_select, stats, budget)
+    if streaming and path.endswith(".pyi"):
+        return _lint_file_streaming(path, extend_select, stats, budget)
+    return _lint_source(_read_source(path), path, extend_select, stats, budget)
+
+
+def _lint_archive(
+    path: str,
+    extend_select: Collection[str],
+    stats: FileStats | None,
+    budget: Budget | None,
+) -> list[Finding]:
+    findings: list[Finding] = []
+    for member, source in archives.iter_archive_stubs(path):
+        findings += _lint_source(
+            source, f"{path}!{member}", extend_select, stats, budget
+        )
+    findings.sort()
+    return findings
+
+
+def _lint_file_with_stats(
+    path: str,
+    *,
+    extend_select: Collection[str],
+    streaming: bool,
+    budget: Budget | None = None,
+) -> tuple[list[Finding], FileStats]:
+    stats = FileStats(path)
+    start = time.perf_counter()
+    findings = _lint_file(path, extend_select, streaming, stats, budget)
+    stats.seconds = time.perf_counter() - start
+    return findings, stats
+
+
+def lint_source(
+    source: str,
+    filename: str,
+    *,
+    extend_select: Collection[str] = (),
+    budget: Budget | None = None,
+) -> list[Finding]:
+    """Lint the stub source code `source`, returning a sorted list of findings.
+
+    `filename` is used when reporting findings. As when running flake8,
+    the checks are only run if `filename` has a `.pyi` suffix.
+    `budget` limits the resources that may be spent on the stub, as with
+    `lint_file()`.
+    """
+    return _lint_source(source, filename, extend_select, budget=budget)
+
+
+# Number of stubs sent to a worker process at a time
+_CHUNKSIZE = 16
+# Maximum number of chunks per worker process that are submitted
+# before the results for the earliest chunk are yielded
+_CHUNKS_IN_FLIGHT_PER_WORKER = 4
+
+
+class _PackedFindings(NamedTuple):
+    """The findings for a chunk of stubs, in a compact form.
+
+    Pickling `Finding` objects one by one is slow when there are many of them,
+    as every filename, code and message is pickled separately.
+    Instead, each distinct string is sent only once,
+    and findings refer to them by their index in `strings`.
+    """
+
+    strings: tuple[str, ...]
+    # Five native integers per finding: the indices of the filename,
+    # the code and the message in `strings`, the line and the column
+    fields: bytes
+    # The number of findings for each stub in the chunk
+    counts: tuple[int, ...]
+
+
+def _pack_finding_lists(finding_lists: list[list[Finding]]) -> _PackedFindings:
+    strings: dict[str, int] = {}
+    fields = array.array("i")
+    for findings in finding_lists:
+        for filename, lineno, col, code, message in findings:
+            fields.extend(
+                (
+                    strings.setdefault(filename, len(strings)),
+                    lineno,
+                    col,
+                    strings.setdefault(code, len(strings)),
+                    strings.setdefault(message, len(strings)),
+                )
+            )
+    counts = tuple(map(len, finding_lists))
+    return _PackedFindings(tuple(strings), fields.tobytes(), counts)
+
+
+def _unpack_finding_lists(packed: _PackedFindings) -> list[list[Finding]]:
+    strings = packed.strings
+    fields = array.array("i")
+    fields.frombytes(packed.fields)
+    rows = zip(*[iter(fields)] * 5)
+    return [
+        [
+            Finding(strings[filename], lineno, col, strings[code], strings[message])
+            for filename, lineno, col, code, message in islice(rows, count)
+        ]
+        for count in packed.counts
+    ]
+
+
+def _pack_results(
+    results: list[tuple[list[Finding], _T]],
+) -> tuple[_PackedFindings, list[_T]]:
+    finding_lists = [findings for findings, _ in results]
+    return _pack_finding_lists(finding_lists), [extra for _, extra in results]
+
+
+def _unpack_results(
+    packed: tuple[_PackedFindings, list[_T]],
+) -> list[tuple[list[Finding], _T]]:
+    packed_findings, extras = packed
+    return list(zip(_unpack_finding_lists(packed_findings), extras))
+
+
+def _call_for_chunk(
+    function: Callable[..., _T],
+    chunk: list[tuple[Any, ...]],
+    pack: Callable[[list[_T]], Any] | None,
+) -> Any:
+    results = [function(*args) for args in chunk]
+    return results if pack is None else pack(results)
+
+
+def _map_in_parallel(
+    function: Callable[..., _T],
+    *iterables: Iterable[Any],
+    jobs: int | None,
+    pack: Callable[[list[_T]], Any] | None = None,
+    unpack: Callable[[Any], list[_T]] | None = None,
+    chunksize: int = _CHUNKSIZE,
+) -> Iterator[_T]:
+    """Like `map()`, but call `function` in `jobs` worker processes.
+
+    If `jobs` is `None`, use one worker process per CPU.
+    If `jobs` is 1, everything is done in the current process.
+
+    Results are yielded in order, as soon as the results
+    for all preceding arguments are available, so that the output
+    of a parallel run starts early and is identical to a serial run.
+    Only a bounded number of chunks are in flight at any time,
+    so a slow stub can't cause an unbounded number of results to be buffered.
+
+    If `pack` and `unpack` are given, the results for each chunk
+    are converted with `pack` in the worker process before they are sent
+    to the current process, and converted back with `unpack`.
+
+    Arguments are sent to the worker processes in chunks of `chunksize`.
+    """
+    if jobs == 1:
+        yield from map(function, *iterables)
+        return
+    max_in_flight = (jobs or os.cpu_count() or 1) * _CHUNKS_IN_FLIGHT_PER_WORKER
+    in_flight: deque[concurrent.futures.Future[Any]] = deque()
+    arguments = zip(*iterables)
+
+    def results_for_chunk(future: concurrent.futures.Future[Any]) -> list[_T]:
+        results = future.result()
+        return results if unpack is None else unpack(results)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        try:
+            while chunk := list(islice(arguments, chunksize)):
+                in_flight.append(
+                    executor.submit(_call_for_chunk, function, chunk, pack)
+                )
+                if len(in_flight) >= max_in_flight:
+                    yield from results_for_chunk(in_flight.popleft())
+            while in_flight:
+                yield from results_for_chunk(in_flight.popleft())
+        finally:
+            # Don't wait for chunks whose results will never be used
+            # if the caller stops early
+            for future in in_flight:
+                future.cancel()
+
+
+def _check_unique_filenames(filenames: Iterable[str]) -> None:
+    # Otherwise, the findings for a filename would silently replace
+    # the earlier findings for the same filename
+    counts = Counter(filenames)
+    duplicates = [filename for filename, count in counts.items() if count > 1]
+    if duplicates:
+        raise ValueError(f"filenames given more than once: {', '.join(duplicates)}")
+
+
+def lint_many(
+    sources: Iterable[tuple[str, str]],
+    *,
+    extend_select: Collection[str] = (),
+    jobs: int | None = 1,
+    budget: Budget | None = None,
+) -> dict[str, list[Finding]]:
+    """Lint many stubs, given as `(filename, source)` pairs.
+
+    Return a dictionary mapping each filename to a sorted list of findings;
+    `ValueError` is raised if a filename is given more than once.
+    By default, all stubs are linted in the current process;
+    pass `jobs` to lint them in that many worker processes instead
+    (or `jobs=None` to use one worker process per CPU).
+    """
+    filenames, texts = [], []
+    for filename, source in sources:
+        filenames.append(filename)
+        texts.append(source)
+    _check_unique_filenames(filenames)
+    worker = partial(_lint_source, extend_select=extend_select, budget=budget)
+    results = _map_in_parallel(
+        worker,
+        texts,
+        filenames,
+        jobs=jobs,
+        pack=_pack_finding_lists,
+        unpack=_unpack_finding_lists,
+    )
+    return dict(zip(filenames, results))
+
+
+# Stubs at least this large are split into parts that are checked
+# in separate worker processes, if more than one worker process may be used
+_SPLIT_THRESHOLD = 1024 * 1024
+# Parts are at least this large
+_MIN_PART_SIZE = 128 * 1024
+
+# The end of a line that is followed by what looks like a top-level statement
+_TOP_LEVEL_STATEMENT_START = re.compile(
+    rb"\n(?=[A-Za-z_@])(?!(?:elif|else|except|finally)\b)"
+)
+
+
+def _split_source(source: bytes, parts: int) -> list[tuple[int, bytes]]:
+    """Split `source` into at most `parts` parts of similar size.
+
+    Return `(lineno, part)` tuples, where `lineno` is the number of the first
+    line of `part`. Each part starts with a line that looks like the start
+    of a top-level statement, and doesn't follow a decorator. If the line
+    is actually in the middle of a statement (e.g. in a multiline string),
+    the part before it can't be parsed on its own.
+
+    >>> _split_source(b"x: int\\n@final\\nclass A:\\n    y: int\\nz: str\\n", 3)
+    [(1, b'x: int\\n@final\\nclass A:\\n    y: int\\n'), (5, b'z: str\\n')]
+    """
+    split: list[tuple[int, bytes]] = []
+    start = 0
+    lineno = 1
+    for i in range(1, parts):
+        position = max(len(source) * i // parts, start)
+        while match := _TOP_LEVEL_STATEMENT_START.search(source, position):
+            position = match.end()
+            previous_line_start = source.rfind(b"\n", 0, match.start()) + 1
+            if source[previous_line_start : previous_line_start + 1] != b"@":
+                break
+        else:
+            break
+        part = source[start:position]
+        split.append((lineno, part))
+        # Count the lines the way the tokenizer does
+        lineno += part.count(b"\n") + part.count(b"\r") - part.count(b"\r\n")
+        start = position
+    split.append((lineno, source[start:]))
+    return split
+
+
+class _PartResult(NamedTuple):
+    findings: _PackedFindings
+    ast_nodes: int
+    module_state: ModuleState
+    # Whether the part was only partially checked (Y070),
+    # in which case `module_state` is incomplete
+    stopped_early: bool
+
+
+def _check_part(
+    connection: Connection,
+    lineno: int,
+    part: bytes,
+    filename: str,
+    extend_select: Collection[str],
+) -> None:
+    """Check part of a huge stub in a worker process.
+
+    The worker process sends the bases of the classes in its part
+    through `connection`, and receives the bases of the classes
+    in the whole stub, so that classes that inherit from classes
+    in other parts are classified correctly. Then it sends a `_PartResult`,
+    or an exception if the part couldn't be checked.
+    """
+    try:
+        tree = ast.increment_lineno(_parse(part, filename), lineno - 1)
+        lines = _SourceLines(part, first_lineno=lineno)
+        pyi_visitor = _make_visitor(filename, extend_select, None, lines)
+        pyi_visitor.class_index.add(tree)
+        connection.send(pyi_visitor.class_index.direct_bases)
+        pyi_visitor.class_index.update(connection.recv())
+        ast_nodes = _count_nodes(tree)
+        pyi_errors = chain(
+            _check_lines(lines),
+            pyi_visitor.run_incrementally([tree], check_unused=False),
+        )
+        findings = list(_to_findings(pyi_errors, filename, extend_select))
+        connection.send(
+            _PartResult(
+                _pack_finding_lists([findings]),
+                ast_nodes,
+                pyi_visitor.module_state,
+                pyi_visitor.stopped_early,
+            )
+        )
+    except Exception as e:
+        connection.send(e)
+
+
+def _receive(connection: Connection) -> Any:
+    message = connection.recv()
+    if isinstance(message, Exception):
+        raise message
+    return message
+
+
+def _lint_source_in_parts(
+    source: bytes,
+    filename: str,
+    extend_select: Collection[str],
+    stats: FileStats | None = None,
+    *,
+    parts: int,
+) -> list[Finding]:
+    """Lint a huge stub by checking up to `parts` parts of it in parallel.
+
+    The findings are the same as if the stub was linted with `_lint_source()`.
+    Each part is checked in its own worker process, once the classes
+    in the whole stub are known; unused things are looked for
+    in the current process, once the module states of all the parts are merged.
+    If a part is only partially checked (Y070), the other parts are still
+    checked, but unused things aren't looked for, as when a stub is linted
+    as a whole.
+    If the stub can't be split into parts that can be parsed on their own,
+    it is linted in the current process instead.
+    """
+    # Only the first part would contain an encoding declaration
+    encoding, _ = tokenize.detect_encoding(io.BytesIO(source).readline)
+    split = _split_source(source, parts)
+    if (
+        not filename.endswith(".pyi")
+        or encoding not in {"utf-8", "utf-8-sig"}
+        or len(split) == 1
+    ):
+        return _lint_source(source, filename, extend_select, stats)
+
+    context = multiprocessing.get_context()
+    connections: list[Connection] = []
+    processes: list[multiprocessing.Process] = []
+    results: list[_PartResult] = []
+    try:
+        for lineno, part in split:
+            connection, worker_connection = context.Pipe()
+            connections.append(connection)
+            process = context.Process(
+                target=_check_part,
+                args=(worker_connection, lineno, part, filename, extend_select),
+                daemon=True,
+            )
+            processes.append(process)
+            process.start()
+            worker_connection.close()
+        class_index = ClassIndex()
+        for connection in connections:
+            class_index.update(_receive(connection))
+        for connection in connections:
+            connection.send(class_index.direct_bases)
+        results = [_receive(connection) for connection in connections]
+    except SyntaxError:
+        pass
+    finally:
+        for connection in connections:
+            connection.close()
+        for process in processes:
+            if not results:
+                process.terminate()
+            process.join()
+    if not results:
+        # Either a part didn't start at the start of a top-level statement,
+        # or the stub has a syntax error, which is reported as usual
+        return _lint_source(source, filename, extend_select, stats)
+
+    pyi_visitor = _make_visitor(filename, extend_select, budget=None)
+    findings: list[Finding] = []
+    for result in results:
+        [part_findings] = _unpack_finding_lists(result.findings)
+        findings += part_findings
+        pyi_visitor.merge_module_state(result.module_state)
+        if stats is not None:
+            stats.ast_nodes += result.ast_nodes
+    # Once the states of all the parts have been merged,
+    # running the visitor on no trees at all only looks for unused things.
+    # Whether things are unused can't be known if a part wasn't fully checked.
+    if not any(result.stopped_early for result in results):
+        pyi_errors = pyi_visitor.run_incrementally(())
+        findings += _to_findings(pyi_errors, filename, extend_select)
+    findings.sort()
+    return findings
+
+
+PythonVersion: TypeAlias = tuple[int, int]
+
+
+class VersionedFinding(NamedTuple):
+    finding: Finding
+    # The target Python versions that the finding applies to
+    versions: tuple[PythonVersion, ...]
+
+
+# The oldest version whose grammar ast.parse() can check stubs against
+_OLDEST_TARGET_VERSION: PythonVersion = (3, 7)
+
+
+def _parse_python_version(version: str) -> PythonVersion:
+    """Parse a version string such as "3.10" into a tuple.
+
+    >>> _parse_python_version("3.10")
+    (3, 10)
+    >>> _parse_python_version("2.7")
+    Traceback (most recent call last):
+    ...
+    ValueError: Cannot check stubs against Python 2.7, as it is older than 3.7
+    """
+    major, _, minor = version.strip().partition(".")
+    parsed = (int(major), int(minor))
+    if parsed < _OLDEST_TARGET_VERSION:
+        oldest = ".".join(map(str, _OLDEST_TARGET_VERSION))
+        raise ValueError(
+            f"Cannot check stubs against Python {version}, "
+            f"as it is older than {oldest}"
+        )
+    if parsed > sys.version_info[:2]:
+        raise ValueError(
+            f"Cannot check stubs against Python {version}, "
+            f"as it is newer than the running Python version"
+        )
+    return parsed
+
+
+def _lint_source_for_versions(
+    source: str | bytes,
+    filename: str,
+    target_versions: Collection[PythonVersion],
+    extend_select: Collection[str],
+    budget: Budget | None,
+) -> list[VersionedFinding]:
+    # ast.parse() produces the same tree for every feature_version
+    # that the source code is valid for, so the checks only need to run once.
+    # The grammar of each version still needs to be checked separately.
+    versions_by_finding: defaultdict[Finding, list[PythonVersion]] = defaultdict(list)
+    valid_for: list[PythonVersion] = []
+    tree: ast.Module | None = None
+    for version in sorted(target_versions):
+        try:
+            parsed = _parse(source, filename, feature_version=version)
+        except SyntaxError as e:
+            versions_by_finding[_syntax_error_finding(filename, e)].append(version)
+        else:
+            valid_for.append(version)
+            if tree is None:
+                tree = parsed
+    if tree is not None:
+        lines = _SourceLines(source)
+        for finding in _check_tree(tree, lines, filename, extend_select, budget):
+            versions_by_finding[finding].extend(valid_for)
+    return sorted(
+        VersionedFinding(finding, tuple(versions))
+        for finding, versions in versions_by_finding.items()
+    )
+
+
+def lint_file_for_versions(
+    path: str,
+    target_versions: Collection[PythonVersion],
+    *,
+    extend_select: Collection[str] = (),
+    budget: Budget | None = None,
+) -> list[VersionedFinding]:
+    """Lint the stub file at `path` for several target Python versions at once.
+
+    The file is parsed once with the grammar of each target version
+    (e.g. `(3, 10)`), but the checks are only run once.
+    Return a sorted list of findings,
+    each annotated with the target versions it applies to.
+    Archives are supported, as with `lint_file()`.
+    """
+    if archives.is_archive(path):
+        findings: list[VersionedFinding] = []
+        for member, source in archives.iter_archive_stubs(path):
+            findings += _lint_source_for_versions(
+                source, f"{path}!{member}", target_versions, extend_select, budget
+            )
+        findings.sort()
+        return findings
+    return _lint_source_for_versions(
+        _read_source(path), path, target_versions, extend_select, budget
+    )
+
+
+def iter_stub_files(paths: Iterable[str]) -> Iterator[str]:
+    """Yield all stub files in `paths`, recursing into directories.
+
+    Files that are passed explicitly are always yielded,
+    even if they don't have a `.pyi` suffix.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(d for d in dirnames if d not in _EXCLUDED_DIRECTORIES)
+            for filename in sorted(filenames):
+                if filename.endswith(".pyi"):
+                    yield os.path.join(dirpath, filename)
+
+
+def _stat_stub_files(paths: Iterable[str]) -> dict[str, tuple[int, int]]:
+    snapshot = {}
+    for path in iter_stub_files(paths):
+        try:
+            stat_result = os.stat(path)
+        except FileNotFoundError:
+            continue
+        snapshot[path] = (stat_result.st_mtime_ns, stat_result.st_size)
+    return snapshot
+
+
+class _StubWatcher:
+    """Keep the findings for a tree of stubs up to date as files change.
+
+    Changes are detected by polling the modification times and sizes of the
+    stub files, which works the same on every platform and filesystem.
+    Findings for unchanged files are kept in memory,
+    so only the modified files need to be linted again.
+    """
+
+    def __init__(
+        self,
+        paths: Sequence[str],
+        *,
+        extend_select: Collection[str] = (),
+        budget: Budget | None = None,
+    ) -> None:
+        self.paths = paths
+        self.extend_select = extend_select
+        self.budget = budget
+        self.snapshot = _stat_stub_files(paths)
+        self.results = {path: self._lint(path) for path in self.snapshot}
+
+    def _lint(self, path: str) -> list[Finding]:
+        try:
+            return lint_file(path, extend_select=self.extend_select, budget=self.budget)
+        except OSError:
+            # The file was deleted or replaced while we were looking at it;
+            # the next poll will pick up whatever state it ends up in.
+            return []
+
+    @property
+    def findings(self) -> list[Finding]:
+        return sorted(f for findings in self.results.values() for f in findings)
+
+    def changed_paths(self) -> list[str]:
+        """Return the paths of all stubs that were added, modified or removed."""
+        new_snapshot = _stat_stub_files(self.paths)
+        changed = [
+            path
+            for path in new_snapshot.keys() | self.snapshot.keys()
+            if new_snapshot.get(path) != self.snapshot.get(path)
+        ]
+        self.snapshot = new_snapshot
+        return sorted(changed)
+
+    def update(self, changed: Iterable[str]) -> tuple[list[Finding], list[Finding]]:
+        """Re-lint the `changed` paths.
+
+        Return a tuple of findings that appeared and findings that disappeared.
+        """
+        added: list[Finding] = []
+        removed: list[Finding] = []
+        for path in changed:
+            old_findings = set(self.results.pop(path, []))
+            if path in self.snapshot:
+                self.results[path] = self._lint(path)
+            new_findings = set(self.results.get(path, []))
+            added.extend(new_findings - old_findings)
+            removed.extend(old_findings - new_findings)
+        return sorted(added), sorted(removed)
+
+
+def watch(
+    paths: Sequence[str],
+    *,
+    extend_select: Collection[str] = (),
+    budget: Budget | None = None,
+    interval: float = 0.5,
+    debounce: float = 0.2,
+    output: TextIO = sys.stdout,
+) -> None:
+    """Lint `paths`, then keep re-linting stubs whenever they change.
+
+    Each time a batch of changes is detected,
+    the findings that appeared or disappeared are printed.
+    Changes are only processed once the tree has stopped changing for
+    `debounce` seconds, so that an editor saving several files
+    (or writing a single file in several steps) triggers a single report.
+
+    This function never returns; interrupt it with Ctrl+C.
+    """
+    watcher = _StubWatcher(paths, extend_select=extend_select, budget=budget)
+    for finding in watcher.findings:
+        print(finding, file=output)
+    _print_summary(watcher, relinted=len(watcher.results), output=output)
+    while True:
+        time.sleep(interval)
+        changed = set(watcher.changed_paths())
+        if not changed:
+            continue
+        while True:
+            time.sleep(debounce)
+            more_changes = watcher.changed_paths()
+            if not more_changes:
+                break
+            changed.update(more_changes)
+        added, removed = watcher.update(sorted(changed))
+        for finding in removed:
+            print(f"- {finding}", file=output)
+        for finding in added:
+            print(f"+ {finding}", file=output)
+        _print_summary(watcher, relinted=len(changed), output=output)
+
+
+def _print_summary(watcher: _StubWatcher, *, relinted: int, output: TextIO) -> None:
+    num_findings = sum(len(findings) for findings in watcher.results.values())
+    print(
+        f"[{time.strftime('%H:%M:%S')}] {num_findings} finding(s) "
+        f"in {len(watcher.results)} file(s); {relinted} file(s) linted",
+        file=output,
+        flush=True,
+    )
+
+
+def _parse_jobs(value: str) -> int | None:
+    """Parse a `--jobs` value: "auto" (one worker process per CPU) or a number.
+
+    >>> _parse_jobs("auto"), _parse_jobs("4")
+    (None, 4)
+    """
+    if value == "auto":
+        return None
+    try:
+        jobs = int(value)
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        raise argparse.ArgumentTypeError(
+            f'expected "auto" or a positive number of processes, got {value!r}'
+        )
+    return jobs
+
+
+def _make_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m flake8_pyi",
+        description="Run flake8-pyi's checks on stub files, without flake8.",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        default=["."],
+        help="stub files or directories to lint, "
+        "or archives containing stubs (wheels, sdists, zip or tar files)",
+    )
+    parser.add_argument(
+        "--extend-select",
+        default="",
+        metavar="CODES",
+        help="comma-separated list of error codes that are disabled by default "
+        "and should be enabled (e.g. Y090)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=_parse_jobs,
+        default="auto",
+        help='number of worker processes to use, or "auto" (the default) '
+        "to use one per CPU; huge stubs are split into parts that are checked "
+        "in parallel",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="parse and check each stub one top-level statement at a time, "
+        "so that huge generated stubs can be linted with bounded memory",
+    )
+    parser.add_argument(
+        "--target-versions",
+        metavar="VERSIONS",
+        help="comma-separated list of Python versions (e.g. 3.10,3.11) "
+        "to check the stubs' syntax against in a single run; "
+        "findings that don't apply to all versions are annotated accordingly",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        metavar="PATH",
+        help="write statistics about the run to PATH in the OpenMetrics text format "
+        "(e.g. for node-exporter's textfile collector)",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="trace memory allocations, and report the files and checks "
+        "with the largest allocation peaks on stderr (slow; implies --jobs=1)",
+    )
+    parser.add_argument(
+        "--max-seconds-per-file",
+        type=float,
+        metavar="SECONDS",
+        help="stop checking a stub with Y070 if checking it takes longer than this",
+    )
+    parser.add_argument(
+        "--max-findings-per-file",
+        type=int,
+        metavar="N",
+        help="stop checking a stub with Y070 if it has more than N findings",
+    )
+    parser.add_argument(
+        "--max-nodes-per-file",
+        type=int,
+        metavar="N",
+        help="stop checking a stub with Y070 if it has more than N AST nodes",
+    )
+    parser.add_argument(
+        "--project",
+        action="store_true",
+        help="treat the paths as the roots of a single project "
+        "(directories that would be on sys.path, e.g. typeshed's stdlib "
+        "and stubs/*), and report definitions that aren't used anywhere in it",
+    )
+    parser.add_argument(
+        "--typeshed",
+        action="store_true",
+        help="treat the paths as checkouts of typeshed, and lint stdlib and "
+        "each distribution in stubs/ as a separate unit, whose findings are "
+        "cached until its files change (see --cache-dir)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=".flake8_pyi_cache",
+        metavar="DIR",
+        help="directory for the findings cached by --typeshed "
+        "(default: .flake8_pyi_cache)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running, and re-lint stubs whenever they are modified",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.5,
+        help="how often to poll for changes in watch mode, in seconds",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.2,
+        help="how long the stubs must be left unchanged in watch mode "
+        "before they are re-linted, in seconds",
+    )
+    return parser
+
+
+def _lint_for_versions(
+    paths: Sequence[str],
+    target_versions: Sequence[PythonVersion],
+    *,
+    extend_select: Collection[str],
+    budget: Budget | None,
+    jobs: int | None,
+) -> bool:
+    worker = partial(
+        lint_file_for_versions,
+        target_versions=target_versions,
+        extend_select=extend_select,
+        budget=budget,
+    )
+    found_errors = False
+    for versioned_findings in _map_in_parallel(worker, paths, jobs=jobs):
+        for finding, versions in versioned_findings:
+            found_errors = True
+            if len(versions) == len(target_versions):
+                print(finding)
+            else:
+                applies_to = ", ".join(f"{x}.{y}" for x, y in versions)
+                print(f"{finding} (Python {applies_to})")
+        if versioned_findings:
+            sys.stdout.flush()
+    return found_errors
+
+
+# Options that can't be combined with other options
+_INCOMPATIBLE_OPTIONS = {
+    "watch": ("metrics_file", "profile_memory", "project"),
+    "target_versions": ("watch", "streaming", "metrics_file", "profile_memory"),
+    "project": ("target_versions", "streaming", "metrics_file", "profile_memory"),
+    "typeshed": ("watch", "target_versions", "project", "streaming", "profile_memory"),
+}
+
+
+def _check_paths_exist(
+    parser: argparse.ArgumentParser, args: argparse.Namespace
+) -> None:
+    for path in args.paths:
+        if not os.path.exists(path):
+            parser.error(f"{path} does not exist")
+
+
+def _check_incompatible_options(
+    parser: argparse.ArgumentParser, args: argparse.Namespace
+) -> None:
+    for option, incompatible_options in _INCOMPATIBLE_OPTIONS.items():
+        if not getattr(args, option):
+            continue
+        for other_option in incompatible_options:
+            if getattr(args, other_option):
+                parser.error(
+                    f"--{option.replace('_', '-')} cannot be combined with "
+                    f"--{other_option.replace('_', '-')}"
+                )
+
+
+def _parse_target_versions(
+    parser: argparse.ArgumentParser, args: argparse.Namespace
+) -> list[PythonVersion]:
+    if args.target_versions is None:
+        return []
+    try:
+        return [
+            _parse_python_version(version)
+            for version in args.target_versions.split(",")
+        ]
+    except ValueError as e:
+        parser.error(f"invalid --target-versions: {e}")
+
+
+def _parse_budget(args: argparse.Namespace) -> Budget | None:
+    budget = Budget(
+        max_seconds=args.max_seconds_per_file,
+        max_findings=args.max_findings_per_file,
+        max_nodes=args.max_nodes_per_file,
+    )
+    return None if budget == Budget() else budget
+
+
+def _lint_paths(
+    paths: Sequence[str],
+    *,
+    extend_select: Collection[str],
+    budget: Budget | None,
+    streaming: bool,
+    jobs: int | None,
+    metrics_file: str | None,
+    profiler: MemoryProfiler | None,
+) -> bool:
+    found_errors = False
+    metrics = LintMetrics()
+    worker = partial(
+        _lint_file_with_stats,
+        extend_select=extend_select,
+        streaming=streaming,
+        budget=budget,
+    )
+    if profiler is not None:
+        # Allocations can only be traced in the current process
+        jobs = 1
+        worker = partial(profiler.measure_file, worker)
+    # A budget applies to each stub as a whole, so those stubs aren't split
+    split_huge_stubs = jobs != 1 and budget is None and not streaming
+    for huge, group in groupby(
+        paths, key=lambda path: split_huge_stubs and _is_huge_stub(path)
+    ):
+        if huge:
+            results: Iterable[tuple[list[Finding], FileStats]] = (
+                _lint_file_in_parts_with_stats(
+                    path, extend_select=extend_select, jobs=jobs
+                )
+                for path in group
+            )
+        else:
+            group_paths = list(group)
+            results = _map_in_parallel(
+                worker,
+                group_paths,
+                jobs=jobs if len(group_paths) > 1 else 1,
+                pack=_pack_results,
+                unpack=_unpack_results,
+            )
+        for findings, stats in results:
+            metrics.record_file(stats)
+            metrics.record_findings(findings)
+            for finding in findings:
+                found_errors = True
+                print(finding)
+            if findings:
+                # Don't leave the output in a buffer if it's piped (e.g. in CI)
+                sys.stdout.flush()
+    if metrics_file:
+        metrics.write(metrics_file)
+    return found_errors
+
+
+def _is_huge_stub(path: str) -> bool:
+    try:
+        return path.endswith(".pyi") and os.path.getsize(path) >= _SPLIT_THRESHOLD
+    except OSError:
+        return False
+
+
+def _lint_file_in_parts_with_stats(
+    path: str, *, extend_select: Collection[str], jobs: int | None
+) -> tuple[list[Finding], FileStats]:
+    stats = FileStats(path)
+    start = time.perf_counter()
+    source = _read_source(path)
+    parts = min(jobs or os.cpu_count() or 1, len(source) // _MIN_PART_SIZE)
+    findings = _lint_source_in_parts(source, path, extend_select, stats, parts=parts)
+    stats.seconds = time.perf_counter() - start
+    return findings, stats
+
+
+def _lint_file_for_project(
+    path: str, module: str, *, extend_select: Collection[str], budget: Budget | None
+) -> tuple[list[Finding], project.ModuleIndex | None]:
+    source = _read_source(path)
+    try:
+        tree = _parse(source, path)
+    except SyntaxError as e:
+        return [_syntax_error_finding(path, e)], None
+    lines = _SourceLines(source)
+    pyi_visitor = _make_visitor(path, extend_select, budget, lines)
+    pyi_errors = list(chain(_check_lines(lines), pyi_visitor.run(tree)))
+    index = project.index_module(tree, path, module, pyi_visitor)
+    # Unused private definitions are only reported
+    # if they aren't imported by another module in the project
+    unused = {
+        (definition.lineno, definition.col, definition.message)
+        for definition in index.unused_private
+    }
+    pyi_errors = [
+        error
+        for error in pyi_errors
+        if (error.lineno, error.col, error.message) not in unused
+    ]
+    return list(_to_findings(pyi_errors, path, extend_select)), index
+
+
+def _lint_project(
+    roots: Sequence[str],
+    *,
+    extend_select: Collection[str],
+    budget: Budget | None,
+    jobs: int | None,
+) -> bool:
+    paths: list[str] = []
+    modules: list[str] = []
+    for root in roots:
+        for path in iter_stub_files([root]):
+            paths.append(path)
+            modules.append(project.module_name(path, root))
+    if len(paths) <= 1:
+        jobs = 1
+    worker = partial(_lint_file_for_project, extend_select=extend_select, budget=budget)
+    findings_by_path: dict[str, list[Finding]] = {}
+    indexes: list[project.ModuleIndex] = []
+    results = _map_in_parallel(
+        worker, paths, modules, jobs=jobs, pack=_pack_results, unpack=_unpack_results
+    )
+    for path, (findings, index) in zip(paths, results):
+        findings_by_path[path] = findings
+        if index is not None:
+            indexes.append(index)
+    for index, definition in project.find_unused_definitions(indexes):
+        code, _, message = definition.message.partition(" ")
+        if _is_selected(code, extend_select):
+            findings_by_path[index.path].append(
+                Finding(index.path, definition.lineno, definition.col, code, message)
+            )
+    found_errors = False
+    for findings in findings_by_path.values():
+        for finding in sorted(findings):
+            found_errors = True
+            print(finding)
+    return found_errors
+
+
+def _lint_distribution(
+    path: str, *, extend_select: Collection[str], budget: Budget | None
+) -> tuple[list[Finding], list[FileStats]]:
+    findings: list[Finding] = []
+    file_stats: list[FileStats] = []
+    for stub in iter_stub_files([path]):
+        stub_findings, stats = _lint_file_with_stats(
+            stub, extend_select=extend_select, streaming=False, budget=budget
+        )
+        findings += stub_findings
+        file_stats.append(stats)
+    return findings, file_stats
+
+
+def _lint_typeshed(
+    roots: Sequence[str],
+    *,
+    extend_select: Collection[str],
+    budget: Budget | None,
+    jobs: int | None,
+    cache_dir: str,
+    metrics_file: str | None,
+) -> bool:
+    cache = typeshed.DistributionCache(
+        cache_dir, (sorted(extend_select), budget), _EXCLUDED_DIRECTORIES
+    )
+    distributions = [
+        distribution
+        for root in roots
+        for distribution in typeshed.find_distributions(root)
+    ]
+    keys = [cache.key(distribution) for distribution in distributions]
+    cached = [
+        cache.get(distribution, key) for distribution, key in zip(distributions, keys)
+    ]
+    outdated = [
+        distribution.path
+        for distribution, rows in zip(distributions, cached)
+        if rows is None
+    ]
+    if len(outdated) <= 1:
+        jobs = 1
+    worker = partial(_lint_distribution, extend_select=extend_select, budget=budget)
+    # Each distribution is a separate unit of work, so that a large one
+    # (such as stdlib) doesn't hold up the distributions it would be chunked with
+    results = _map_in_parallel(
+        worker,
+        outdated,
+        jobs=jobs,
+        pack=_pack_results,
+        unpack=_unpack_results,
+        chunksize=1,
+    )
+    found_errors = False
+    metrics = LintMetrics()
+    for distribution, key, rows in zip(distributions, keys, cached):
+        metrics.record_cache_lookup(hit=rows is not None)
+        if rows is None:
+            findings, file_stats = next(results)
+            cache.put(distribution, key, findings)
+            for stats in file_stats:
+                metrics.record_file(stats)
+        else:
+            findings = [Finding._make(row) for row in rows]
+        metrics.record_findings(findings)
+        for finding in findings:
+            found_errors = True
+            print(finding)
+        if findings:
+            sys.stdout.flush()
+    if metrics_file:
+        metrics.write(metrics_file)
+    return found_errors
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = _make_argument_parser()
+    args = parser.parse_args(argv)
+    extend_select = [code.strip() for code in args.extend_select.split(",") if code]
+    _check_paths_exist(parser, args)
+    _check_incompatible_options(parser, args)
+    if args.profile_memory and COMPILED:
+        # The profiler instruments the visitor's functions and methods,
+        # which can't be replaced once they are compiled
+        parser.error(
+            "--profile-memory requires the pure Python build of flake8-pyi "
+            "(pip install --no-binary flake8-pyi flake8-pyi)"
+        )
+    target_versions = _parse_target_versions(parser, args)
+    budget = _parse_budget(args)
+
+    if args.watch:
+        try:
+            watch(
+                args.paths,
+                extend_select=extend_select,
+                budget=budget,
+                interval=args.interval,
+                debounce=args.debounce,
+            )
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    jobs = args.jobs
+    if args.typeshed:
+        return int(
+            _lint_typeshed(
+                args.paths,
+                extend_select=extend_select,
+                budget=budget,
+                jobs=jobs,
+                cache_dir=args.cache_dir,
+                metrics_file=args.metrics_file,
+            )
+        )
+    if args.project:
+        if any(archives.is_archive(path) for path in args.paths):
+            parser.error("--project cannot be used with archives")
+        return int(
+            _lint_project(
+                args.paths, extend_select=extend_select, budget=budget, jobs=jobs
+            )
+        )
+    paths = list(iter_stub_files(args.paths))
+    if args.profile_memory:
+        jobs = 1
+    if target_versions:
+        found_errors = _lint_for_versions(
+            paths,
+            target_versions,
+            extend_select=extend_select,
+            budget=budget,
+            jobs=jobs if len(paths) > 1 else 1,
+        )
+    elif args.profile_memory:
+        profiler = MemoryProfiler()
+        with profiler.instrumented():
+            found_errors = _lint_paths(
+                paths,
+                extend_select=extend_select,
+                budget=budget,
+                streaming=args.streaming,
+                jobs=jobs,
+                metrics_file=args.metrics_file,
+                profiler=profiler,
+            )
+        print(profiler.report(), file=sys.stderr)
+    else:
+        found_errors = _lint_paths(
+            paths,
+            extend_select=extend_select,
+            budget=budget,
+            streaming=args.streaming,
+            jobs=jobs,
+            metrics_file=args.metrics_file,
+            profiler=None,
+        )
+    return int(found_errors)
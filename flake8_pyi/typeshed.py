@@ -0,0 +1,130 @@
+"""Lint a checkout of typeshed one distribution at a time, with a cache.
+
+typeshed contains the stubs for the standard library in `stdlib`,
+and the stubs for each third-party distribution in `stubs/<distribution>`,
+next to the distribution's `METADATA.toml`. Each of these is linted as an
+independent unit, and its findings are cached, keyed by a hash of its
+directory tree. When a single distribution changes, only that distribution
+needs to be linted again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+from collections.abc import Collection
+from typing import NamedTuple, TypeAlias
+
+# A finding as stored in the cache: (filename, lineno, col, code, message)
+FindingRow: TypeAlias = tuple[str, int, int, str, str]
+
+_METADATA_FILE = "METADATA.toml"
+
+
+class Distribution(NamedTuple):
+    # "stdlib" for the standard library
+    name: str
+    path: str
+
+
+def find_distributions(typeshed: str) -> list[Distribution]:
+    """Return the standard library and the distributions in a typeshed checkout.
+
+    They are returned in the same order as their stubs would be linted
+    if `typeshed` was passed to the runner as a directory.
+    """
+    distributions = []
+    stdlib = os.path.join(typeshed, "stdlib")
+    if os.path.isdir(stdlib):
+        distributions.append(Distribution("stdlib", stdlib))
+    stubs = os.path.join(typeshed, "stubs")
+    if os.path.isdir(stubs):
+        for name in sorted(os.listdir(stubs)):
+            path = os.path.join(stubs, name)
+            if os.path.isfile(os.path.join(path, _METADATA_FILE)):
+                distributions.append(Distribution(name, path))
+    return distributions
+
+
+def hash_tree(path: str, excluded_directories: Collection[str]) -> str:
+    """Return a hash of the names and contents of all files below `path`."""
+    digest = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames[:] = sorted(d for d in dirnames if d not in excluded_directories)
+        for filename in sorted(filenames):
+            file_path = os.path.join(dirpath, filename)
+            relative_path = os.path.relpath(file_path, path).replace(os.sep, "/")
+            with open(file_path, "rb") as file:
+                contents = file.read()
+            digest.update(relative_path.encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(hashlib.sha256(contents).digest())
+    return digest.hexdigest()
+
+
+class DistributionCache:
+    """The findings for each distribution, stored as a JSON file per distribution.
+
+    Cached findings are only used if the distribution's directory tree
+    hasn't changed since they were stored. They are also invalidated by
+    changes to flake8-pyi itself, to the Python version, or to `options`
+    (anything else that the findings depend on, such as selected codes).
+    """
+
+    def __init__(
+        self, directory: str, options: object, excluded_directories: Collection[str]
+    ) -> None:
+        self.directory = directory
+        self.excluded_directories = excluded_directories
+        implementation = hash_tree(os.path.dirname(__file__), excluded_directories)
+        environment = repr((implementation, sys.version_info[:2], options))
+        self._environment_hash = hashlib.sha256(environment.encode("utf-8")).digest()
+
+    def key(self, distribution: Distribution) -> str:
+        digest = hashlib.sha256(self._environment_hash)
+        digest.update(hash_tree(distribution.path, self.excluded_directories).encode())
+        return digest.hexdigest()
+
+    def _path(self, distribution: Distribution) -> str:
+        # Distributions in different checkouts of typeshed (or the standard
+        # library and a third-party distribution called "stdlib") share a name,
+        # so the file name also includes a hash of the distribution's location
+        location = os.path.abspath(distribution.path).encode("utf-8")
+        location_hash = hashlib.sha256(location).hexdigest()[:16]
+        return os.path.join(self.directory, f"{distribution.name}-{location_hash}.json")
+
+    def get(self, distribution: Distribution, key: str) -> list[FindingRow] | None:
+        """Return the cached findings for `distribution`, if they are up to date."""
+        try:
+            with open(self._path(distribution), encoding="utf-8") as file:
+                entry = json.load(file)
+            if entry["key"] != key:
+                return None
+            return [
+                (os.path.join(distribution.path, relative_path), *rest)
+                for relative_path, *rest in entry["findings"]
+            ]
+        except (OSError, ValueError, KeyError, TypeError):
+            # A missing or corrupt entry is treated like an outdated one
+            return None
+
+    def put(
+        self, distribution: Distribution, key: str, findings: Collection[FindingRow]
+    ) -> None:
+        entry = {
+            "key": key,
+            "findings": [
+                (os.path.relpath(filename, distribution.path), *rest)
+                for filename, *rest in findings
+            ],
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(distribution)
+        # Write to a temporary file first, so that an interrupted run
+        # (or a concurrent one) never leaves a partially written entry behind
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(entry, file)
+        os.replace(temporary_path, path)
@@ -4,16 +4,33 @@ from __future__ import annotations
 import ast
 import re
 import sys
+import time
 import types
 from collections import Counter, defaultdict
-from collections.abc import Container, Iterable, Iterator, Sequence, Set as AbstractSet
-from contextlib import contextmanager
+from collections.abc import (
+    Callable,
+    Container,
+    Iterable,
+    Iterator,
+    Mapping,
+    Sequence,
+    Set as AbstractSet,
+)
 from copy import deepcopy
 from dataclasses import dataclass
 from functools import cached_property, partial
 from itertools import chain, groupby, zip_longest
 from keyword import iskeyword
-from typing import TYPE_CHECKING, Literal, NamedTuple, Protocol, TypeAlias, TypeGuard
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Literal,
+    NamedTuple,
+    Protocol,
+    TypeAlias,
+    TypeGuard,
+    TypeVar,
+)
 
 from . import checker, errors
 from .errors import Error
@@ -36,9 +53,20 @@ class TypeVarInfo(NamedTuple):
 
 
 class NodeWithLocation(Protocol):
+    @property
+    def lineno(self) -> int: ...
+    @property
+    def col_offset(self) -> int: ...
+
+
+class DefinitionLocation(NamedTuple):
     lineno: int
     col_offset: int
 
+    @classmethod
+    def of(cls, node: NodeWithLocation) -> DefinitionLocation:
+        return cls(node.lineno, node.col_offset)
+
 
 def all_equal(iterable: Iterable[object]) -> bool:
     """Returns True if all the elements are equal to each other.
@@ -140,6 +168,11 @@ _BAD_TYPINGEXTENSIONS_Y023_IMPORTS = frozenset(
 )
 
 
+# Whether this module was compiled with mypyc (see pyproject.toml).
+# Compiled functions aren't instances of types.FunctionType.
+COMPILED = not isinstance(all_equal, types.FunctionType)
+
+
 def _ast_node_for(string: str) -> ast.AST:
     """Helper function for doctests."""
     expr = ast.parse(string).body[0]
@@ -159,6 +192,7 @@ def _is_name(node: ast.AST | None, name: str) -> bool:
 
 _TYPING_MODULES = frozenset({"typing", "typing_extensions"})
 _TYPING_OR_COLLECTIONS_ABC = _TYPING_MODULES | {"collections.abc"}
+_BUILTINS_MODULE = frozenset({"builtins"})
 
 
 def _is_object(node: ast.AST | None, name: str, *, from_: Container[str]) -> bool:
@@ -241,6 +275,24 @@ def _is_IncompleteOrNone(node: ast.expr | None) -> bool:
     return _is_union(node) and _is_Incomplete(node.left) and _is_None(node.right)
 
 
+def _dotted_name(node: ast.expr) -> str | None:
+    """Return the dotted name `node` refers to, or `None` if it isn't one.
+
+    >>> _dotted_name(_ast_node_for('collections.abc.Iterable'))
+    'collections.abc.Iterable'
+    >>> _dotted_name(_ast_node_for('foo().bar')) is None
+    True
+    """
+    parts: list[str] = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
 def _get_name_of_class_if_from_modules(
     classnode: ast.expr, *, modules: Container[str]
 ) -> str | None:
@@ -417,6 +469,14 @@ def _has_bad_hardcoded_returns(
     return False
 
 
+def _decorator_names(node: ast.FunctionDef | ast.AsyncFunctionDef) -> set[str]:
+    return {
+        decorator.id
+        for decorator in node.decorator_list
+        if isinstance(decorator, ast.Name)
+    }
+
+
 def _unparse_func_node(node: ast.FunctionDef | ast.AsyncFunctionDef) -> str:
     """Unparse a function node, and reformat it to fit on one line."""
     return re.sub(r"\s+", " ", ast.unparse(node))
@@ -461,8 +521,29 @@ def _is_assignment_which_must_have_a_value(
     )
 
 
+def _union_member_key(node: ast.expr) -> str:
+    """Return a key that is the same for union members that are the same.
+
+    Most union members are names or `None`, whose key is their source.
+    This avoids calling `ast.dump()`, which is slow, for them.
+    Their keys can't be confused with the dumps of other nodes.
+
+    >>> _union_member_key(_ast_node_for("int"))
+    'int'
+    >>> _union_member_key(_ast_node_for("None"))
+    'None'
+    >>> _union_member_key(_ast_node_for("builtins.int")).startswith("Attribute(")
+    True
+    """
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Constant) and node.value is None:
+        return "None"
+    return ast.dump(node)
+
+
 class UnionAnalysis(NamedTuple):
-    members_by_dump: defaultdict[str, list[ast.expr]]
+    members_by_key: defaultdict[str, list[ast.expr]]
     dupes_in_union: bool
     builtins_classes_in_union: set[str]
     multiple_literals_in_union: bool
@@ -479,8 +560,7 @@ def _analyse_union(members: Sequence[ast.expr]) -> UnionAnalysis:
     >>> source = 'Union[int, memoryview, memoryview, Literal["foo"], Literal[1], type[float], type[str]]'
     >>> union = _ast_node_for(source)
     >>> analysis = _analyse_union(union.slice.elts)
-    >>> dump = "Name(id='memoryview')" if sys.version_info >= (3, 15) else "Name(id='memoryview', ctx=Load())"
-    >>> len(analysis.members_by_dump[dump])
+    >>> len(analysis.members_by_key["memoryview"])
     2
     >>> analysis.dupes_in_union
     True
@@ -501,16 +581,20 @@ def _analyse_union(members: Sequence[ast.expr]) -> UnionAnalysis:
     """
 
     non_literals_in_union = False
-    members_by_dump: defaultdict[str, list[ast.expr]] = defaultdict(list)
+    members_by_key: defaultdict[str, list[ast.expr]] = defaultdict(list)
+    dupes_in_union = False
     builtins_classes_in_union: set[str] = set()
     literals_in_union = []
     combined_literal_members: list[ast.expr] = []
     type_subscripts_in_union: list[ast.expr] = []
 
     for member in members:
-        members_by_dump[ast.dump(member)].append(member)
+        same_members = members_by_key[_union_member_key(member)]
+        if same_members:
+            dupes_in_union = True
+        same_members.append(member)
         name_if_builtins_cls = _get_name_of_class_if_from_modules(
-            member, modules={"builtins"}
+            member, modules=_BUILTINS_MODULE
         )
         if name_if_builtins_cls is not None:
             builtins_classes_in_union.add(name_if_builtins_cls)
@@ -528,8 +612,8 @@ def _analyse_union(members: Sequence[ast.expr]) -> UnionAnalysis:
             combined_literal_members.append(literal)
 
     return UnionAnalysis(
-        members_by_dump=members_by_dump,
-        dupes_in_union=any(len(lst) > 1 for lst in members_by_dump.values()),
+        members_by_key=members_by_key,
+        dupes_in_union=dupes_in_union,
         builtins_classes_in_union=builtins_classes_in_union,
         multiple_literals_in_union=len(literals_in_union) >= 2,
         non_literals_in_union=non_literals_in_union,
@@ -578,22 +662,36 @@ _COMMON_METACLASSES = {
 }
 
 
+# For each base of a class, the modules that the base may have been imported from
+# (None if the base is a bare name, rather than e.g. `typing.Protocol`)
+_BasesMap: TypeAlias = Mapping[str, AbstractSet[str | None]]
+
+
 @dataclass(frozen=True)
 class EnclosingClassContext:
     node: ast.ClassDef
     cls_name: str
-    bases_map: defaultdict[str, set[str | None]]
-
-    def contains_in_bases(self, obj: str, *, from_: AbstractSet[str]) -> bool:
-        if obj not in self.bases_map:
+    # The bases listed in the class definition
+    bases_map: _BasesMap
+    # The bases listed in the class definition, plus the bases of any classes
+    # in the same module that the class inherits from, directly or indirectly
+    all_bases_map: _BasesMap
+
+    def contains_in_bases(
+        self, obj: str, *, from_: AbstractSet[str], direct: bool = False
+    ) -> bool:
+        bases_map = self.bases_map if direct else self.all_bases_map
+        if obj not in bases_map:
             return False
-        if None in self.bases_map[obj]:
+        if None in bases_map[obj]:
             return True
-        return bool(self.bases_map[obj] & from_)
+        return not bases_map[obj].isdisjoint(from_)
 
     @cached_property
     def is_protocol_class(self) -> bool:
-        return self.contains_in_bases("Protocol", from_=_TYPING_MODULES)
+        # Subclasses of a protocol are only protocols themselves
+        # if they list Protocol as a base again (PEP 544)
+        return self.contains_in_bases("Protocol", from_=_TYPING_MODULES, direct=True)
 
     @cached_property
     def is_typeddict_class(self) -> bool:
@@ -603,7 +701,9 @@ class EnclosingClassContext:
 
     @cached_property
     def is_enum_class(self) -> bool:
-        return any(base_name.endswith(("Enum", "Flag")) for base_name in self.bases_map)
+        return any(
+            base_name.endswith(("Enum", "Flag")) for base_name in self.all_bases_map
+        )
 
     @cached_property
     def is_metaclass(self) -> bool:
@@ -622,21 +722,9 @@ class ClassBase(NamedTuple):
     obj: str
 
 
-def _analyze_classdef(node: ast.ClassDef) -> EnclosingClassContext:
+def _class_bases(node: ast.ClassDef) -> defaultdict[str, set[str | None]]:
     bases_map: defaultdict[str, set[str | None]] = defaultdict(set)
 
-    def _unravel(node: ast.expr) -> str | None:
-        match node:
-            case ast.Name(id):
-                return id
-            case ast.Attribute(value=value, attr=attr):
-                value_str = _unravel(value)
-                if value_str is None:
-                    return None
-                return f"{value_str}.{attr}"
-            case _:
-                return None
-
     def _analyze_base_node(
         base_node: ast.expr, top_level: bool = True
     ) -> ClassBase | None:
@@ -644,7 +732,7 @@ def _analyze_classdef(node: ast.ClassDef) -> EnclosingClassContext:
             case ast.Name(id):
                 return ClassBase(None, id)
             case ast.Attribute(value=value, attr=attr):
-                unravelled = _unravel(value)
+                unravelled = _dotted_name(value)
                 if unravelled is None:
                     return None
                 return ClassBase(unravelled, attr)
@@ -659,7 +747,117 @@ def _analyze_classdef(node: ast.ClassDef) -> EnclosingClassContext:
             continue
         bases_map[base.obj].add(base.module)
 
-    return EnclosingClassContext(node=node, cls_name=node.name, bases_map=bases_map)
+    return bases_map
+
+
+class ClassIndex:
+    """The bases of the classes defined at the top level of a module.
+
+    This is used to classify classes that inherit from other classes
+    in the same module, e.g. `class _Base(TypedDict): ...` and
+    `class Movie(_Base): ...`. Classes defined in `if` blocks
+    (e.g. `if sys.version_info >= (3, 11):`) count as top-level classes.
+    If a class is defined more than once, the bases of all its definitions
+    are combined.
+
+    Only the bases are stored, rather than the class definitions,
+    so that a tree can be freed once it has been visited
+    (see `PyiVisitor.run_incrementally()`).
+
+    >>> index = ClassIndex()
+    >>> index.add(ast.parse("class A(Protocol): ...\\nclass B(A, Generic[T]): ..."))
+    >>> [classdef] = ast.parse("class C(B): ...").body
+    >>> sorted(index.all_bases(_class_bases(classdef)))
+    ['A', 'B', 'Generic', 'Protocol']
+    """
+
+    def __init__(self) -> None:
+        self._direct_bases: defaultdict[str, dict[str, set[str | None]]] = defaultdict(
+            dict
+        )
+        # Memoized results of _resolve()
+        self._resolved: dict[str, _BasesMap] = {}
+
+    @property
+    def direct_bases(self) -> Mapping[str, _BasesMap]:
+        """The direct bases of each indexed class, in a form that can be pickled."""
+        return self._direct_bases
+
+    def add(self, tree: ast.AST) -> None:
+        """Index the top-level classes in `tree`, a module or part of a module."""
+        if not isinstance(tree, ast.Module):
+            return
+        statements = list(tree.body)
+        while statements:
+            statement = statements.pop()
+            if isinstance(statement, ast.ClassDef):
+                self._add_class(statement.name, _class_bases(statement))
+            elif isinstance(statement, ast.If):
+                statements += statement.body
+                statements += statement.orelse
+        # The new classes may be bases of classes that were already resolved
+        self._resolved.clear()
+
+    def update(self, direct_bases: Mapping[str, _BasesMap]) -> None:
+        """Index the classes in `direct_bases`, e.g. another index's `direct_bases`."""
+        for cls_name, bases_map in direct_bases.items():
+            self._add_class(cls_name, bases_map)
+        self._resolved.clear()
+
+    def _add_class(self, cls_name: str, bases_map: _BasesMap) -> None:
+        indexed_bases_map = self._direct_bases[cls_name]
+        for base, modules in bases_map.items():
+            indexed_bases_map.setdefault(base, set()).update(modules)
+
+    def all_bases(self, bases_map: _BasesMap) -> _BasesMap:
+        """Add the bases of the indexed classes in `bases_map`, recursively."""
+        all_bases: defaultdict[str, set[str | None]] = defaultdict(set)
+        for base, modules in bases_map.items():
+            all_bases[base] |= modules
+            if None in modules and base in self._direct_bases:
+                for indirect_base, indirect_modules in self._resolve(base).items():
+                    all_bases[indirect_base] |= indirect_modules
+        return all_bases
+
+    def _resolve(self, cls_name: str) -> _BasesMap:
+        """Find the bases of all the indexed classes that `cls_name` inherits from.
+
+        A class inheriting from itself (indirectly) is an error,
+        but checking it mustn't loop forever. The result doesn't depend
+        on the order in which classes are resolved, as parts of a stub
+        may be checked in different processes.
+        """
+        if cls_name in self._resolved:
+            return self._resolved[cls_name]
+        resolved: defaultdict[str, set[str | None]] = defaultdict(set)
+        seen = {cls_name}
+        to_resolve = [cls_name]
+        while to_resolve:
+            name = to_resolve.pop()
+            if name != cls_name and name in self._resolved:
+                # The bases of the indexed classes it inherits from are included
+                for base, modules in self._resolved[name].items():
+                    resolved[base] |= modules
+                continue
+            for base, modules in self._direct_bases[name].items():
+                resolved[base] |= modules
+                if None in modules and base in self._direct_bases and base not in seen:
+                    seen.add(base)
+                    to_resolve.append(base)
+        self._resolved[cls_name] = resolved
+        return resolved
+
+
+def _analyze_classdef(
+    node: ast.ClassDef, class_index: ClassIndex
+) -> EnclosingClassContext:
+    bases_map = _class_bases(node)
+    return EnclosingClassContext(
+        node=node,
+        cls_name=node.name,
+        bases_map=bases_map,
+        all_bases_map=class_index.all_bases(bases_map),
+    )
 
 
 _NEGATABLE_MATH_ATTRIBUTES_IN_DEFAULTS = frozenset(
@@ -749,15 +947,15 @@ def _is_valid_pep_604_union_member(node: ast.expr) -> bool:
 
 def _is_valid_pep_604_union(node: ast.expr) -> TypeGuard[ast.BinOp]:
     """Does `node` represent a valid PEP-604 union (e.g. `int | str`)?"""
-    return (
-        isinstance(node, ast.BinOp)
-        and isinstance(node.op, ast.BitOr)
-        and (
-            _is_valid_pep_604_union_member(node.left)
-            or _is_valid_pep_604_union(node.left)
-        )
-        and _is_valid_pep_604_union_member(node.right)
-    )
+    if not (isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr)):
+        return False
+    # str|int|None parses as BinOp(BinOp(str, |, int), |, None)
+    current: ast.expr = node
+    while isinstance(current, ast.BinOp) and isinstance(current.op, ast.BitOr):
+        if not _is_valid_pep_604_union_member(current.right):
+            return False
+        current = current.left
+    return _is_valid_pep_604_union_member(current)
 
 
 def _is_valid_default_value_without_annotation(node: ast.expr) -> bool:
@@ -771,6 +969,23 @@ def _is_valid_default_value_without_annotation(node: ast.expr) -> bool:
             return _is_valid_pep_604_union(node)
 
 
+# Y042: Error for type alias names that start with a lowercase letter
+_Y042_REGEX = re.compile(r"^_?[a-z]")
+
+# Y043: Error for alias names in "T"
+# (plus possibly a single digit afterwards), but only if:
+#
+# - The name starts with "_"
+# - The penultimate character in the name is an ASCII-lowercase letter
+_Y043_REGEX = re.compile(r"^_.*[a-z]T\d?$")
+
+# The error codes that _check_import_or_attribute() can return
+_IMPORT_OR_ATTRIBUTE_CODES = frozenset({"Y022", "Y023", "Y024", "Y037", "Y039", "Y057"})
+
+# The length of the longest module name that _check_import_or_attribute() checks
+_MAX_CHECKED_MODULE_NAME_LENGTH = len(max(_TYPING_OR_COLLECTIONS_ABC, key=len))
+
+
 def _check_import_or_attribute(
     node: ast.Attribute | ast.ImportFrom, module_name: str, object_name: str
 ) -> str | None:
@@ -830,17 +1045,34 @@ def _check_import_or_attribute(
 
 @dataclass
 class NestingCounter:
-    """Class to help the PyiVisitor keep track of internal state."""
+    """Class to help the PyiVisitor keep track of internal state.
+
+    >>> counter = NestingCounter()
+    >>> with counter.enabled():
+    ...     with counter.enabled():
+    ...         counter.nesting
+    ...     counter.active
+    2
+    True
+    >>> counter.active
+    False
+    """
 
     nesting: int = 0
 
-    @contextmanager
-    def enabled(self) -> Iterator[None]:
+    def enabled(self) -> NestingCounter:
+        """Use the counter as a context manager that increments its nesting.
+
+        The counter is its own context manager, rather than a generator-based
+        one, as this is used for many nodes of every stub.
+        """
+        return self
+
+    def __enter__(self) -> None:
         self.nesting += 1
-        try:
-            yield
-        finally:
-            self.nesting -= 1
+
+    def __exit__(self, *args: object) -> None:
+        self.nesting -= 1
 
     @property
     def active(self) -> bool:
@@ -848,28 +1080,140 @@ class NestingCounter:
         return bool(self.nesting)
 
 
+_CheckT = TypeVar("_CheckT", bound=Callable[..., None])
+
+
+class Rule(NamedTuple):
+    """A self-contained check that runs on every node of certain types.
+
+    Rules are dispatched by `PyiVisitor.visit()` after the `visit_*` method
+    for the node (and so after the node's children have been visited).
+    The `visit_*` methods restore any context they change, such as
+    the enclosing class, so rules see the same context as those methods do.
+    A rule is skipped entirely if all of the error codes it can emit are disabled.
+    """
+
+    method_name: str
+    node_types: tuple[type[ast.AST], ...]
+    codes: frozenset[str]
+
+
+# All rules, in the order in which they are run for each node
+RULES: list[Rule] = []
+
+
+def rule(
+    *node_types: type[ast.AST], codes: Iterable[str]
+) -> Callable[[_CheckT], _CheckT]:
+    """Register a `PyiVisitor` method as a rule for nodes of `node_types`."""
+
+    def decorator(method: _CheckT) -> _CheckT:
+        RULES.append(Rule(method.__name__, node_types, frozenset(codes)))
+        return method
+
+    return decorator
+
+
+class Budget(NamedTuple):
+    """Per-file limits on the resources that PyiVisitor may use.
+
+    When a limit is exceeded, the rest of the file is skipped,
+    and a Y070 error is reported instead.
+    """
+
+    # Time spent visiting the file, in seconds
+    max_seconds: float | None = None
+    # Number of errors reported for the file
+    max_findings: int | None = None
+    # Number of AST nodes visited
+    max_nodes: int | None = None
+
+
+# How many nodes are visited between checks of the time budget
+_NODES_PER_CLOCK_CHECK = 256
+
+
+class _BudgetExceeded(Exception):
+    def __init__(self, location: NodeWithLocation | None, reason: str) -> None:
+        super().__init__(reason)
+        self.location = location
+        self.reason = reason
+
+
+_RuleDispatchTable: TypeAlias = dict[
+    type[ast.AST], tuple[Callable[["PyiVisitor", Any], None], ...]
+]
+
+
+# The source code of a function's signature after its name,
+# and the column at which it starts
+_SignatureKey: TypeAlias = tuple[str, int]
+
+# The start of a function definition, up to the bracket after its name
+_FUNCTION_DEF_START = re.compile(r"(?:async\s+)?def\s+(\w+)\s*[(\[]")
+
+
+class ModuleState(NamedTuple):
+    """The state that `PyiVisitor` keeps for the whole module it visits.
+
+    It is needed to find the private things that are never used in the module.
+    If parts of a module are visited separately (e.g. in worker processes),
+    the states of the parts can be combined, in order, with
+    `PyiVisitor.merge_module_state()`, and the unused things are then found
+    as if the whole module had been visited in one go.
+    """
+
+    typevarlike_defs: Mapping[TypeVarInfo, list[DefinitionLocation]]
+    protocol_defs: Mapping[str, list[DefinitionLocation]]
+    class_based_typeddicts: Mapping[str, list[DefinitionLocation]]
+    assignment_based_typeddicts: Mapping[str, list[DefinitionLocation]]
+    typealias_decls: Mapping[str, list[DefinitionLocation]]
+    all_name_occurrences: Counter[str]
+
+
+_KeyT = TypeVar("_KeyT")
+
+
+def _merge_definitions(
+    definitions: defaultdict[_KeyT, list[DefinitionLocation]],
+    other: Mapping[_KeyT, list[DefinitionLocation]],
+) -> None:
+    for key, locations in other.items():
+        definitions[key] += locations
+
+
+class _MemoizedSignature(NamedTuple):
+    # (line relative to the function's first line, column, message)
+    errors: tuple[tuple[int, int, str], ...]
+    name_occurrences: Counter[str]
+
+
 class PyiVisitor(ast.NodeVisitor):
     filename: str
     errors: list[Error]
 
     # Mapping of all private TypeVars/ParamSpecs/TypeVarTuples
-    # to the nodes where they're defined.
+    # to the locations where they're defined.
     #
     # The value type is a list, because any given TypeVar
     # could have multiple definitions,
-    # e.g. in different sys.version_info branches
-    typevarlike_defs: defaultdict[TypeVarInfo, list[ast.Assign]]
+    # e.g. in different sys.version_info branches.
+    # Only the locations are stored, rather than the nodes themselves,
+    # so that a subtree can be freed as soon as it has been visited.
+    typevarlike_defs: defaultdict[TypeVarInfo, list[DefinitionLocation]]
     # The same for private protocol definitions
-    protocol_defs: defaultdict[str, list[ast.ClassDef]]
+    protocol_defs: defaultdict[str, list[DefinitionLocation]]
     # The same for class-based private TypedDicts
-    class_based_typeddicts: defaultdict[str, list[ast.ClassDef]]
+    class_based_typeddicts: defaultdict[str, list[DefinitionLocation]]
     # And for assignment-based TypedDicts
-    assignment_based_typeddicts: defaultdict[str, list[ast.Assign]]
+    assignment_based_typeddicts: defaultdict[str, list[DefinitionLocation]]
     # And for private TypeAliases
-    typealias_decls: defaultdict[str, list[_TypeAliasNodeType]]
+    typealias_decls: defaultdict[str, list[DefinitionLocation]]
 
     # Mapping of each name in the file to the no. of occurrences
     all_name_occurrences: Counter[str]
+    # The bases of the classes defined in the file
+    class_index: ClassIndex
 
     string_literals_allowed: NestingCounter
     long_strings_allowed: NestingCounter
@@ -880,8 +1224,31 @@ class PyiVisitor(ast.NodeVisitor):
     # This is only relevant for visiting classes
     enclosing_class_ctx: EnclosingClassContext | None = None
 
-    def __init__(self, filename: str) -> None:
+    def __init__(
+        self,
+        filename: str,
+        *,
+        disabled_codes: AbstractSet[str] = frozenset(),
+        budget: Budget | None = None,
+        lines: Sequence[str] | None = None,
+    ) -> None:
         self.filename = filename
+        # The source lines of the module, if they're available.
+        # They are used to recognise signatures that are repeated in the module.
+        self.lines = lines
+        # None for signatures that have only been seen once
+        self._signature_memo: dict[_SignatureKey, _MemoizedSignature | None] = {}
+        self._rules_by_node_type = self._make_rule_dispatch_table(disabled_codes)
+        self._visitor_methods: dict[type[ast.AST], Callable[[Any], None] | None] = {}
+        self.budget = budget
+        self._nodes_visited = 0
+        self._errors_reported = 0
+        self._deadline = float("inf")
+        self._last_location: NodeWithLocation | None = None
+        # The last attribute checked by check_attribute(), and its dotted name
+        self._last_attribute: tuple[ast.Attribute, str | None] | None = None
+        # Whether checking stopped early because the budget was exceeded
+        self.stopped_early = False
         self.errors = []
         self.typevarlike_defs = defaultdict(list)
         self.protocol_defs = defaultdict(list)
@@ -889,6 +1256,7 @@ class PyiVisitor(ast.NodeVisitor):
         self.assignment_based_typeddicts = defaultdict(list)
         self.typealias_decls = defaultdict(list)
         self.all_name_occurrences = Counter()
+        self.class_index = ClassIndex()
         self.string_literals_allowed = NestingCounter()
         self.long_strings_allowed = NestingCounter()
         self.in_function = NestingCounter()
@@ -898,6 +1266,92 @@ class PyiVisitor(ast.NodeVisitor):
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}(filename={self.filename!r})"
 
+    @classmethod
+    def _make_rule_dispatch_table(
+        cls, disabled_codes: AbstractSet[str]
+    ) -> _RuleDispatchTable:
+        rules_by_node_type: defaultdict[
+            type[ast.AST], list[Callable[[PyiVisitor, Any], None]]
+        ] = defaultdict(list)
+        for rule in RULES:
+            if rule.codes <= disabled_codes:
+                continue
+            # Look the method up on the class, rather than storing the function
+            # when the rule is registered, so that it can be patched by the profiler
+            check = getattr(cls, rule.method_name)
+            for node_type in rule.node_types:
+                rules_by_node_type[node_type].append(check)
+        return {
+            node_type: tuple(checks) for node_type, checks in rules_by_node_type.items()
+        }
+
+    def _charge_for_node(self, node: ast.AST, budget: Budget) -> None:
+        self._nodes_visited += 1
+        if isinstance(node, (ast.stmt, ast.expr, ast.arg)):
+            self._last_location = node
+        if budget.max_nodes is not None and self._nodes_visited > budget.max_nodes:
+            raise _BudgetExceeded(
+                self._last_location, f"it has more than {budget.max_nodes} AST nodes"
+            )
+        if (
+            self._nodes_visited % _NODES_PER_CLOCK_CHECK == 0
+            and time.perf_counter() > self._deadline
+        ):
+            raise _BudgetExceeded(
+                self._last_location,
+                f"checking it took more than {budget.max_seconds} seconds",
+            )
+
+    def _visitor_method(self, node: ast.AST) -> Callable[[Any], None] | None:
+        """Return the `visit_*` method for `node`, if there is one."""
+        node_type = type(node)
+        if isinstance(node, ast.BinOp) and not isinstance(node.op, ast.BitOr):
+            # Only unions are handled by visit_BinOp()
+            return None
+        try:
+            return self._visitor_methods[node_type]
+        except KeyError:
+            method = getattr(self, f"visit_{node_type.__name__}", None)
+            self._visitor_methods[node_type] = method
+            return method
+
+    def visit(self, node: ast.AST) -> None:
+        if self.budget is not None:
+            self._charge_for_node(node, self.budget)
+        visitor_method = self._visitor_method(node)
+        if visitor_method is None:
+            self.generic_visit(node)
+        else:
+            visitor_method(node)
+        for check in self._rules_by_node_type.get(type(node), ()):
+            check(self, node)
+
+    def generic_visit(self, node: ast.AST) -> None:
+        # Unlike ast.NodeVisitor.generic_visit(), descendants without a visit_*
+        # method are visited using an explicit stack rather than recursively.
+        # Generated stubs can contain expressions like `a.b.c.d` or `1 + 2 + 3`
+        # that are nested thousands of levels deep.
+        rules_by_node_type = self._rules_by_node_type
+        stack = [(node, ast.iter_child_nodes(node))]
+        while stack:
+            parent, children = stack[-1]
+            for child in children:
+                if self.budget is not None:
+                    self._charge_for_node(child, self.budget)
+                visitor_method = self._visitor_method(child)
+                if visitor_method is not None:
+                    visitor_method(child)
+                elif child._fields:
+                    stack.append((child, ast.iter_child_nodes(child)))
+                    break
+                for check in rules_by_node_type.get(type(child), ()):
+                    check(self, child)
+            else:
+                stack.pop()
+                if parent is not node:
+                    for check in rules_by_node_type.get(type(parent), ()):
+                        check(self, parent)
+
     @property
     def visiting_enum_class(self) -> bool:
         return (
@@ -905,15 +1359,33 @@ class PyiVisitor(ast.NodeVisitor):
             and self.enclosing_class_ctx.is_enum_class
         )
 
-    def visit_Attribute(self, node: ast.Attribute) -> None:
-        self.generic_visit(node)
+    @rule(ast.Attribute, codes=_IMPORT_OR_ATTRIBUTE_CODES)
+    def check_attribute(self, node: ast.Attribute) -> None:
+        # Attributes in a chain like `a.b.c` are checked innermost first,
+        # so the name of `a.b` can be reused when `a.b.c` is checked.
+        # Computing it from scratch would be quadratic for long chains.
+        value = node.value
+        if self._last_attribute is not None and value is self._last_attribute[0]:
+            module_name = self._last_attribute[1]
+        else:
+            module_name = _dotted_name(value)
+        if module_name is None:
+            self._last_attribute = (node, None)
+            return
+        name = f"{module_name}.{node.attr}"
+        # Longer names can't be checked modules, and neither can the names of
+        # the attributes enclosing this one; building them would also be quadratic
+        if len(name) > _MAX_CHECKED_MODULE_NAME_LENGTH:
+            self._last_attribute = (node, None)
+        else:
+            self._last_attribute = (node, name)
         if error_msg := _check_import_or_attribute(
-            node=node, module_name=ast.unparse(node.value), object_name=node.attr
+            node=node, module_name=module_name, object_name=node.attr
         ):
             self.error(node, error_msg)
 
-    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
-        self.generic_visit(node)
+    @rule(ast.ImportFrom, codes={"Y025", "Y038", "Y044", *_IMPORT_OR_ATTRIBUTE_CODES})
+    def check_import_from(self, node: ast.ImportFrom) -> None:
         module_name = node.module
 
         if module_name is None:
@@ -954,7 +1426,7 @@ class PyiVisitor(ast.NodeVisitor):
         if cls_name in {"TypeVar", "ParamSpec", "TypeVarTuple"}:
             if object_name.startswith("_"):
                 target_info = TypeVarInfo(cls_name=cls_name, name=object_name)
-                self.typevarlike_defs[target_info].append(node)
+                self.typevarlike_defs[target_info].append(DefinitionLocation.of(node))
             else:
                 self.error(node, errors.Y001.format(cls_name))
 
@@ -1004,7 +1476,9 @@ class PyiVisitor(ast.NodeVisitor):
             function = assignment.func
             if _is_TypedDict(function):
                 if target_name.startswith("_"):
-                    self.assignment_based_typeddicts[target_name].append(node)
+                    self.assignment_based_typeddicts[target_name].append(
+                        DefinitionLocation.of(node)
+                    )
             else:
                 self._check_for_typevarlike_assignments(
                     node=node, function=function, object_name=target_name
@@ -1062,7 +1536,11 @@ class PyiVisitor(ast.NodeVisitor):
             self.error(node, errors.Y026.format(suggestion=ast.unparse(new_node)))
 
     def visit_Name(self, node: ast.Name) -> None:
-        self.generic_visit(node)
+        # Names are the most common nodes in stubs, and their only child is
+        # their context (e.g. `ast.Load`), which isn't checked. Skipping
+        # generic_visit() avoids allocating its stack and iterators.
+        if self.budget is not None:
+            self._charge_for_node(node.ctx, self.budget)
         self.all_name_occurrences[node.id] += 1
 
     def visit_Call(self, node: ast.Call) -> None:
@@ -1080,8 +1558,10 @@ class PyiVisitor(ast.NodeVisitor):
                 self.string_literals_allowed.enabled(),
                 self.long_strings_allowed.enabled(),
             ):
-                for arg in chain(node.args, node.keywords):
+                for arg in node.args:
                     self.visit(arg)
+                for keyword in node.keywords:
+                    self.visit(keyword)
             return
         elif (
             isinstance(function, ast.Attribute)
@@ -1097,8 +1577,10 @@ class PyiVisitor(ast.NodeVisitor):
                 self.visit(node.args[0])
         # But in other arguments they're most likely TypeVar bounds,
         # which should not be quoted.
-        for arg in chain(node.args[1:], node.keywords):
-            self.visit(arg)
+        for index in range(1, len(node.args)):
+            self.visit(node.args[index])
+        for keyword in node.keywords:
+            self.visit(keyword)
 
     def visit_Constant(self, node: ast.Constant) -> None:
         match node.value:
@@ -1107,13 +1589,18 @@ class PyiVisitor(ast.NodeVisitor):
             case str() | bytes() if not self.long_strings_allowed.active:
                 if len(node.value) > 50:
                     self.error(node, errors.Y053)
-            case int() | float() | complex():
+            # The maximum character limit is arbitrary, but here's what it's based on:
+            # Hex representation of 32-bit integers tend to be 10 chars.
+            # So is the decimal representation
+            # of the maximum positive signed 32-bit integer.
+            # 0xFFFFFFFF --> 4294967295
+            case int() if not isinstance(node.value, bool):
+                # Avoid str(), which is slow for huge ints,
+                # and fails for ints with more than 4300 digits
+                if node.value >= 10**10:
+                    self.error(node, errors.Y054)
+            case float() | complex():
                 if len(str(node.value)) > 10:
-                    # The maximum character limit is arbitrary, but here's what it's based on:
-                    # Hex representation of 32-bit integers tend to be 10 chars.
-                    # So is the decimal representation
-                    # of the maximum positive signed 32-bit integer.
-                    # 0xFFFFFFFF --> 4294967295
                     self.error(node, errors.Y054)
 
     def visit_Expr(self, node: ast.Expr) -> None:
@@ -1122,21 +1609,12 @@ class PyiVisitor(ast.NodeVisitor):
         else:
             self.generic_visit(node)
 
-    _Y042_REGEX = re.compile(r"^_?[a-z]")
-
-    # Y043: Error for alias names in "T"
-    # (plus possibly a single digit afterwards), but only if:
-    #
-    # - The name starts with "_"
-    # - The penultimate character in the name is an ASCII-lowercase letter
-    _Y043_REGEX = re.compile(r"^_.*[a-z]T\d?$")
-
     def _check_typealias(self, node: _TypeAliasNodeType, alias_name: str) -> None:
         if alias_name.startswith("_"):
-            self.typealias_decls[alias_name].append(node)
-        if self._Y042_REGEX.match(alias_name):
+            self.typealias_decls[alias_name].append(DefinitionLocation.of(node))
+        if _Y042_REGEX.match(alias_name):
             self.error(node, errors.Y042)
-        if self._Y043_REGEX.match(alias_name):
+        if _Y043_REGEX.match(alias_name):
             self.error(node, errors.Y043)
 
     def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
@@ -1192,9 +1670,12 @@ class PyiVisitor(ast.NodeVisitor):
         if node_value and not _is_valid_default_value_with_annotation(node_value):
             self.error(node, errors.Y015)
 
-    if sys.version_info >= (3, 12):
-
-        def visit_TypeAlias(self, node: ast.TypeAlias) -> None:
+    def visit_TypeAlias(self, node: _TypeAliasNodeType) -> None:
+        # `type X = ...` statements only exist on Python 3.12+. The method is
+        # defined unconditionally, as conditional definitions in class bodies
+        # can't be compiled with mypyc.
+        if sys.version_info >= (3, 12):
+            assert isinstance(node, ast.TypeAlias)
             self.generic_visit(node)
             self._check_typealias(node=node, alias_name=node.name.id)
 
@@ -1235,7 +1716,7 @@ class PyiVisitor(ast.NodeVisitor):
         first_union_member = members[0]
         analysis = _analyse_union(members)
 
-        for member_list in analysis.members_by_dump.values():
+        for member_list in analysis.members_by_key.values():
             if len(member_list) >= 2:
                 self.error(
                     member_list[1], errors.Y016.format(ast.unparse(member_list[1]))
@@ -1330,10 +1811,6 @@ class PyiVisitor(ast.NodeVisitor):
         self.error(first_union_member, errors.Y055.format(suggestion=suggestion))
 
     def visit_BinOp(self, node: ast.BinOp) -> None:
-        if not isinstance(node.op, ast.BitOr):
-            self.generic_visit(node)
-            return
-
         # str|int|None parses as BinOp(BinOp(str, |, int), |, None)
         current: ast.expr = node
         members: list[ast.expr] = []
@@ -1351,7 +1828,17 @@ class PyiVisitor(ast.NodeVisitor):
 
         self._check_union_members(members, is_pep_604_union=True)
 
-    def _Y090_error(self, node: ast.Subscript) -> None:
+    @rule(ast.Subscript, codes={"Y090"})
+    def check_for_single_element_tuple(self, node: ast.Subscript) -> None:
+        if isinstance(node.slice, ast.Tuple) or (
+            isinstance(node.slice, ast.Subscript) and _is_Unpack(node.slice.value)
+        ):
+            return
+        subscripted_object_name = _get_name_of_class_if_from_modules(
+            node.value, modules=_TYPING_MODULES | {"builtins"}
+        )
+        if subscripted_object_name not in {"tuple", "Tuple"}:
+            return
         current_code = ast.unparse(node)
         typ = ast.unparse(node.slice)
         copied_node = deepcopy(node)
@@ -1376,10 +1863,6 @@ class PyiVisitor(ast.NodeVisitor):
             self._visit_slice_tuple(node.slice, subscripted_object_name)
         else:
             self.visit(node.slice)
-            if subscripted_object_name in {"tuple", "Tuple"} and not (
-                isinstance(node.slice, ast.Subscript) and _is_Unpack(node.slice.value)
-            ):
-                self._Y090_error(node)
 
     def _visit_typing_Literal(self, node: ast.Subscript) -> None:
         analysis = _analyse_typing_Literal(node)
@@ -1429,19 +1912,22 @@ class PyiVisitor(ast.NodeVisitor):
             self.visit(node)
 
     def visit_If(self, node: ast.If) -> None:
-        self._check_for_Y066_violations(node)
-
-        test = node.test
         # No types can appear in if conditions, so avoid confusing additional errors.
         with self.string_literals_allowed.enabled():
-            self.visit(test)
+            self.visit(node.test)
+        for line in node.body:
+            self.visit(line)
+        for line in node.orelse:
+            self.visit(line)
+
+    @rule(ast.If, codes={"Y002", "Y003", "Y004", "Y005", "Y006", "Y007", "Y008"})
+    def check_if_test(self, node: ast.If) -> None:
+        test = node.test
         if isinstance(test, ast.BoolOp):
             for expression in test.values:
                 self._check_if_expression(expression)
         else:
             self._check_if_expression(test)
-        for line in chain(node.body, node.orelse):
-            self.visit(line)
 
     def _check_if_expression(self, node: ast.expr) -> None:
         if not isinstance(node, ast.Compare):
@@ -1462,6 +1948,7 @@ class PyiVisitor(ast.NodeVisitor):
             case _:
                 self.error(node, errors.Y002)
 
+    @rule(ast.If, codes={"Y066"})
     def _check_for_Y066_violations(self, node: ast.If) -> None:
         def is_version_info(attr: ast.expr) -> bool:
             return (
@@ -1563,7 +2050,9 @@ class PyiVisitor(ast.NodeVisitor):
             case _:
                 self.error(node, errors.Y007)
 
-    def _check_class_bases(self, bases: list[ast.expr]) -> None:
+    @rule(ast.ClassDef, codes={"Y040", "Y059", "Y060"})
+    def check_class_bases(self, node: ast.ClassDef) -> None:
+        bases = node.bases
         Y040_encountered = False
         Y059_encountered = False
         Generic_basenode: ast.Subscript | None = None
@@ -1592,19 +2081,20 @@ class PyiVisitor(ast.NodeVisitor):
 
     def visit_ClassDef(self, node: ast.ClassDef) -> None:
         old_context = self.enclosing_class_ctx
-        self.enclosing_class_ctx = _analyze_classdef(node)
+        self.enclosing_class_ctx = _analyze_classdef(node, self.class_index)
 
         if node.name.startswith("_"):
             if self.enclosing_class_ctx.is_protocol_class:
-                self.protocol_defs[node.name].append(node)
+                self.protocol_defs[node.name].append(DefinitionLocation.of(node))
             elif self.enclosing_class_ctx.is_typeddict_class:
-                self.class_based_typeddicts[node.name].append(node)
+                self.class_based_typeddicts[node.name].append(
+                    DefinitionLocation.of(node)
+                )
 
         self.generic_visit(node)
-        self._check_class_bases(node.bases)
         self.enclosing_class_ctx = old_context
-        self.check_class_pass_and_ellipsis(node)
 
+    @rule(ast.ClassDef, codes={"Y009", "Y012", "Y013"})
     def check_class_pass_and_ellipsis(self, node: ast.ClassDef) -> None:
         # empty class body should contain "..." not "pass"
         match node.body:
@@ -1873,6 +2363,35 @@ class PyiVisitor(ast.NodeVisitor):
                 self._check_exit_method(node=node, method_name=method_name)
         self._visit_function(node)
 
+    @staticmethod
+    def _is_positional_pre_570_argname(name: str) -> bool:
+        # https://peps.python.org/pep-0484/#positional-only-arguments
+        return name.startswith("__") and len(name) >= 3 and not name.endswith("__")
+
+    @rule(ast.FunctionDef, ast.AsyncFunctionDef, codes={"Y063"})
+    def _check_pep570_syntax_used_where_applicable(
+        self, node: ast.FunctionDef | ast.AsyncFunctionDef
+    ) -> None:
+        if node.args.posonlyargs:
+            return
+        pos_or_kw_args = node.args.args
+        try:
+            first_param = pos_or_kw_args[0]
+        except IndexError:
+            return
+        if self.enclosing_class_ctx is None or any(
+            isinstance(decorator, ast.Name) and decorator.id == "staticmethod"
+            for decorator in node.decorator_list
+        ):
+            uses_old_syntax = self._is_positional_pre_570_argname(first_param.arg)
+        else:
+            uses_old_syntax = self._is_positional_pre_570_argname(first_param.arg) or (
+                len(pos_or_kw_args) >= 2
+                and self._is_positional_pre_570_argname(pos_or_kw_args[1].arg)
+            )
+        if uses_old_syntax:
+            self.error(node, errors.Y063)
+
     def _Y019_error(
         self, node: ast.FunctionDef | ast.AsyncFunctionDef, typevar_name: str
     ) -> None:
@@ -1949,11 +2468,10 @@ class PyiVisitor(ast.NodeVisitor):
         ):
             self._Y019_error(method, cls_typevar)
 
-    def check_self_typevars(
-        self,
-        node: ast.FunctionDef | ast.AsyncFunctionDef,
-        decorator_names: Container[str],
-    ) -> None:
+    @rule(ast.FunctionDef, ast.AsyncFunctionDef, codes={"Y019"})
+    def check_self_typevars(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> None:
+        if self.enclosing_class_ctx is None:
+            return
         pos_or_keyword_args = node.args.posonlyargs + node.args.args
 
         if not pos_or_keyword_args:
@@ -1967,6 +2485,7 @@ class PyiVisitor(ast.NodeVisitor):
         if not isinstance(first_arg_annotation, (ast.Name, ast.Subscript)):
             return
 
+        decorator_names = _decorator_names(node)
         if "classmethod" in decorator_names or node.name == "__new__":
             self._check_class_method_for_bad_typevars(
                 method=node,
@@ -1982,12 +2501,16 @@ class PyiVisitor(ast.NodeVisitor):
                 return_annotation=return_annotation,
             )
 
+    @rule(ast.FunctionDef, ast.AsyncFunctionDef, codes={"Y091"})
     def check_protocol_param_kinds(
-        self,
-        node: ast.FunctionDef | ast.AsyncFunctionDef,
-        decorator_names: Container[str],
+        self, node: ast.FunctionDef | ast.AsyncFunctionDef
     ) -> None:
-        if "staticmethod" in decorator_names:
+        if (
+            self.enclosing_class_ctx is None
+            or not self.enclosing_class_ctx.is_protocol_class
+        ):
+            return
+        if "staticmethod" in _decorator_names(node):
             relevant_params = node.args.args
         else:
             relevant_params = node.args.args[1:]  # exclude "self"
@@ -1998,47 +2521,128 @@ class PyiVisitor(ast.NodeVisitor):
                 pos_or_kw, errors.Y091.format(arg=pos_or_kw.arg, method=node.name)
             )
 
+    @rule(ast.FunctionDef, ast.AsyncFunctionDef, codes={"Y068"})
     def check_for_override(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> None:
+        if self.enclosing_class_ctx is None:
+            return
         for deco in node.decorator_list:
             if _is_override(deco):
                 self.error(deco, errors.Y068)
                 return
 
-    @staticmethod
-    def _is_positional_pre_570_argname(name: str) -> bool:
-        # https://peps.python.org/pep-0484/#positional-only-arguments
-        return name.startswith("__") and len(name) >= 3 and not name.endswith("__")
+    def _visit_function(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> None:
+        with self.in_function.enabled():
+            self._visit_signature(node)
+            for statement in node.body:
+                self.visit(statement)
+            for decorator in node.decorator_list:
+                self.visit(decorator)
 
-    def _check_pep570_syntax_used_where_applicable(
+    def _signature_key(
         self, node: ast.FunctionDef | ast.AsyncFunctionDef
-    ) -> None:
-        if node.args.posonlyargs:
+    ) -> _SignatureKey | None:
+        """Return the source code of a function's signature, after its name.
+
+        None is returned if the source code isn't available,
+        or if it can't be reliably extracted.
+        """
+        lines = self.lines
+        first_line = node.lineno - 1
+        last_line = node.body[0].lineno - 1
+        if (
+            lines is None
+            or last_line >= len(lines)
+            or self.budget is not None
+            # These affect the results of visiting a signature
+            or self.string_literals_allowed.active
+            or self.long_strings_allowed.active
+            or self.visiting_arg.active
+            or self.Y061_suppressed.active
+        ):
+            return None
+        header = "".join(lines[first_line : last_line + 1])
+        # Column offsets are in bytes, so they can only be used for ASCII lines
+        if not header.isascii():
+            return None
+        # If the lines don't match the AST (e.g. if they were split differently),
+        # the memo would be keyed by the wrong source code
+        match = _FUNCTION_DEF_START.match(header, node.col_offset)
+        if match is None or match[1] != node.name:
+            return None
+        name_end = match.end(1)
+        body_start = len(header) - len(lines[last_line]) + node.body[0].col_offset
+        return header[name_end:body_start], name_end
+
+    def _visit_signature(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> None:
+        """Visit the type parameters, parameters and return annotation of a function.
+
+        Big stubs repeat the same signatures many times,
+        e.g. for overloads of methods in related classes.
+        The results of visiting a signature only depend on its source code,
+        so they are memoized: the errors are stored relative to the
+        start of the function, and re-reported at the right location
+        whenever the same signature is seen again.
+        Recording the results has a cost, so a signature is only memoized
+        once it has been seen twice.
+        """
+        key = self._signature_key(node)
+        if key is None:
+            self._visit_signature_parts(node)
             return
-        pos_or_kw_args = node.args.args
-        try:
-            first_param = pos_or_kw_args[0]
-        except IndexError:
+        if key not in self._signature_memo:
+            self._signature_memo[key] = None
+            self._visit_signature_parts(node)
+            return
+        memoized = self._signature_memo[key]
+        if memoized is not None:
+            for relative_lineno, col, message in memoized.errors:
+                self.errors.append(
+                    Error(
+                        node.lineno + relative_lineno,
+                        col,
+                        message,
+                        checker.PyiTreeChecker,
+                    )
+                )
+            self.all_name_occurrences.update(memoized.name_occurrences)
             return
-        if self.enclosing_class_ctx is None or any(
-            isinstance(decorator, ast.Name) and decorator.id == "staticmethod"
-            for decorator in node.decorator_list
-        ):
-            uses_old_syntax = self._is_positional_pre_570_argname(first_param.arg)
-        else:
-            uses_old_syntax = self._is_positional_pre_570_argname(first_param.arg) or (
-                len(pos_or_kw_args) >= 2
-                and self._is_positional_pre_570_argname(pos_or_kw_args[1].arg)
-            )
-        if uses_old_syntax:
-            self.error(node, errors.Y063)
 
-    def _visit_function(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> None:
-        with self.in_function.enabled():
-            self.generic_visit(node)
+        errors_before = len(self.errors)
+        all_name_occurrences = self.all_name_occurrences
+        self.all_name_occurrences = Counter()
+        try:
+            self._visit_signature_parts(node)
+            name_occurrences = self.all_name_occurrences
+        finally:
+            all_name_occurrences.update(self.all_name_occurrences)
+            self.all_name_occurrences = all_name_occurrences
+        self._signature_memo[key] = _MemoizedSignature(
+            errors=tuple(
+                (error.lineno - node.lineno, error.col, error.message)
+                for error in self.errors[errors_before:]
+            ),
+            name_occurrences=name_occurrences,
+        )
 
+    def _visit_signature_parts(
+        self, node: ast.FunctionDef | ast.AsyncFunctionDef
+    ) -> None:
+        if sys.version_info >= (3, 12):
+            for type_param in node.type_params:  # type: ignore[unreachable,unused-ignore]
+                self.visit(type_param)
+        self.visit(node.args)
+        if node.returns is not None:
+            self.visit(node.returns)
+
+    @rule(ast.FunctionDef, ast.AsyncFunctionDef, codes={"Y065"})
+    def check_return_annotation(
+        self, node: ast.FunctionDef | ast.AsyncFunctionDef
+    ) -> None:
         if node.name != "__getattr__" and node.returns and _is_Incomplete(node.returns):
             self.error(node.returns, errors.Y065.format(what="return type"))
 
+    @rule(ast.FunctionDef, ast.AsyncFunctionDef, codes={"Y009", "Y010", "Y048"})
+    def check_function_body(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> None:
         match node.body:
             case [_, stm2t2, *_]:
                 self.error(stm2t2, errors.Y048)
@@ -2052,31 +2656,27 @@ class PyiVisitor(ast.NodeVisitor):
             case [statement]:
                 self.error(statement, errors.Y010)
 
-        self._check_pep570_syntax_used_where_applicable(node)
-        if self.enclosing_class_ctx is not None:
-            decorator_names = {
-                decorator.id
-                for decorator in node.decorator_list
-                if isinstance(decorator, ast.Name)
-            }
-            self.check_self_typevars(node, decorator_names)
-            if self.enclosing_class_ctx.is_protocol_class:
-                self.check_protocol_param_kinds(node, decorator_names)
-            self.check_for_override(node)
-
-    def visit_arg(self, node: ast.arg) -> None:
+    @rule(ast.arg, codes={"Y050", "Y065"})
+    def check_arg_annotation(self, node: ast.arg) -> None:
         if _is_NoReturn(node.annotation):
             self.error(node, errors.Y050)
         if _is_Incomplete(node.annotation):
             self.error(node, errors.Y065.format(what=f'parameter "{node.arg}"'))
+
+    def visit_arg(self, node: ast.arg) -> None:
         with self.visiting_arg.enabled():
             self.generic_visit(node)
 
     def visit_arguments(self, node: ast.arguments) -> None:
-        args = node.posonlyargs + node.args
-        defaults = [None] * (len(args) - len(node.defaults)) + node.defaults
-        for arg, default in zip(args, defaults, strict=True):
-            self.check_arg_default(arg, default)
+        defaults = node.defaults
+        # The defaults belong to the last positional parameters,
+        # whether they are positional-only or not
+        default_index = len(defaults) - len(node.posonlyargs) - len(node.args)
+        for args in node.posonlyargs, node.args:
+            for arg in args:
+                default = defaults[default_index] if default_index >= 0 else None
+                self.check_arg_default(arg, default)
+                default_index += 1
         if node.vararg is not None:
             self.visit(node.vararg)
         for arg, default in zip_longest(node.kwonlyargs, node.kw_defaults):
@@ -2097,15 +2697,22 @@ class PyiVisitor(ast.NodeVisitor):
             self.error(arg, errors.Y067)
 
     def error(self, node: NodeWithLocation, message: str) -> None:
+        if self.budget is not None and self.budget.max_findings is not None:
+            if self._errors_reported >= self.budget.max_findings:
+                raise _BudgetExceeded(
+                    node, f"it has more than {self.budget.max_findings} errors"
+                )
+            self._errors_reported += 1
         self.errors.append(
             Error(node.lineno, node.col_offset, message, checker.PyiTreeChecker)
         )
 
-    def _check_for_unused_things(self) -> None:
+    def iter_unused_things(self) -> Iterator[tuple[str, DefinitionLocation, str]]:
         """
         After the AST tree has been visited,
-        analyse whether there are any unused things in this module.
+        find the private things in this module that are never used.
 
+        Yield `(name, location, message)` tuples.
         We currently check for unused
         - TypeVars
         - ParamSpecs
@@ -2119,27 +2726,101 @@ class PyiVisitor(ast.NodeVisitor):
                 msg = errors.Y018.format(
                     typevarlike_cls=cls_name, typevar_name=typevar_name
                 )
-                self.error(tv_nodelist[0], msg)
+                yield typevar_name, tv_nodelist[0], msg
         for proto_name, proto_nodelist in self.protocol_defs.items():
             if self.all_name_occurrences[proto_name] == 0:
-                self.error(
-                    proto_nodelist[0], errors.Y046.format(protocol_name=proto_name)
-                )
+                msg = errors.Y046.format(protocol_name=proto_name)
+                yield proto_name, proto_nodelist[0], msg
         for td_name, cls_td_nodelist in self.class_based_typeddicts.items():
             if self.all_name_occurrences[td_name] == 0:
-                self.error(
-                    cls_td_nodelist[0], errors.Y049.format(typeddict_name=td_name)
-                )
+                msg = errors.Y049.format(typeddict_name=td_name)
+                yield td_name, cls_td_nodelist[0], msg
         for td_name, ass_td_nodelist in self.assignment_based_typeddicts.items():
             if self.all_name_occurrences[td_name] == len(ass_td_nodelist):
-                self.error(
-                    ass_td_nodelist[0], errors.Y049.format(typeddict_name=td_name)
-                )
+                msg = errors.Y049.format(typeddict_name=td_name)
+                yield td_name, ass_td_nodelist[0], msg
         for alias_name, alias_nodelist in self.typealias_decls.items():
             if self.all_name_occurrences[alias_name] == len(alias_nodelist):
-                self.error(alias_nodelist[0], errors.Y047.format(alias_name=alias_name))
+                msg = errors.Y047.format(alias_name=alias_name)
+                yield alias_name, alias_nodelist[0], msg
+
+    @property
+    def module_state(self) -> ModuleState:
+        return ModuleState(
+            typevarlike_defs=self.typevarlike_defs,
+            protocol_defs=self.protocol_defs,
+            class_based_typeddicts=self.class_based_typeddicts,
+            assignment_based_typeddicts=self.assignment_based_typeddicts,
+            typealias_decls=self.typealias_decls,
+            all_name_occurrences=self.all_name_occurrences,
+        )
+
+    def merge_module_state(self, state: ModuleState) -> None:
+        """Combine the state for a later part of the module with this visitor's."""
+        _merge_definitions(self.typevarlike_defs, state.typevarlike_defs)
+        _merge_definitions(self.protocol_defs, state.protocol_defs)
+        _merge_definitions(self.class_based_typeddicts, state.class_based_typeddicts)
+        _merge_definitions(
+            self.assignment_based_typeddicts, state.assignment_based_typeddicts
+        )
+        _merge_definitions(self.typealias_decls, state.typealias_decls)
+        self.all_name_occurrences.update(state.all_name_occurrences)
+
+    def _check_for_unused_things(self) -> None:
+        for _, location, message in self.iter_unused_things():
+            self.error(location, message)
 
     def run(self, tree: ast.AST) -> Iterator[Error]:
-        self.visit(tree)
-        self._check_for_unused_things()
+        yield from self.run_incrementally([tree])
+
+    def run_incrementally(
+        self, trees: Iterable[ast.AST], *, check_unused: bool = True
+    ) -> Iterator[Error]:
+        """Visit `trees` one after the other, as parts of the same module.
+
+        Errors are yielded as soon as each tree has been visited,
+        and no reference to a tree is kept after it has been visited.
+        Only `module_state`, which is needed to find unused things,
+        and the bases of the classes in the module, are kept for the whole module.
+        (So a class is only known to inherit from a class in the same module
+        if that class is defined in the same tree or in an earlier one.)
+
+        If the visitor's budget is exceeded, or an expression is nested
+        too deeply to be checked, no further trees are visited,
+        and a Y070 error is yielded after the errors found so far.
+
+        If `check_unused` is false, unused things aren't looked for,
+        e.g. because `trees` are only part of a module, and `module_state`
+        will be merged into the visitor for the rest of the module.
+        """
+        if self.budget is not None and self.budget.max_seconds is not None:
+            self._deadline = time.perf_counter() + self.budget.max_seconds
+        try:
+            for tree in trees:
+                self.class_index.add(tree)
+                self.visit(tree)
+                yield from self.errors
+                self.errors.clear()
+            if check_unused:
+                self._check_for_unused_things()
+        except _BudgetExceeded as e:
+            self._stop_early(e.location, e.reason)
+        except RecursionError:
+            # The traversal itself is iterative for deeply nested expressions,
+            # but some checks (and ast.unparse()) still recurse
+            self._stop_early(self._last_location, "an expression is nested too deeply")
         yield from self.errors
+
+    def _stop_early(self, location: NodeWithLocation | None, reason: str) -> None:
+        self.stopped_early = True
+        # Whether things are unused can't be known for a partially visited file,
+        # so the unused checks are skipped as well
+        location = location or DefinitionLocation(lineno=1, col_offset=0)
+        self.errors.append(
+            Error(
+                location.lineno,
+                location.col_offset,
+                errors.Y070.format(reason=reason),
+                checker.PyiTreeChecker,
+            )
+        )
@@ -151,3 +151,9 @@ class SpecialEnum(enum.Enum): ...
 
 class SubclassOfSpecialEnum(SpecialEnum):
     STILL_OKAY = "foo"
+
+class _EnumBase(enum.Enum):
+    def describe(self) -> str: ...
+
+class SubclassOfEnumBase(_EnumBase):
+    ALSO_OKAY = "foo"
@@ -0,0 +1,12 @@
+# flags: --pyi-max-findings=2
+from typing import TypeVar
+
+x: "int"  # Y020 Quoted annotations should never be used in stubs
+y: "int"  # Y020 Quoted annotations should never be used in stubs
+z: "int"  # Y070 Stopped checking this file, because it has more than 2 errors
+
+# Y018 isn't reported, since the rest of the file is never checked
+_T = TypeVar("_T")
+
+class Foo:
+    pass
@@ -173,6 +173,27 @@ class GoodAsyncIterator(AsyncIterator[int]):
 class DoesNotInheritFromIterator:
     def __iter__(self) -> DoesNotInheritFromIterator: ...
 
+class _IteratorBase(Iterator[int]): ...
+
+class InheritsFromIteratorIndirectly(_IteratorBase):
+    def __iter__(self) -> Iterator[int]: ...  # Y034 "__iter__" methods in classes like "InheritsFromIteratorIndirectly" usually return "self" at runtime. Consider using "typing_extensions.Self" in "InheritsFromIteratorIndirectly.__iter__", e.g. "def __iter__(self) -> Self: ..."
+
+class _MetaclassBase(type): ...
+
+class InheritsFromMetaclassIndirectly(_MetaclassBase):
+    def __new__(cls) -> InheritsFromMetaclassIndirectly: ...
+
+class _ProtocolBase(typing.Protocol):
+    def __iadd__(self, other: Self, /) -> object: ...
+
+# Subclasses of protocols are only protocols themselves
+# if they list Protocol as a base again (PEP 544)
+class InheritsFromProtocol(_ProtocolBase):
+    def __iadd__(self, other: Self, /) -> object: ...  # Y034 "__iadd__" methods in classes like "InheritsFromProtocol" usually return "self" at runtime. Consider using "typing_extensions.Self" in "InheritsFromProtocol.__iadd__", e.g. "def __iadd__(self, other: Self, /) -> Self: ..."
+
+class InheritsFromProtocolAndIsAProtocol(_ProtocolBase, typing.Protocol):
+    def __iadd__(self, other: Self, /) -> object: ...
+
 class Unannotated:
     def __new__(cls, *args, **kwargs): ...
     def __iter__(self): ...
@@ -0,0 +1,90 @@
+"""Pathological stubs, of the kind that code generators sometimes produce.
+
+Each of them must be checked without crashing, in time roughly linear
+in the size of the stub.
+"""
+
+from __future__ import annotations
+
+import gc
+import time
+from collections.abc import Callable
+
+import pytest
+
+from flake8_pyi import lint_source
+
+# Deep enough to trigger RecursionError in a recursive traversal,
+# but shallow enough to still be parsed by CPython
+_DEPTH = 2000
+# How much longer a stub may take to check than a stub a quarter of its size.
+# Checking in linear time takes about 4 times as long, and in quadratic time
+# about 16 times as long; the margin is for noise.
+_MAX_GROWTH = 8.0
+
+
+def _union(n: int) -> str:
+    return " | ".join(f"T{i}" for i in range(n))
+
+
+def _attribute_chain(n: int) -> str:
+    return ".".join(f"a{i}" for i in range(n))
+
+
+# Functions that generate a stub of a given size, and the codes reported for
+# the stub of size _DEPTH
+ADVERSARIAL_STUBS: dict[str, tuple[Callable[[int], str], list[str]]] = {
+    "attribute_chain": (lambda n: f"x: {_attribute_chain(n)}\n", []),
+    "attribute_chain_base": (lambda n: f"class C({_attribute_chain(n)}): ...\n", []),
+    "union": (lambda n: f"x: {_union(n)}\n", []),
+    "union_argument": (lambda n: f"def f(x: {_union(n)}) -> None: ...\n", []),
+    "arithmetic": (lambda n: "x: int = " + " + ".join(["1"] * n) + "\n", ["Y015"]),
+    # The Y026 message would be generated by ast.unparse(), which recurses
+    "union_alias": (lambda n: f"X = {_union(n)}\n", ["Y070"]),
+    "too_deep_to_parse": (lambda n: f"x: {_union(10 * n)}\n", ["E999"]),
+    "huge_int": (lambda n: f"x: int = 0x{'F' * (50 * n)}\n", ["Y054"]),
+    "huge_literal": (
+        lambda n: "from typing import Literal\n"
+        f"x: Literal[{', '.join(map(str, range(10 * n)))}]\n",
+        [],
+    ),
+    "huge_Union": (
+        lambda n: "from typing import Union\n"
+        f"x: Union[{', '.join(f'T{i}' for i in range(10 * n))}]\n",
+        ["Y037"],
+    ),
+    "many_statements": (lambda n: "".join(f"x{i}: int\n" for i in range(10 * n)), []),
+}
+
+
+def _cpu_seconds(source: str) -> float:
+    # The least CPU time of a few runs. Unlike wall-clock time, it isn't
+    # inflated when the machine is busy, e.g. running other tests in parallel.
+    # The garbage collector is disabled, as its cost depends on all the objects
+    # that are alive, not only on the stub.
+    gc.collect()
+    gc.disable()
+    try:
+        samples = []
+        for _ in range(3):
+            start = time.process_time()
+            lint_source(source, "adversarial.pyi")
+            samples.append(time.process_time() - start)
+        return min(samples)
+    finally:
+        gc.enable()
+
+
+@pytest.mark.parametrize(
+    ("make_source", "expected_codes"),
+    ADVERSARIAL_STUBS.values(),
+    ids=ADVERSARIAL_STUBS.keys(),
+)
+def test_adversarial_stub(
+    make_source: Callable[[int], str], expected_codes: list[str]
+) -> None:
+    findings = lint_source(make_source(_DEPTH), "adversarial.pyi")
+    assert [finding.code for finding in findings] == expected_codes
+    small = _cpu_seconds(make_source(_DEPTH // 4))
+    large = _cpu_seconds(make_source(_DEPTH))
+    assert large < _MAX_GROWTH * small
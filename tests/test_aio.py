@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections.abc import Collection
+
+import pytest
+
+from flake8_pyi import aio, lint_source
+from flake8_pyi.runner import Finding
+from flake8_pyi.visitor import Budget
+
+
+def test_lint_many() -> None:
+    sources = [(f"stub{i}.pyi", f"x{i}: 'int'\n" * i) for i in range(10)]
+
+    async def main() -> dict[str, list[Finding]]:
+        async with aio.AsyncLinter(max_concurrency=2) as linter:
+            return await linter.lint_many(sources)
+
+    results = asyncio.run(main())
+    assert list(results) == [filename for filename, _ in sources]
+    for i, findings in enumerate(results.values()):
+        assert [f.code for f in findings] == ["Y020"] * i
+
+
+def test_lint_many_duplicate_filenames() -> None:
+    sources = [("foo.pyi", "x: int\n"), ("bar.pyi", ""), ("foo.pyi", "y: 'int'\n")]
+
+    async def main() -> None:
+        async with aio.AsyncLinter(max_concurrency=1) as linter:
+            await linter.lint_many(sources)
+
+    with pytest.raises(ValueError, match="foo.pyi"):
+        asyncio.run(main())
+
+
+def test_budget() -> None:
+    source = "x: 'int'\ny: 'int'\nz: 'int'\n"
+    budget = Budget(max_findings=1)
+
+    async def main() -> tuple[list[Finding], dict[str, list[Finding]]]:
+        async with aio.AsyncLinter(max_concurrency=1) as linter:
+            return (
+                await linter.lint_source(source, "foo.pyi", budget=budget),
+                await linter.lint_many([("foo.pyi", source)], budget=budget),
+            )
+
+    findings, results = asyncio.run(main())
+    expected = lint_source(source, "foo.pyi", budget=budget)
+    assert [f.code for f in expected] == ["Y020", "Y070"]
+    assert findings == results["foo.pyi"] == expected
+
+
+def test_concurrency_limit(monkeypatch: pytest.MonkeyPatch) -> None:
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+
+    def slow_lint(
+        source: str,
+        filename: str,
+        extend_select: Collection[str],
+        budget: Budget | None,
+    ) -> list[Finding]:
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return []
+
+    monkeypatch.setattr(aio, "_lint_source", slow_lint)
+    sources = [(f"stub{i}.pyi", "") for i in range(20)]
+
+    async def main() -> None:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            linter = aio.AsyncLinter(max_concurrency=3, executor=executor)
+            await linter.lint_many(sources)
+
+    asyncio.run(main())
+    assert max_running == 3
+
+
+def test_cancellation(monkeypatch: pytest.MonkeyPatch) -> None:
+    release = threading.Event()
+    started: list[str] = []
+
+    def blocking_lint(
+        source: str,
+        filename: str,
+        extend_select: Collection[str],
+        budget: Budget | None,
+    ) -> list[Finding]:
+        started.append(filename)
+        release.wait()
+        return []
+
+    monkeypatch.setattr(aio, "_lint_source", blocking_lint)
+    sources = [(f"stub{i}.pyi", "") for i in range(20)]
+
+    async def main() -> None:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            linter = aio.AsyncLinter(max_concurrency=2, executor=executor)
+            task = asyncio.ensure_future(linter.lint_many(sources))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            release.set()
+
+    asyncio.run(main())
+    # The stubs that were waiting for a slot were never linted
+    assert len(started) == 2
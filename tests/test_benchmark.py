@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from flake8_pyi import visitor
+from flake8_pyi.benchmark import (
+    BenchmarkRun,
+    BenchmarkStore,
+    compare_runs,
+    main,
+    measure_allocations,
+    read_corpus,
+    run_benchmark,
+)
+
+
+def _make_run(samples: list[float]) -> BenchmarkRun:
+    return BenchmarkRun(
+        label="",
+        flake8_pyi_version="1.0",
+        python_version="3.12.0",
+        compiled=False,
+        corpus_hash="abc",
+        files=10,
+        peak_rss=None,
+        samples=samples,
+    )
+
+
+def test_read_corpus(tmp_path: Path) -> None:
+    for root in ("a", "b"):
+        (tmp_path / root / "pkg").mkdir(parents=True)
+        (tmp_path / root / "pkg" / "mod.pyi").write_text("x: int\n")
+    corpus_a, hash_a = read_corpus([str(tmp_path / "a")])
+    corpus_b, hash_b = read_corpus([str(tmp_path / "b")])
+    assert corpus_a == [(str(tmp_path / "a" / "pkg" / "mod.pyi"), b"x: int\n")]
+    # The hash doesn't depend on where the corpus is
+    assert hash_a == hash_b
+    (tmp_path / "b" / "pkg" / "mod.pyi").write_text("x: str\n")
+    assert read_corpus([str(tmp_path / "b")])[1] != hash_a
+
+
+def test_run_non_utf8_stub(tmp_path: Path) -> None:
+    # Stubs are linted as bytes, and decoded according to their encoding
+    # declaration, as they are by the runner
+    source = "# coding: latin-1\nx: Literal['é']\n".encode("latin-1")
+    (tmp_path / "latin1.pyi").write_bytes(source)
+    corpus, _ = read_corpus([str(tmp_path)])
+    assert corpus == [(str(tmp_path / "latin1.pyi"), source)]
+    run = run_benchmark([str(tmp_path)], repeat=3, label="")
+    assert run.files == 1
+    assert len(run.samples) == 3
+
+
+@pytest.mark.parametrize(
+    ("old", "new", "regressed"),
+    [
+        # A consistent drop of 20%
+        ([100, 101, 99, 100, 102], [80, 81, 79, 80, 82], True),
+        # A consistent drop, but smaller than the threshold
+        ([100, 101, 99, 100, 102], [98, 99, 97, 98, 100], False),
+        # The medians differ by 20%, but the samples are too noisy to tell
+        ([100, 60, 140, 100, 90], [80, 130, 50, 80, 110], False),
+        # Faster
+        ([80, 81, 79, 80, 82], [100, 101, 99, 100, 102], False),
+    ],
+)
+def test_compare_runs(old: list[float], new: list[float], regressed: bool) -> None:
+    comparison = compare_runs(
+        _make_run(old), _make_run(new), threshold=0.05, alpha=0.05
+    )
+    assert comparison.regressed is regressed
+
+
+def test_store(tmp_path: Path) -> None:
+    store = BenchmarkStore(str(tmp_path / "benchmarks.sqlite"))
+    run = _make_run([1.0, 2.0, 3.0])
+    run_id = store.add(run)
+    assert store.run_ids() == [run_id]
+    assert store.get(run_id) == run
+    later_run_id = store.add(_make_run([1.0]))
+    assert store.run_ids() == [run_id, later_run_id]
+    store.close()
+
+
+def test_main(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    (tmp_path / "stubs").mkdir()
+    (tmp_path / "stubs" / "foo.pyi").write_text(
+        'x: "int"\ndef f(x: int) -> None: ...\n'
+    )
+    database = str(tmp_path / "benchmarks.sqlite")
+    run_argv = ["--database", database, "run", str(tmp_path / "stubs"), "--repeat", "3"]
+
+    assert main([*run_argv, "--label", "first"]) == 0
+    assert main(["--database", database, "compare"]) == 2
+    assert main([*run_argv, "--label", "second"]) == 0
+    assert "second" in capsys.readouterr().out
+
+    # Throughput varies too much on such a small corpus to compare it here
+    assert main(["--database", database, "compare", "1", "2", "--threshold", "1"]) == 0
+    output = capsys.readouterr().out
+    assert output.startswith("old: #1 ")
+    if not visitor.COMPILED:
+        assert "Checks with the largest changes in total time" in output
+
+    assert main(["--database", database, "list"]) == 0
+    assert len(capsys.readouterr().out.splitlines()) == 2
+
+
+def test_main_repeat_too_small(tmp_path: Path) -> None:
+    with pytest.raises(SystemExit) as excinfo:
+        main(["--database", str(tmp_path / "db"), "run", str(tmp_path), "--repeat=2"])
+    assert excinfo.value.code == 2
+
+
+def test_compare_too_few_samples(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    database = str(tmp_path / "benchmarks.sqlite")
+    store = BenchmarkStore(database)
+    store.add(_make_run([100.0, 100.0]))
+    store.add(_make_run([50.0, 50.0]))
+    store.add(_make_run([]))
+    store.close()
+    # Even a drop of 50% can't be significant with two samples each
+    assert main(["--database", database, "compare", "1", "2"]) == 2
+    assert "too few samples" in capsys.readouterr().err
+    assert main(["--database", database, "compare", "1", "3"]) == 2
+    assert "without samples" in capsys.readouterr().err
+
+
+def test_compare_different_corpora(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    database = str(tmp_path / "benchmarks.sqlite")
+    store = BenchmarkStore(database)
+    store.add(_make_run([100.0, 101.0, 99.0]))
+    run = _make_run([50.0, 51.0, 49.0])
+    run.corpus_hash = "def"
+    store.add(run)
+    store.close()
+    assert main(["--database", database, "compare"]) == 2
+    assert "different corpora" in capsys.readouterr().err
+    assert main(["--database", database, "compare", "--allow-different-corpus"]) == 1
+    output = capsys.readouterr().out
+    assert "note: the runs used different corpora" in output
+    assert "REGRESSION" in output
+
+
+def test_measure_allocations(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    (tmp_path / "small.pyi").write_text("x: int\n")
+    (tmp_path / "big.pyi").write_text(
+        "".join(f"def f{i}(x: int | str | None) -> None: ...\n" for i in range(100))
+    )
+    (tmp_path / "broken.pyi").write_text("def f(:\n")
+    allocations = measure_allocations([str(tmp_path)])
+    # The stub that can't be parsed is skipped
+    assert allocations.files == 2
+    assert allocations.ast_nodes > 1000
+    assert allocations.peak_bytes > 0
+    assert allocations.peak_bytes_per_1000_nodes > 0
+
+    database = tmp_path / "benchmarks.sqlite"
+    assert main(["--database", str(database), "allocations", str(tmp_path)]) == 0
+    assert capsys.readouterr().out.startswith(f"2 files, {allocations.ast_nodes} ")
+    # Allocations aren't stored
+    assert not database.exists()
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import json
+import textwrap
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from flake8_pyi.complexity import (
+    StubComplexity,
+    main,
+    measure_file,
+    measure_source,
+    suggest_budget,
+)
+
+STUB = textwrap.dedent("""
+    import sys
+    from typing import Literal, Union, overload
+
+    Mode = Literal["r", "w", "a", "x"]
+    Number = Union[int, float, complex]
+
+    class File:
+        if sys.version_info >= (3, 12):
+            def flush(self) -> None: ...
+        elif sys.platform == "win32":
+            def fileno(self) -> int: ...
+        @overload
+        def read(self, mode: Literal["r"]) -> str: ...
+        @overload
+        def read(self, mode: Literal["rb"]) -> bytes: ...
+
+    def open(file: str | bytes | int | None = None) -> File: ...
+    """)
+
+
+def test_measure_source() -> None:
+    stats = measure_source(STUB, "file.pyi")
+    assert stats.path == "file.pyi"
+    assert stats.size == len(STUB)
+    assert stats.syntax_error is None
+    assert stats.max_union_width == 4
+    assert stats.max_literal_members == 4
+    assert stats.literal_members == 6
+    assert stats.functions == 5
+    assert stats.overloads == 2
+    # The `sys.platform` check isn't a version branch
+    assert stats.version_branches == 1
+    assert stats.nodes > 50
+    assert stats.max_depth > 5
+    assert not stats.split_into_parts
+
+
+def test_estimated_seconds() -> None:
+    small = measure_source("x: int\n", "small.pyi")
+    large = measure_source("x: int\n" * 1000, "large.pyi")
+    members = ", ".join(map(str, range(1000)))
+    literal = measure_source(f"x: Literal[{members}]\n", "literal.pyi")
+    tuple_ = measure_source(f"x: tuple[{members}]\n", "tuple.pyi")
+    assert 0 < small.estimated_seconds < large.estimated_seconds
+    # Members of a `Literal[]` cost more than other nodes
+    assert literal.nodes == tuple_.nodes
+    assert literal.estimated_seconds > tuple_.estimated_seconds
+
+
+def test_measure_source_syntax_error() -> None:
+    stats = measure_source("def f(:\n", "broken.pyi")
+    assert stats.syntax_error is not None
+    assert stats.syntax_error.startswith("SyntaxError: ")
+    assert stats.nodes == 0
+
+
+def test_measure_archive(tmp_path: Path) -> None:
+    wheel = tmp_path / "types_foo-1.0-py3-none-any.whl"
+    with zipfile.ZipFile(wheel, "w") as zip_file:
+        zip_file.writestr("foo-stubs/bad.pyi", b"x: int\n\xff\n")
+        zip_file.writestr("foo-stubs/good.pyi", STUB)
+    bad, good = measure_file(str(wheel))
+    assert bad.path == f"{wheel}!foo-stubs/bad.pyi"
+    assert bad.syntax_error is not None
+    assert good.syntax_error is None
+    assert good.overloads == 2
+
+
+def test_measure_deeply_nested_union() -> None:
+    # Generated stubs can have unions far wider than the recursion limit
+    source = "x: " + " | ".join(f"T{i}" for i in range(900)) + "\n"
+    stats = measure_source(source, "wide.pyi")
+    assert stats.max_union_width == 900
+    assert stats.max_depth > 900
+
+
+def test_suggest_budget() -> None:
+    assert suggest_budget([]) == {}
+    corpus = [
+        StubComplexity("a.pyi", size=10, nodes=1234),
+        StubComplexity("b.pyi", size=10, nodes=12345, literal_members=100),
+    ]
+    budget = suggest_budget(corpus)
+    assert budget["--max-nodes-per-file"] == 25000
+    assert budget["--max-seconds-per-file"] >= 2 * corpus[1].estimated_seconds
+
+    # Stubs that couldn't be parsed have no nodes, and are ignored
+    broken = StubComplexity("broken.pyi", size=10, syntax_error="SyntaxError: ...")
+    assert suggest_budget([broken]) == {}
+    # Limits aren't suggested below a floor, even for tiny stubs
+    tiny = StubComplexity("tiny.pyi", size=10, nodes=3)
+    assert suggest_budget([tiny, broken]) == {
+        "--max-nodes-per-file": 10_000,
+        "--max-seconds-per-file": 1.0,
+    }
+
+
+def test_main(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "file.pyi").write_text(STUB)
+    (tmp_path / "pkg" / "small.pyi").write_text("x: int\n")
+    (tmp_path / "pkg" / "broken.pyi").write_text("def f(:\n")
+
+    assert main([str(tmp_path), "--top", "1", "--jobs", "1"]) == 0
+    out = capsys.readouterr().out
+    assert out.startswith("3 stubs, ")
+    # Only the most expensive stub is listed
+    assert f"{tmp_path / 'pkg' / 'file.pyi'}\n" in out
+    assert f"{tmp_path / 'pkg' / 'small.pyi'}\n" not in out
+    assert "1 stubs couldn't be parsed" in out
+    assert "--max-nodes-per-file " in out
+
+    assert main([str(tmp_path), "--json", "--jobs", "1"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    by_path = {Path(stats["path"]).name: stats for stats in report["stubs"]}
+    assert set(by_path) == {"file.pyi", "small.pyi", "broken.pyi"}
+    assert by_path["file.pyi"]["overloads"] == 2
+    assert by_path["file.pyi"]["estimated_seconds"] > 0
+    assert by_path["small.pyi"]["split_into_parts"] is False
+    assert by_path["broken.pyi"]["syntax_error"] is not None
+    assert set(report["suggested_budget"]) == {
+        "--max-nodes-per-file",
+        "--max-seconds-per-file",
+    }
+
+
+def test_main_missing_path(tmp_path: Path) -> None:
+    with pytest.raises(SystemExit) as excinfo:
+        main([str(tmp_path / "missing")])
+    assert excinfo.value.code == 2
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import io
+from pathlib import Path
+
+import pytest
+
+from flake8_pyi import Finding
+from flake8_pyi.diff import DefinitionIndex, diff_findings, main, parse_findings
+
+OLD_STUB = """\
+class A:
+    def f(self, x: "int") -> None: ...
+    def g(self, x: "int") -> None: ...
+
+def h(x: "int") -> None: ...
+"""
+
+NEW_STUB = """\
+import sys
+
+class A:
+    def f(self, x: "int") -> None: ...
+    def g(self, x: int) -> None: ...
+
+def h(x: "int", y: "str") -> None: ...
+"""
+
+QUOTED = "Quoted annotations should never be used in stubs"
+
+
+def test_diff_findings(tmp_path: Path) -> None:
+    (tmp_path / "old").mkdir()
+    (tmp_path / "old" / "foo.pyi").write_text(OLD_STUB)
+    (tmp_path / "new").mkdir()
+    (tmp_path / "new" / "foo.pyi").write_text(NEW_STUB)
+    old = [
+        Finding("foo.pyi", 2, 19, "Y020", QUOTED),
+        Finding("foo.pyi", 3, 19, "Y020", QUOTED),
+        Finding("foo.pyi", 5, 9, "Y020", QUOTED),
+    ]
+    new = [
+        Finding("foo.pyi", 4, 19, "Y020", QUOTED),
+        Finding("foo.pyi", 7, 9, "Y020", QUOTED),
+        Finding("foo.pyi", 7, 19, "Y020", QUOTED),
+    ]
+    disappeared, appeared = diff_findings(
+        old,
+        new,
+        old_index=DefinitionIndex(str(tmp_path / "old")),
+        new_index=DefinitionIndex(str(tmp_path / "new")),
+    )
+    # The finding in A.f only moved, and one of the findings in h is unchanged
+    assert disappeared == [Finding("foo.pyi", 3, 19, "Y020", QUOTED)]
+    assert appeared == [Finding("foo.pyi", 7, 19, "Y020", QUOTED)]
+
+    # Without the source, findings can only be matched within the whole file
+    assert diff_findings(old, new) == ([], [])
+
+
+def test_main(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    (tmp_path / "foo.pyi").write_text(NEW_STUB)
+    old_errors = tmp_path / "old_errors.txt"
+    old_errors.write_text(f"foo.pyi:4:20: Y020 {QUOTED}\nfoo.pyi:5:20: Y020 {QUOTED}\n")
+    new_errors = tmp_path / "new_errors.txt"
+    new_errors.write_text(
+        f"foo.pyi:4:20: Y020  {QUOTED}\nfoo.pyi:1:1: F401 'sys' imported but unused\n"
+    )
+    argv = [str(old_errors), str(new_errors), "--old-root", str(tmp_path)]
+    assert main(argv) == 1
+    assert capsys.readouterr().out == (
+        f"< foo.pyi:5:20: Y020 {QUOTED}\n"
+        "> foo.pyi:1:1: F401 'sys' imported but unused\n"
+    )
+    assert main([str(old_errors), str(old_errors)]) == 0
+    assert capsys.readouterr().out == ""
+
+
+def test_parse_findings() -> None:
+    output = io.StringIO(
+        f"foo.pyi:4:20: Y020 {QUOTED}\n"
+        "1     E501 line too long\n"
+        "C:/foo.pyi:1:1: F401 'sys' imported but unused\n"
+    )
+    assert list(parse_findings(output)) == [
+        Finding("foo.pyi", 4, 19, "Y020", QUOTED),
+        Finding("C:/foo.pyi", 1, 0, "F401", "'sys' imported but unused"),
+    ]
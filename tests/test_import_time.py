@@ -0,0 +1,56 @@
+"""flake8 imports flake8-pyi on every run, even if no stubs are linted."""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# The modules that flake8 needs to load the plugin and its options.
+# Everything else should only be imported once a stub is checked.
+_EAGER_MODULES = {"flake8_pyi", "flake8_pyi.checker", "flake8_pyi.errors"}
+# Importing the plugin takes about 10ms, and used to take about 60ms
+# when the visitor and the standalone runner were imported eagerly
+_MAX_IMPORT_SECONDS = 0.05
+
+
+def _import_times(pycache_prefix: Path) -> dict[str, int]:
+    """Import the plugin the way flake8 does, and time it with -X importtime.
+
+    Returns the cumulative import time of each module, in microseconds.
+    """
+    env = {**os.environ, "PYTHONPYCACHEPREFIX": str(pycache_prefix)}
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            # flake8 has already imported these when it loads plugins
+            "import flake8.options.manager, flake8.style_guide; import flake8_pyi",
+        ],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        _, cumulative, module = line.split("|")
+        # Skip the header line
+        if cumulative.strip().isdigit():
+            times[module.strip()] = int(cumulative)
+    return times
+
+
+def test_import_time(tmp_path: Path) -> None:
+    # The first import compiles the modules, like the first run after installing
+    _import_times(tmp_path)
+    runs = [_import_times(tmp_path) for _ in range(3)]
+    assert {module for module in runs[0] if module.startswith("flake8_pyi")} == (
+        _EAGER_MODULES
+    )
+    fastest = min(times["flake8_pyi"] for times in runs)
+    assert fastest / 1_000_000 < _MAX_IMPORT_SECONDS
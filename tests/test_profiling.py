@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from flake8_pyi import visitor
+from flake8_pyi.profiling import MemoryProfiler
+from flake8_pyi.runner import lint_file
+
+
+@pytest.mark.skipif(
+    visitor.COMPILED, reason="compiled functions and methods can't be instrumented"
+)
+def test_memory_profiler(tmp_path: Path) -> None:
+    small = tmp_path / "small.pyi"
+    small.write_text("x: int\n")
+    big = tmp_path / "big.pyi"
+    big.write_text(
+        "".join(f"x{i}: int | str | bytes | None\n" for i in range(500))
+        + "from typing import Literal\n"
+        + "y: Literal[1, 2, 3]\n"
+    )
+    profiler = MemoryProfiler()
+    original_handler = visitor.PyiVisitor.visit_AnnAssign
+    with profiler.instrumented():
+        assert visitor.PyiVisitor.visit_AnnAssign is not original_handler
+        for path in (small, big):
+            profiler.measure_file(lint_file, str(path))
+    # Everything is restored when profiling stops
+    assert visitor.PyiVisitor.visit_AnnAssign is original_handler
+
+    assert profiler.files[str(big)].max_peak > profiler.files[str(small)].max_peak
+    # Nested handlers are included in the peak of the handler that calls them
+    ann_assign = profiler.handlers["PyiVisitor.visit_AnnAssign"]
+    analyse_union = profiler.handlers["_analyse_union"]
+    assert ann_assign.calls == 502
+    assert analyse_union.calls == 500
+    assert ann_assign.max_peak >= analyse_union.max_peak > 0
+    assert ann_assign.max_peak_location.startswith(f"{big}:")
+
+    report = profiler.report(top=3)
+    assert report.splitlines()[1].endswith(str(big))
+    assert "PyiVisitor.visit_AnnAssign (visitor.py:" in report
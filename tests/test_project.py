@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from flake8_pyi.runner import main
+
+
+def test_project(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    package = tmp_path / "pkg"
+    package.mkdir()
+    (package / "__init__.pyi").write_text(
+        "from ._impl import Public as Public\n"
+        "from ._impl import _Alias\n"
+        "x: _Alias\n"
+    )
+    (package / "_impl.pyi").write_text(
+        "from typing_extensions import TypeAlias\n"
+        "_Alias: TypeAlias = int\n"
+        "_Unused: TypeAlias = str\n"
+        "class Public: ...\n"
+        "class Helper: ...\n"
+        "def helper() -> None: ...\n"
+    )
+    (package / "other.pyi").write_text("from . import _impl\ny: _impl.Helper\n")
+    impl = package / "_impl.pyi"
+
+    assert main(["-j1", str(package)]) == 1
+    assert capsys.readouterr().out == (
+        f'{impl}:2:1: Y047 Type alias "_Alias" is not used\n'
+        f'{impl}:3:1: Y047 Type alias "_Unused" is not used\n'
+    )
+
+    assert main(["-j1", "--project", str(tmp_path)]) == 1
+    assert capsys.readouterr().out == (
+        f'{impl}:3:1: Y047 Type alias "_Unused" is not used\n'
+        f'{impl}:6:1: Y069 "helper" is defined in private module "pkg._impl", '
+        "but is never used\n"
+    )
@@ -0,0 +1,438 @@
+from __future__ import annotations
+
+import glob
+import io
+import multiprocessing
+import subprocess
+import sys
+import tarfile
+import threading
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from flake8_pyi import Finding, lint_many, lint_source, runner
+from flake8_pyi.runner import (
+    _CHUNKSIZE,
+    _iter_top_level_statements,
+    _lint_source_in_parts,
+    _map_in_parallel,
+    _pack_finding_lists,
+    _split_source,
+    _StubWatcher,
+    _unpack_finding_lists,
+    lint_file,
+    lint_file_for_versions,
+    main,
+)
+
+
+def test_lint_file(tmp_path: Path) -> None:
+    stub = tmp_path / "foo.pyi"
+    stub.write_text('x: "int"\ndef f(x: int = 1 + 2) -> None: ...\n')
+    assert lint_file(str(stub)) == [
+        Finding(
+            str(stub), 1, 3, "Y020", "Quoted annotations should never be used in stubs"
+        ),
+        Finding(
+            str(stub),
+            2,
+            15,
+            "Y011",
+            "Only simple default values allowed for typed arguments",
+        ),
+    ]
+
+
+def test_lint_file_syntax_error(tmp_path: Path) -> None:
+    stub = tmp_path / "foo.pyi"
+    stub.write_text("def f(\n")
+    [finding] = lint_file(str(stub))
+    assert finding.code == "E999"
+
+
+def test_lint_file_encoding(tmp_path: Path) -> None:
+    stub = tmp_path / "foo.pyi"
+    # The form feed doesn't throw off the line number of the type comment
+    source = "# coding: latin-1\nx: 'é'\x0c\ny: int  # type: int\n"
+    stub.write_bytes(source.encode("latin-1"))
+    expected = [(2, "Y020"), (3, "Y033")]
+    assert [(f.lineno, f.code) for f in lint_file(str(stub))] == expected
+    # Stubs given as strings are split into lines in the same way
+    findings = lint_source(source, "foo.pyi")
+    assert [(f.lineno, f.code) for f in findings] == expected
+    for jobs in (1, 2):
+        [findings] = lint_many([("foo.pyi", source)], jobs=jobs).values()
+        assert [(f.lineno, f.code) for f in findings] == expected
+    # Other characters that str.splitlines() splits on don't end lines either
+    for separator in "\x0b\x1c\x1d\x1e\x85\u2028\u2029":
+        source = f"x: int  # {separator}\ny: int  # type: int\n"
+        findings = lint_source(source, "foo.pyi")
+        assert [(f.lineno, f.code) for f in findings] == [(2, "Y033")]
+    stub.write_bytes(b"x: int\n\xff\n")
+    [finding] = lint_file(str(stub))
+    assert (finding.lineno, finding.code) == (2, "E999")
+
+
+def test_disabled_by_default(tmp_path: Path) -> None:
+    stub = tmp_path / "foo.pyi"
+    stub.write_text("x: tuple[int]\n")
+    assert lint_file(str(stub)) == []
+    [finding] = lint_file(str(stub), extend_select=["Y090"])
+    assert finding.code == "Y090"
+
+
+def test_lint_source() -> None:
+    assert lint_source('x: "int"\n', "foo.pyi") == [
+        Finding(
+            "foo.pyi", 1, 3, "Y020", "Quoted annotations should never be used in stubs"
+        )
+    ]
+    # As with flake8, only stubs are checked
+    assert lint_source('x: "int"\n', "foo.py") == []
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_lint_many(jobs: int) -> None:
+    sources = [(f"stub{i}.pyi", f"x{i}: 'int'\n" * i) for i in range(40)]
+    results = lint_many(sources, jobs=jobs)
+    assert list(results) == [filename for filename, _ in sources]
+    for i, findings in enumerate(results.values()):
+        assert [(f.lineno, f.code) for f in findings] == [
+            (lineno, "Y020") for lineno in range(1, i + 1)
+        ]
+
+
+def test_lint_many_duplicate_filenames() -> None:
+    sources = [("a.pyi", "x: int\n"), ("b.pyi", "x: 'int'\n"), ("a.pyi", "")]
+    with pytest.raises(ValueError, match="given more than once: a.pyi"):
+        lint_many(sources)
+
+
+def _wait_for(event: threading.Event | None) -> bool:
+    return event is None or event.wait(timeout=60)
+
+
+def test_map_in_parallel_yields_results_early() -> None:
+    # The first chunk finishes immediately, the second one waits for the event,
+    # which is only set once the first result has arrived
+    with multiprocessing.Manager() as manager:
+        event = manager.Event()
+        results = _map_in_parallel(_wait_for, [None] * _CHUNKSIZE + [event], jobs=2)
+        assert next(results) is True
+        event.set()
+        # The event was set before the second chunk timed out
+        assert all(results)
+
+
+def test_map_in_parallel_order() -> None:
+    numbers = list(range(500))
+    assert list(_map_in_parallel(abs, [-n for n in numbers], jobs=3)) == numbers
+
+
+def test_lint_archives(tmp_path: Path) -> None:
+    stub = tmp_path / "foo.pyi"
+    stub.write_text('x: "int"\n')
+    (tmp_path / "README.md").write_text("x: 'int'\n")
+    wheel = tmp_path / "types_foo-1.0-py3-none-any.whl"
+    with zipfile.ZipFile(wheel, "w") as zip_file:
+        zip_file.write(stub, "foo-stubs/__init__.pyi")
+        zip_file.write(tmp_path / "README.md", "foo-stubs/README.md")
+    sdist = tmp_path / "types-foo-1.0.tar.gz"
+    with tarfile.open(sdist, "w:gz") as tar_file:
+        tar_file.add(stub, "types-foo-1.0/foo-stubs/__init__.pyi")
+        tar_file.add(stub, "types-foo-1.0/foo-stubs/bar.pyi")
+
+    message = "Quoted annotations should never be used in stubs"
+    assert lint_file(str(wheel)) == [
+        Finding(f"{wheel}!foo-stubs/__init__.pyi", 1, 3, "Y020", message)
+    ]
+    assert lint_file(str(sdist)) == [
+        Finding(f"{sdist}!types-foo-1.0/foo-stubs/__init__.pyi", 1, 3, "Y020", message),
+        Finding(f"{sdist}!types-foo-1.0/foo-stubs/bar.pyi", 1, 3, "Y020", message),
+    ]
+    results = lint_file_for_versions(str(wheel), [(3, 10), (3, 11)])
+    assert [(f.finding.filename, f.versions) for f in results] == [
+        (f"{wheel}!foo-stubs/__init__.pyi", ((3, 10), (3, 11)))
+    ]
+
+
+def test_lint_archive_encoding(tmp_path: Path) -> None:
+    wheel = tmp_path / "types_foo-1.0-py3-none-any.whl"
+    with zipfile.ZipFile(wheel, "w") as zip_file:
+        zip_file.writestr("foo-stubs/bad.pyi", b"x: int\n\xff\n")
+        zip_file.writestr("foo-stubs/latin1.pyi", b"# coding: latin-1\nx: '\xe9'\n")
+        zip_file.writestr("foo-stubs/utf8.pyi", "x: '\xe9'\n")
+
+    findings = lint_file(str(wheel))
+    # A member that can't be decoded doesn't stop the others from being checked
+    assert [(f.filename, f.lineno, f.code) for f in findings] == [
+        (f"{wheel}!foo-stubs/bad.pyi", 2, "E999"),
+        (f"{wheel}!foo-stubs/latin1.pyi", 2, "Y020"),
+        (f"{wheel}!foo-stubs/utf8.pyi", 1, "Y020"),
+    ]
+    assert "can't decode byte 0xff" in findings[0].message
+
+
+def test_lint_file_for_versions(tmp_path: Path) -> None:
+    stub = tmp_path / "foo.pyi"
+    stub.write_text('x: "int"\nmatch x:\n    case _: ...\n')
+    findings = lint_file_for_versions(str(stub), [(3, 9), (3, 10), (3, 11)])
+    assert [(f.code, versions) for f, versions in findings] == [
+        ("Y020", ((3, 10), (3, 11))),
+        ("E999", ((3, 9),)),
+    ]
+
+
+def test_iter_top_level_statements() -> None:
+    source = (
+        "import sys\n"
+        "# comment\n"
+        "\n"
+        "@final\n"
+        "@type_check_only\n"
+        "class A:\n"
+        "    x: int\n"
+        "\n"
+        "    def f(self) -> None: ...\n"
+        "if sys.platform == 'linux':\n"
+        "    y: int\n"
+        "else:\n"
+        "    y: str\n"
+        "z: tuple[\n"
+        "    int,\n"
+        "] = ...\n"
+    )
+    statements = _iter_top_level_statements(io.StringIO(source).readline)
+    assert [(lineno, len(lines)) for lineno, lines in statements] == [
+        (1, 3),
+        (4, 6),
+        (10, 4),
+        (14, 3),
+    ]
+
+
+@pytest.mark.parametrize("path", glob.glob("tests/*.pyi"))
+def test_streaming_matches_whole_file(path: str) -> None:
+    expected = lint_file(path, extend_select=["Y09"])
+    assert lint_file(path, extend_select=["Y09"], streaming=True) == expected
+
+
+def test_streaming_syntax_error(tmp_path: Path) -> None:
+    stub = tmp_path / "foo.pyi"
+    stub.write_text('x: "int"\nclass A:\n    y: int\nz: list[int\n')
+    findings = lint_file(str(stub), streaming=True)
+    assert [(f.lineno, f.code) for f in findings] == [(1, "Y020"), (4, "E999")]
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        b"# coding: latin-1\nx: '\xe9'\ny: int  # type: int\n",
+        b"x: int\n\xff\ny: int\n",
+        b"# coding: unknown\nx: int\n",
+        b"\xef\xbb\xbf# coding: latin-1\nx: int\n",
+    ],
+)
+def test_streaming_encoding(tmp_path: Path, source: bytes) -> None:
+    stub = tmp_path / "foo.pyi"
+    stub.write_bytes(source)
+    expected = [(f.lineno, f.col, f.code) for f in lint_file(str(stub))]
+    assert expected
+    findings = lint_file(str(stub), streaming=True)
+    # The messages of errors in the encoding declaration are worded differently
+    assert [(f.lineno, f.col, f.code) for f in findings] == expected
+
+
+@pytest.mark.parametrize("path", glob.glob("tests/*.pyi"))
+def test_lint_in_parts_matches_whole_file(path: str) -> None:
+    expected = lint_file(path, extend_select=["Y09"])
+    source = Path(path).read_bytes()
+    assert _lint_source_in_parts(source, path, ["Y09"], parts=4) == expected
+
+
+def test_lint_in_parts() -> None:
+    source = (
+        "from typing import TypedDict\n"
+        "class _Base(TypedDict):\n"
+        "    x: int\n" + "y: 'int'\n" * 20
+        # A TypedDict, although its base is in a different part
+        + "class _Unused(_Base): ...\n"
+    )
+    assert len(_split_source(source.encode(), 2)) == 2
+    findings = _lint_source_in_parts(source.encode(), "foo.pyi", (), parts=2)
+    assert findings == lint_source(source, "foo.pyi")
+    assert [(f.lineno, f.code) for f in findings][-2:] == [(23, "Y020"), (24, "Y049")]
+
+    # The stub is linted as a whole if a part can't be parsed on its own
+    source = 'x: str = """\n' + "y: 'int'\n" * 20 + '"""\n'
+    findings = _lint_source_in_parts(source.encode(), "foo.pyi", (), parts=2)
+    assert findings == lint_source(source, "foo.pyi")
+    source = "x: int\n" * 20 + "y: list[int\n"
+    [finding] = _lint_source_in_parts(source.encode(), "foo.pyi", (), parts=2)
+    assert (finding.lineno, finding.code) == (21, "E999")
+
+
+def test_lint_in_parts_stopped_early() -> None:
+    union = " | ".join(f"T{i}" for i in range(2000))
+    source = (
+        "from typing import TypeVar\n"
+        '_T = TypeVar("_T")\n'
+        # ast.unparse() recurses too deeply for the Y026 message
+        f"X = {union}\n"
+        # Never checked, so _T isn't known to be used
+        "def f(x: _T) -> _T: ...\n" + "y: 'int'\n" * 2000
+    )
+    [(_, first_part), (lineno, _)] = _split_source(source.encode(), 2)
+    assert b"def f" in first_part
+    findings = _lint_source_in_parts(source.encode(), "foo.pyi", (), parts=2)
+    # The second part is checked, but _T isn't reported as unused (Y018)
+    assert findings[0] == lint_source(source, "foo.pyi")[-1]
+    assert findings[0].code == "Y070"
+    assert [(f.lineno, f.code) for f in findings[1:]] == [
+        (i, "Y020") for i in range(lineno, 2005)
+    ]
+
+
+def test_command_line_lint_in_parts(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (tmp_path / "a.pyi").write_text("x: 'int'\n")
+    (tmp_path / "b.pyi").write_text("x: 'int'\n" * 50 + "class A:\n    pass\n")
+    (tmp_path / "c.pyi").write_text("x: 'int'\n")
+    assert main(["-j1", str(tmp_path)]) == 1
+    expected = capsys.readouterr().out
+    # b.pyi is split into parts, which are checked in parallel
+    monkeypatch.setattr(runner, "_SPLIT_THRESHOLD", 100)
+    monkeypatch.setattr(runner, "_MIN_PART_SIZE", 100)
+    assert main(["-j2", str(tmp_path)]) == 1
+    assert capsys.readouterr().out == expected
+
+
+def test_watcher(tmp_path: Path) -> None:
+    unchanged = tmp_path / "unchanged.pyi"
+    unchanged.write_text('x: "int"\n')
+    changed = tmp_path / "changed.pyi"
+    changed.write_text("class Foo:\n    pass\n")
+
+    watcher = _StubWatcher([str(tmp_path)])
+    assert [f.code for f in watcher.findings] == ["Y009", "Y020"]
+    assert watcher.changed_paths() == []
+
+    changed.write_text("class Foo: ...\ny: 'str'\n")
+    new = tmp_path / "new.pyi"
+    new.write_text("z: 'bytes'\n")
+    assert watcher.changed_paths() == [str(changed), str(new)]
+    added, removed = watcher.update([str(changed), str(new)])
+    assert [(f.filename, f.code) for f in added] == [
+        (str(changed), "Y020"),
+        (str(new), "Y020"),
+    ]
+    assert [(f.filename, f.code) for f in removed] == [(str(changed), "Y009")]
+
+    new.unlink()
+    assert watcher.changed_paths() == [str(new)]
+    added, removed = watcher.update([str(new)])
+    assert added == []
+    assert [(f.filename, f.code) for f in removed] == [(str(new), "Y020")]
+    assert str(unchanged) in watcher.results
+
+
+def test_command_line(tmp_path: Path) -> None:
+    stub = tmp_path / "foo.pyi"
+    stub.write_text('x: "int"\n')
+    (tmp_path / "bar.pyi").write_text("y: int\n")
+    result = subprocess.run(
+        [sys.executable, "-m", "flake8_pyi", str(tmp_path)],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 1
+    assert result.stdout == (
+        f"{stub}:1:4: Y020 Quoted annotations should never be used in stubs\n"
+    )
+
+
+def test_command_line_missing_path(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    missing = tmp_path / "missing.pyi"
+    with pytest.raises(SystemExit) as excinfo:
+        main([str(tmp_path), str(missing)])
+    assert excinfo.value.code == 2
+    assert f"{missing} does not exist" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("jobs", ["x", "0", "-1", "1.5"])
+def test_command_line_invalid_jobs(
+    jobs: str, capsys: pytest.CaptureFixture[str]
+) -> None:
+    with pytest.raises(SystemExit) as excinfo:
+        main(["--jobs", jobs, "."])
+    assert excinfo.value.code == 2
+    assert 'expected "auto" or a positive number' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize(
+    ("versions", "error"),
+    [
+        ("2.7", "older than 3.7"),
+        ("3.10,3.4", "older than 3.7"),
+        (f"3.{sys.version_info[1] + 1}", "newer than the running Python version"),
+        ("3", "invalid literal"),
+    ],
+)
+def test_command_line_invalid_target_versions(
+    versions: str, error: str, capsys: pytest.CaptureFixture[str]
+) -> None:
+    with pytest.raises(SystemExit) as excinfo:
+        main(["--target-versions", versions, "."])
+    assert excinfo.value.code == 2
+    assert error in capsys.readouterr().err
+
+
+def test_metrics_file(tmp_path: Path) -> None:
+    (tmp_path / "foo.pyi").write_text('x: "int"\ny: "str"\n')
+    (tmp_path / "bar.pyi").write_text("class Foo:\n    pass\n")
+    metrics_file = tmp_path / "metrics.prom"
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "flake8_pyi",
+            "-j2",
+            "--metrics-file",
+            str(metrics_file),
+            str(tmp_path),
+        ],
+        capture_output=True,
+        check=False,
+    )
+    metrics = metrics_file.read_text().splitlines()
+    assert "flake8_pyi_files_linted_total 2" in metrics
+    assert 'flake8_pyi_findings_total{code="Y009"} 1' in metrics
+    assert 'flake8_pyi_findings_total{code="Y020"} 2' in metrics
+    assert 'flake8_pyi_file_lint_seconds_bucket{le="+Inf"} 2' in metrics
+    assert metrics[-1] == "# EOF"
+
+
+def test_pack_finding_lists() -> None:
+    finding_lists = [
+        [
+            Finding("foo.pyi", 1, 3, "Y020", "Quoted annotations should never be used"),
+            Finding("foo.pyi", 2, 0, "Y020", "Quoted annotations should never be used"),
+        ],
+        [],
+        [Finding("bar.pyi", 2**20, 4, "Y009", 'Empty body should contain "..."')],
+    ]
+    packed = _pack_finding_lists(finding_lists)
+    assert packed.strings == (
+        "foo.pyi",
+        "Y020",
+        "Quoted annotations should never be used",
+        "bar.pyi",
+        "Y009",
+        'Empty body should contain "..."',
+    )
+    assert _unpack_finding_lists(packed) == finding_lists
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from flake8_pyi import runner
+from flake8_pyi.runner import main
+from flake8_pyi.typeshed import Distribution, find_distributions
+
+
+def _make_typeshed(root: Path) -> None:
+    (root / "stdlib").mkdir(parents=True)
+    (root / "stdlib" / "os.pyi").write_text('x: "int"\n')
+    for name, source in [("requests", "y: int\n"), ("six", 'z: "str"\n')]:
+        distribution = root / "stubs" / name
+        (distribution / name).mkdir(parents=True)
+        (distribution / "METADATA.toml").write_text('version = "1.0.*"\n')
+        (distribution / name / "__init__.pyi").write_text(source)
+    # Not a distribution, as it doesn't have a METADATA.toml file
+    (root / "stubs" / "scratch").mkdir()
+    (root / "stubs" / "scratch" / "scratch.pyi").write_text('w: "int"\n')
+
+
+def test_find_distributions(tmp_path: Path) -> None:
+    _make_typeshed(tmp_path)
+    assert find_distributions(str(tmp_path)) == [
+        Distribution("stdlib", str(tmp_path / "stdlib")),
+        Distribution("requests", str(tmp_path / "stubs" / "requests")),
+        Distribution("six", str(tmp_path / "stubs" / "six")),
+    ]
+
+
+def test_typeshed(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    typeshed = tmp_path / "typeshed"
+    _make_typeshed(typeshed)
+    linted: list[str] = []
+
+    def lint_distribution(
+        path: str, **kwargs: Any
+    ) -> tuple[list[runner.Finding], list[runner.FileStats]]:
+        linted.append(Path(path).name)
+        return original_lint_distribution(path, **kwargs)
+
+    original_lint_distribution = runner._lint_distribution
+    monkeypatch.setattr(runner, "_lint_distribution", lint_distribution)
+    argv = ["-j1", "--typeshed", "--cache-dir", str(tmp_path / "cache"), str(typeshed)]
+    quoted = "Y020 Quoted annotations should never be used in stubs"
+    expected_output = (
+        f"{typeshed / 'stdlib' / 'os.pyi'}:1:4: {quoted}\n"
+        f"{typeshed / 'stubs' / 'six' / 'six' / '__init__.pyi'}:1:4: {quoted}\n"
+    )
+
+    assert main(argv) == 1
+    assert capsys.readouterr().out == expected_output
+    assert linted == ["stdlib", "requests", "six"]
+
+    # Nothing has changed, so all findings come from the cache
+    linted.clear()
+    assert main(argv) == 1
+    assert capsys.readouterr().out == expected_output
+    assert linted == []
+
+    # Only the distribution that changed is linted again
+    (typeshed / "stubs" / "requests" / "requests" / "api.pyi").write_text("a: int\n")
+    assert main(argv) == 1
+    assert capsys.readouterr().out == expected_output
+    assert linted == ["requests"]
+
+    # Findings depend on the selected codes
+    linted.clear()
+    assert main([*argv, "--extend-select", "Y090"]) == 1
+    assert capsys.readouterr().out == expected_output
+    assert linted == ["stdlib", "requests", "six"]
+
+
+def test_typeshed_several_checkouts(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    checkouts = [tmp_path / "typeshed", tmp_path / "fork"]
+    for checkout in checkouts:
+        _make_typeshed(checkout)
+    (tmp_path / "fork" / "stdlib" / "sys.pyi").write_text("y: int\n")
+    linted: list[str] = []
+
+    def lint_distribution(
+        path: str, **kwargs: Any
+    ) -> tuple[list[runner.Finding], list[runner.FileStats]]:
+        linted.append(path)
+        return original_lint_distribution(path, **kwargs)
+
+    original_lint_distribution = runner._lint_distribution
+    monkeypatch.setattr(runner, "_lint_distribution", lint_distribution)
+    argv = ["-j1", "--typeshed", "--cache-dir", str(tmp_path / "cache")]
+    argv += map(str, checkouts)
+
+    assert main(argv) == 1
+    output = capsys.readouterr().out
+    assert len(linted) == 6
+    # Distributions with the same name in different checkouts don't evict
+    # each other's cache entries
+    linted.clear()
+    assert main(argv) == 1
+    assert capsys.readouterr().out == output
+    assert linted == []
+
+
+def test_typeshed_metrics(tmp_path: Path) -> None:
+    typeshed = tmp_path / "typeshed"
+    _make_typeshed(typeshed)
+    metrics_file = tmp_path / "metrics.prom"
+    argv = ["-j1", "--typeshed", "--cache-dir", str(tmp_path / "cache")]
+    argv += ["--metrics-file", str(metrics_file), str(typeshed)]
+
+    assert main(argv) == 1
+    metrics = metrics_file.read_text().splitlines()
+    assert 'flake8_pyi_cache_lookups_total{result="hit"} 0' in metrics
+    assert 'flake8_pyi_cache_lookups_total{result="miss"} 3' in metrics
+    assert "flake8_pyi_files_linted_total 3" in metrics
+    assert 'flake8_pyi_findings_total{code="Y020"} 2' in metrics
+
+    (typeshed / "stubs" / "requests" / "requests" / "api.pyi").write_text("a: int\n")
+    assert main(argv) == 1
+    metrics = metrics_file.read_text().splitlines()
+    assert 'flake8_pyi_cache_lookups_total{result="hit"} 2' in metrics
+    assert 'flake8_pyi_cache_lookups_total{result="miss"} 1' in metrics
+    # Only the files of the distribution that changed are linted again,
+    # but findings from the cache are counted too
+    assert "flake8_pyi_files_linted_total 2" in metrics
+    assert 'flake8_pyi_findings_total{code="Y020"} 2' in metrics
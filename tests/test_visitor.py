@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import ast
+
+import pytest
+
+from flake8_pyi import Finding, errors, lint_source
+from flake8_pyi.runner import _lint_source
+from flake8_pyi.visitor import RULES, Budget, NestingCounter, PyiVisitor, Rule
+
+
+@pytest.mark.parametrize("rule", RULES, ids=lambda rule: rule.method_name)
+def test_rule(rule: Rule) -> None:
+    assert callable(getattr(PyiVisitor, rule.method_name))
+    assert rule.node_types
+    assert rule.codes
+    for code in rule.codes:
+        assert hasattr(errors, code)
+
+
+def test_disabled_codes() -> None:
+    tree = ast.parse("x: tuple[int]\nclass Foo:\n    pass\n")
+    codes = [error.message[:4] for error in PyiVisitor("foo.pyi").run(tree)]
+    assert codes == ["Y090", "Y009"]
+
+    visitor = PyiVisitor(
+        "foo.pyi", disabled_codes=frozenset(errors.DISABLED_BY_DEFAULT)
+    )
+    assert [error.message[:4] for error in visitor.run(tree)] == ["Y009"]
+    assert all(
+        check is not PyiVisitor.check_for_single_element_tuple
+        for checks in visitor._rules_by_node_type.values()
+        for check in checks
+    )
+
+
+def test_budget() -> None:
+    tree = ast.parse("x: int\n" * 100 + "_T = TypeVar('_T')\n")
+
+    visitor = PyiVisitor("foo.pyi", budget=Budget(max_nodes=10))
+    assert [error.message for error in visitor.run(tree)] == [
+        "Y070 Stopped checking this file, because it has more than 10 AST nodes"
+    ]
+    assert visitor.stopped_early
+
+    visitor = PyiVisitor("foo.pyi", budget=Budget(max_seconds=0))
+    (error,) = visitor.run(tree)
+    assert error.message == (
+        "Y070 Stopped checking this file, because checking it took more than 0 seconds"
+    )
+
+    visitor = PyiVisitor("foo.pyi", budget=Budget(max_nodes=10_000, max_seconds=60))
+    assert [error.message[:4] for error in visitor.run(tree)] == ["Y018"]
+    assert not visitor.stopped_early
+
+
+def test_repeated_signatures() -> None:
+    source = (
+        "from typing import TypeVar\n"
+        "_T = TypeVar('_T')\n"
+        "_S = TypeVar('_S')\n"
+        + "".join(
+            f"class C{i}:\n"
+            f"    def f(self, x: 'int' = 1 + 2,\n"
+            f"          y: int | float = ...) -> _T: ...\n"
+            f"    def g(self, x: 'int' = 1 + 2,\n"
+            f"          y: int | float = ...) -> _T: ...\n"
+            for i in range(3)
+        )
+    )
+    tree = ast.parse(source)
+    visitor = PyiVisitor("foo.pyi")
+    expected = sorted(visitor.run(tree))
+
+    visitor = PyiVisitor("foo.pyi", lines=source.splitlines(keepends=True))
+    assert sorted(visitor.run(tree)) == expected
+    assert len(expected) == 19
+    assert visitor.all_name_occurrences["_T"] == 7
+    # All the methods have the same signature
+    assert len(visitor._signature_memo) == 1
+
+
+def test_repeated_signatures_mismatched_lines() -> None:
+    # str.splitlines() also ends a line at a form feed, which used to
+    # misalign the lines of str sources with the AST, and make the memo
+    # reuse the results for line 4's signature for line 5's
+    source = (
+        "x: int\x0c\n"
+        + "def f(x: int) -> None: ...\n" * 3
+        + "def f(x: 'i') -> None: ...\n"
+        + "def f(x: int) -> None: ...\n"
+    )
+    message = "Quoted annotations should never be used in stubs"
+    expected = [Finding("foo.pyi", 5, 9, "Y020", message)]
+    assert lint_source(source, "foo.pyi") == expected
+    assert _lint_source(source.encode(), "foo.pyi", extend_select=()) == expected
+
+
+_DEF = "def f(x: int) -> None: ...\n"
+_ASYNC_DEF = "async def f(x: int) -> None: ...\n"
+
+
+@pytest.mark.parametrize(
+    ("source", "line", "memoized"),
+    [
+        (_DEF, _DEF, True),
+        (_ASYNC_DEF, "async  def f (x: int) -> None: ...\n", True),
+        # Lines that don't match the AST aren't used for the memo
+        (_DEF, "def g(x: int) -> f: ...\n", False),
+        (_DEF, "def ff(x: int) -> None: ...\n", False),
+        (_DEF, "  def f(x: int) -> None: ...\n", False),
+        (_DEF, "\n", False),
+    ],
+)
+def test_signature_key(source: str, line: str, memoized: bool) -> None:
+    [node] = ast.parse(source).body
+    assert isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+    visitor = PyiVisitor("foo.pyi", lines=[line])
+    assert (visitor._signature_key(node) is not None) is memoized
+
+
+def test_nesting_counter() -> None:
+    counter = NestingCounter()
+    # The counter is its own context manager, so it can be re-entered
+    # (e.g. for nested functions) and reused, without allocating
+    assert counter.enabled() is counter
+    nestings = [counter.nesting]
+    with counter.enabled():
+        nestings.append(counter.nesting)
+        with counter.enabled():
+            nestings.append(counter.nesting)
+        nestings.append(counter.nesting)
+    nestings.append(counter.nesting)
+    assert nestings == [0, 1, 2, 1, 0]
+    assert not counter.active
+
+    # The nesting is restored if visiting a node raises an exception
+    with pytest.raises(RecursionError):
+        with counter.enabled():
+            with counter.enabled():
+                raise RecursionError
+    assert counter.nesting == 0
+
+    # Each visitor has its own counters
+    first, second = PyiVisitor("foo.pyi"), PyiVisitor("bar.pyi")
+    with first.in_function.enabled():
+        assert first.in_function.active
+        assert not second.in_function.active
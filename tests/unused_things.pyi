@@ -50,7 +50,7 @@ class _UnusedTypedDict3(mypy_extensions.TypedDict):  # Y049 TypedDict "_UnusedTy
 class _UsedTypedDict(TypedDict):
     baz: bytes
 
-class _Uses_UsedTypedDict(_UsedTypedDict):
+class _Uses_UsedTypedDict(_UsedTypedDict):  # Y049 TypedDict "_Uses_UsedTypedDict" is not used
     spam: list[int]
 
 class _UsedTypedDict2(TypedDict):